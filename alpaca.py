@@ -1,43 +1,81 @@
 # c:\Data_Tools\Order_Manager\alpaca.py
+"""
+Reconciles the local orders with an Alpaca account
+
+Talks to Alpaca's REST API directly rather than through alpaca-py, whose package this module's name would shadow.
+
+    python alpaca.py --data-folder Data --days 1 --dry-run
+"""
+import argparse
+import logging
 import os
-from alpaca.trading.client import TradingClient
-from alpaca.trading.requests import GetOrdersRequest
-from alpaca.trading.enums import OrderStatus
-
-# class AlpacaClient:
-#     def __init__(self, is_paper=True):
-#         """
-#         Initialize the AlpacaClient with API credentials from environment variables.
-        
-#         :param is_paper: Boolean indicating whether to use the paper (True) or live (False) account.
-#         """
-#         self.is_paper = is_paper
-#         self.api_key = os.getenv('ALPACA_MARKETS_API_KEY_TEST')
-#         self.secret_key = os.getenv('ALPACA_MARKETS_SECRET_KEY_TEST')
-        
-#         self.api = TradingClient(self.api_key, self.secret_key, paper=is_paper)
-
-#     def get_order_history(self):
-#         """
-#         Return the order history from the Alpaca API.
-        
-#         :return: List of order history
-#         """
-#         # Create a request to get all orders
-#         request_params = GetOrdersRequest(
-#             status=OrderStatus.ALL
-#         )
-        
-#         # Fetch the orders
-#         orders = self.api.get_orders(filter=request_params)
-#         return orders
-
-
-
-# def main():
-#     client = AlpacaClient(is_paper=True)
-#     order_history = client.get_order_history()
-#     print(order_history)
-
-# if __name__ == "__main__":
-#     main()
\ No newline at end of file
+from datetime import datetime, timedelta, timezone
+from typing import Any, Optional
+
+from order_logging import configure_logging
+from order_manager import OrderManager
+from reconcile import HttpBrokerAdapter, Reconciler
+
+logger = logging.getLogger(__name__)
+
+PAPER_URL = "https://paper-api.alpaca.markets"
+LIVE_URL = "https://api.alpaca.markets"
+
+
+class AlpacaBrokerAdapter(HttpBrokerAdapter):
+    """Reads the order history of an Alpaca paper or live account"""
+
+    def __init__(self, is_paper: bool = True, api_key: Optional[str] = None, secret_key: Optional[str] = None,
+                 base_url: Optional[str] = None, **kwargs: Any):
+        """
+        Args:
+        is_paper: Use the paper (True) or live (False) account
+        api_key: Defaults to the ALPACA_MARKETS_API_KEY_TEST environment variable
+        secret_key: Defaults to the ALPACA_MARKETS_SECRET_KEY_TEST environment variable
+        base_url: Overrides the account's API address, e.g. to point at a FakeBroker
+        kwargs: Passed on to HttpBrokerAdapter, e.g. page_size or timeout
+        """
+        self.is_paper = is_paper
+        self.api_key = api_key or os.getenv('ALPACA_MARKETS_API_KEY_TEST')
+        self.secret_key = secret_key or os.getenv('ALPACA_MARKETS_SECRET_KEY_TEST')
+        headers = {"APCA-API-KEY-ID": self.api_key or "", "APCA-API-SECRET-KEY": self.secret_key or ""}
+        super().__init__(base_url or (PAPER_URL if is_paper else LIVE_URL), headers=headers, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reconcile the orders in a data folder with an Alpaca account")
+    parser.add_argument("--data-folder", default="Data")
+    parser.add_argument("--days", type=float, default=1.0, help="How far back to reconcile")
+    parser.add_argument("--live", action="store_true", help="Use the live account instead of paper")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--dry-run", action="store_true", help="Report missing fills without applying them")
+    args = parser.parse_args()
+    configure_logging()
+
+    manager = OrderManager(data_folder=args.data_folder)
+    adapter = AlpacaBrokerAdapter(is_paper=not args.live)
+    try:
+        reconciler = Reconciler(manager, adapter, workers=args.workers)
+        report = reconciler.reconcile(datetime.now(timezone.utc) - timedelta(days=args.days),
+                                      apply_fills=not args.dry_run)
+        if report.fills_applied and not args.dry_run:
+            manager.save_orders()
+    finally:
+        adapter.close()
+        manager.close()
+
+    print(f"{report.remote_orders} orders at the broker in {report.pages} pages, {report.in_sync} in sync, "
+          f"{len(report.fills_applied)} missing fills {'found' if args.dry_run else 'applied'}")
+    for remote in report.missing_locally:
+        print(f"Not in the order manager: {remote.broker_id} ({remote.client_order_id}) {remote.side} "
+              f"{remote.quantity} {remote.symbol}")
+    for order_number in report.missing_remotely:
+        print(f"Not at the broker: order #{order_number}")
+    for order_number, error in report.mismatched.items():
+        print(f"Order #{order_number}: {error}")
+    for order_number in report.closed_remotely:
+        print(f"Order #{order_number} is closed at the broker but still open locally")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# async_order_manager.py
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+from order_manager import BatchResult, Order, OrderDetails, OrderManager
+
+logger = logging.getLogger(__name__)
+
+# (order_number, fill_price, fill_quantity), as taken by OrderManager.fill_orders
+FillRequest = Tuple[int, float, float]
+
+
+class AsyncOrderManager:
+    """
+    asyncio front end over a thread safe OrderManager
+
+    Every manager call runs in a thread pool, so journal writes and saves never block the event loop. Fills from
+    exchange feeds can be put on a queue with submit_fill, a consumer task drains the queue and applies the fills in
+    batches with OrderManager.fill_orders.
+    """
+
+    def __init__(self, manager: OrderManager, max_workers: int = 4, queue_size: int = 10000,
+                 batch_size: int = 500):
+        """
+        Args:
+        manager: The manager to drive, it must have been created with thread_safe=True
+        max_workers: Threads in the pool that runs manager calls
+        queue_size: Fills that can wait on the queue before submit_fill waits for room
+        batch_size: Most fills applied in one fill_orders call
+        """
+        if not manager.thread_safe:
+            raise ValueError("AsyncOrderManager needs an OrderManager created with thread_safe=True")
+
+        self.manager = manager
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="order-manager")
+        self._fill_queue: Optional[asyncio.Queue] = None
+        self._consumer: Optional[asyncio.Task] = None
+        self.batch_results: List[BatchResult] = [] # Results of batches that rejected fills, for the caller to inspect
+
+    async def _run(self, function, *args):
+        """Runs a manager call in the thread pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, function, *args)
+
+    async def add_order(self, details: OrderDetails) -> Order:
+        return await self._run(self.manager.add_order, details)
+
+    async def add_orders(self, orders_to_add: List[OrderDetails]) -> BatchResult:
+        return await self._run(self.manager.add_orders, orders_to_add)
+
+    async def fill_order(self, order_number: int, fill_price: float, fill_quantity: float) -> None:
+        await self._run(self.manager.fill_order, order_number, fill_price, fill_quantity)
+
+    async def fill_orders(self, fills_to_add: List[FillRequest]) -> BatchResult:
+        return await self._run(self.manager.fill_orders, fills_to_add)
+
+    async def save_orders(self, filename: str = "orders.json") -> None:
+        await self._run(self.manager.save_orders, filename)
+
+    async def compact(self, filename: str = "orders.json") -> None:
+        await self._run(self.manager.compact, filename)
+
+    async def start(self) -> None:
+        """Starts the task that drains the fill queue"""
+        if self._consumer is not None:
+            return
+        self._fill_queue = asyncio.Queue(maxsize=self.queue_size)
+        self._consumer = asyncio.create_task(self._consume_fills())
+
+    async def submit_fill(self, order_number: int, fill_price: float, fill_quantity: float) -> None:
+        """Queues a fill, waiting for room when the queue is full"""
+        if self._fill_queue is None:
+            raise RuntimeError("Call start() before submitting fills")
+        await self._fill_queue.put((order_number, fill_price, fill_quantity))
+
+    async def join(self) -> None:
+        """Waits until every queued fill has been applied"""
+        if self._fill_queue is not None:
+            await self._fill_queue.join()
+
+    async def _consume_fills(self) -> None:
+        queue = self._fill_queue
+        while True:
+            batch = [await queue.get()]
+            # Take whatever else is already waiting, up to a full batch
+            while len(batch) < self.batch_size and not queue.empty():
+                batch.append(queue.get_nowait())
+
+            stop = None in batch
+            fills = [item for item in batch if item is not None]
+            try:
+                if fills:
+                    result = await self.fill_orders(fills)
+                    if result.errors:
+                        logger.warning("Rejected %s of %s queued fills", len(result.errors), len(fills))
+                        self.batch_results.append(result)
+            except Exception as e:
+                logger.error("Error applying queued fills: %s", e)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+            if stop:
+                return
+
+    async def stop(self) -> None:
+        """Applies the fills still on the queue, then stops the consumer"""
+        if self._consumer is None:
+            return
+        await self._fill_queue.put(None)
+        await self._consumer
+        self._consumer = None
+        self._fill_queue = None
+
+    async def close(self) -> None:
+        """Stops the consumer, closes the manager and shuts the thread pool down"""
+        await self.stop()
+        await self._run(self.manager.close)
+        self._executor.shutdown(wait=True)
@@ -0,0 +1,68 @@
+# benchmarks/bench_batch.py
+"""Compares add_order/fill_order in a loop with the add_orders/fill_orders batch calls"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_manager import OrderManager, OrderDetails
+
+
+def make_inputs(count: int):
+    details = [
+        OrderDetails(ticker_id=1000 + idx % 50, order_quantity=100, order_price=50.0, exchange_id=1 + idx % 3)
+        for idx in range(count)
+    ]
+    # Two partial fills per order, like an end-of-day broker fill file
+    fills = [(number, 50.0, 60) for number in range(1, count + 1)]
+    fills += [(number, 50.0, 40) for number in range(1, count + 1)]
+    return details, fills
+
+
+def run_loop(details, fills, data_folder: str, persist: str) -> float:
+    manager = OrderManager(data_folder=data_folder, journal=persist == "journal")
+    start = time.perf_counter()
+    for order_details in details:
+        manager.add_order(order_details)
+    for order_number, fill_price, fill_quantity in fills:
+        manager.fill_order(order_number, fill_price, fill_quantity)
+    if persist == "save":
+        manager.save_orders()
+    elapsed = time.perf_counter() - start
+    manager.close()
+    return elapsed
+
+
+def run_batch(details, fills, data_folder: str, persist: str) -> float:
+    manager = OrderManager(data_folder=data_folder, journal=persist == "journal")
+    start = time.perf_counter()
+    manager.add_orders(details)
+    manager.fill_orders(fills, save=persist == "save")
+    elapsed = time.perf_counter() - start
+    manager.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--persist", choices=("none", "save", "journal"), default="none",
+                        help="How changes are written: not at all, one save_orders at the end, or the journal")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(args.log_level)
+
+    details, fills = make_inputs(args.orders)
+    operations = len(details) + len(fills)
+    for name, runner in (("loop", run_loop), ("batch", run_batch)):
+        with tempfile.TemporaryDirectory() as data_folder:
+            elapsed = runner(details, fills, data_folder, args.persist)
+        print(f"{name:>5}: {operations} operations in {elapsed:.3f}s ({operations / elapsed:,.0f} ops/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/bench_fill_store.py
+"""Times FillStore writes and compares VWAP queries read from rollups with a scan of the raw fills"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fill_store import FillStore
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--fills", type=int, default=500000)
+    parser.add_argument("--tickers", type=int, default=20)
+    parser.add_argument("--days", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    rng = random.Random(0)
+    start_time = datetime(2024, 5, 1)
+    step = args.days * 86400 / args.fills
+
+    with tempfile.TemporaryDirectory() as folder:
+        store = FillStore(folder, flush_every=10000)
+        start = time.perf_counter()
+        for index in range(args.fills):
+            store.add(index + 1, 0, rng.randrange(args.tickers), 1, "buy", round(rng.uniform(90, 110), 2),
+                      rng.randrange(1, 100), start_time + timedelta(seconds=index * step))
+        store.flush()
+        elapsed = time.perf_counter() - start
+        print(f"add + flush:     {args.fills / elapsed:>10,.0f} fills/s")
+
+        ranges = []
+        for _ in range(args.queries):
+            begin = start_time + timedelta(seconds=rng.uniform(0, args.days * 86400 / 2))
+            ranges.append((rng.randrange(args.tickers), begin, begin + timedelta(seconds=rng.uniform(60, 86400))))
+
+        store = FillStore(folder)
+        start = time.perf_counter()
+        for ticker_id, begin, end in ranges:
+            store.vwap(ticker_id, begin, end)
+        elapsed = time.perf_counter() - start
+        print(f"vwap (rollups):  {elapsed / args.queries * 1000:>10.3f} ms/query, including first reads of each day")
+        start = time.perf_counter()
+        for ticker_id, begin, end in ranges:
+            store.vwap(ticker_id, begin, end)
+        elapsed = time.perf_counter() - start
+        print(f"vwap (warm):     {elapsed / args.queries * 1000:>10.3f} ms/query")
+
+        scan_queries = max(1, args.queries // 20)
+        start = time.perf_counter()
+        for ticker_id, begin, end in ranges[:scan_queries]:
+            records = store.fills(ticker_id, begin, end)
+            volume = sum(record.fill_quantity for record in records)
+            sum(record.fill_price * record.fill_quantity for record in records) / (volume or 1)
+        elapsed = time.perf_counter() - start
+        print(f"vwap (raw scan): {elapsed / scan_queries * 1000:>10.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
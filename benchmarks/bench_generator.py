@@ -0,0 +1,57 @@
+# benchmarks/bench_generator.py
+"""Compares how fast FillGenerator draws orders and fills with how fast OrderManager takes them"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fill_generator import FillGenerator, GeneratorConfig
+from order_manager import OrderManager
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=1000000)
+    parser.add_argument("--stream-orders", type=int, default=200000)
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    listings = [(ticker_id, ticker_id % 5 + 1) for ticker_id in range(1, args.tickers + 1)]
+
+    generator = FillGenerator(GeneratorConfig(seed=0), listings=listings)
+    start = time.perf_counter()
+    fill_count = sum(len(fills.prices) for _, fills in generator.chunks(args.orders, args.chunk_size))
+    elapsed = time.perf_counter() - start
+    print(f"generate:         {args.orders / elapsed:>12,.0f} orders/s ({args.orders:,} orders, {fill_count:,} fills)")
+
+    generator = FillGenerator(GeneratorConfig(seed=0), listings=listings)
+    start = time.perf_counter()
+    for orders, _ in generator.chunks(args.stream_orders, args.chunk_size):
+        generator.order_details(orders)
+    elapsed = time.perf_counter() - start
+    print(f"to OrderDetails:  {args.stream_orders / elapsed:>12,.0f} orders/s")
+
+    with tempfile.TemporaryDirectory() as data_folder:
+        generator = FillGenerator(GeneratorConfig(seed=0), listings=listings)
+        manager = OrderManager(data_folder=data_folder)
+        summary = generator.stream_into(manager, args.stream_orders, args.chunk_size)
+        print(f"stream_into:      {summary.orders / summary.elapsed:>12,.0f} orders/s "
+              f"({summary.fills / summary.elapsed:,.0f} fills/s)")
+
+        replay_path = os.path.join(data_folder, "replay.jsonl")
+        start = time.perf_counter()
+        events = FillGenerator(GeneratorConfig(seed=0), listings=listings).write_replay(
+            replay_path, args.stream_orders, args.chunk_size)
+        elapsed = time.perf_counter() - start
+        print(f"write_replay:     {events / elapsed:>12,.0f} events/s")
+        manager.close()
+
+
+if __name__ == "__main__":
+    main()
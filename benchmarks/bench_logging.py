@@ -0,0 +1,69 @@
+# benchmarks/bench_logging.py
+"""Measures the per operation cost of logging on add_order/fill_order and load_orders with INFO logging on"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_logging import configure_logging
+from order_manager import OrderManager, OrderDetails
+
+
+class CountingHandler(logging.Handler):
+    """Formats every record like a real handler would, and counts them instead of writing them"""
+
+    def __init__(self):
+        super().__init__()
+        self.count = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.format(record)
+        self.count += 1
+
+
+def run(count: int, data_folder: str, handler: CountingHandler):
+    manager = OrderManager(data_folder=data_folder)
+    start = time.perf_counter()
+    for idx in range(count):
+        manager.add_order(OrderDetails(ticker_id=1000 + idx % 50, order_quantity=100, order_price=50.0))
+    for order_number in range(1, count + 1):
+        manager.fill_order(order_number, 50.0, 100)
+    write_elapsed = time.perf_counter() - start
+    write_lines = handler.count
+    manager.save_orders()
+    manager.close()
+
+    handler.count = 0
+    start = time.perf_counter()
+    OrderManager(data_folder=data_folder).close()
+    load_elapsed = time.perf_counter() - start
+    return write_elapsed, write_lines, load_elapsed, handler.count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--structured", action="store_true", help="Format records as JSON lines")
+    parser.add_argument("--sample-every", type=int, default=1000)
+    args = parser.parse_args()
+
+    configure_logging(logging.INFO, structured=args.structured, sample_every=args.sample_every)
+    handler = CountingHandler()
+    handler.setFormatter(logging.getLogger().handlers[0].formatter)
+    logging.getLogger().handlers = [handler]
+
+    operations = args.orders * 2
+    with tempfile.TemporaryDirectory() as data_folder:
+        write_elapsed, write_lines, load_elapsed, load_lines = run(args.orders, data_folder, handler)
+    print(f"add/fill: {operations} operations in {write_elapsed:.3f}s "
+          f"({write_elapsed / operations * 1e6:.2f} us/op), {write_lines} log lines")
+    print(f"    load: {args.orders} orders in {load_elapsed:.3f}s "
+          f"({load_elapsed / args.orders * 1e6:.2f} us/order), {load_lines} log lines")
+
+
+if __name__ == "__main__":
+    main()
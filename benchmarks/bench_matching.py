@@ -0,0 +1,58 @@
+# benchmarks/bench_matching.py
+"""Measures matching throughput of MatchingEngine, including applying the fills through the OrderManager"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from matching_engine import MatchingEngine
+from order_manager import OrderManager, OrderDetails, OrderSide
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=200000)
+    parser.add_argument("--tickers", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=10000)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    # Orders around a mid price, so roughly half of them cross the book on arrival
+    rng = random.Random(0)
+    details = [
+        OrderDetails(ticker_id=rng.randrange(args.tickers), order_quantity=rng.randint(1, 10) * 10,
+                     order_price=round(100 + rng.gauss(0, 0.5), 2),
+                     side=OrderSide.BUY if rng.random() < 0.5 else OrderSide.SELL)
+        for _ in range(args.orders)
+    ]
+
+    def run(batch_size, apply_fills):
+        with tempfile.TemporaryDirectory() as data_folder:
+            manager = OrderManager(data_folder=data_folder)
+            orders = manager.add_orders(details).results
+            engine = MatchingEngine(manager, batch_size=batch_size)
+
+            start = time.perf_counter()
+            for order in orders:
+                engine.submit(order)
+            if apply_fills:
+                engine.flush()
+            elapsed = time.perf_counter() - start
+            manager.close()
+        return engine.match_count, elapsed
+
+    match_count, elapsed = run(args.batch_size, apply_fills=True)
+    print(f"{args.orders:,} orders, {match_count:,} matches, fills applied every {args.batch_size:,}")
+    print(f"with fills:       {match_count / elapsed:>12,.0f} matches/s ({elapsed:.2f}s)")
+
+    # A batch bigger than the run keeps every fill pending, which times the order books alone
+    match_count, elapsed = run(args.orders * 2, apply_fills=False)
+    print(f"matching only:    {match_count / elapsed:>12,.0f} matches/s ({elapsed:.2f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+# benchmarks/bench_reconcile.py
+"""Times reconciling an order manager with a local fake broker, as one serial pull and as parallel windows"""
+import argparse
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_broker import FakeBroker, broker_record
+from order_manager import OrderDetails, OrderManager
+from reconcile import HttpBrokerAdapter, Reconciler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--missing", type=float, default=0.05, help="Share of orders the manager has no fills for")
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds the fake broker holds each response")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--window-minutes", type=float, default=30)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    rng = random.Random(0)
+    start_time = datetime(2024, 5, 1, 9, 30)
+    step = timedelta(seconds=6.5 * 3600 / args.orders) # One trading day
+
+    with tempfile.TemporaryDirectory() as folder:
+        def build_manager():
+            manager = OrderManager(data_folder=folder)
+            orders = manager.add_orders([OrderDetails(ticker_id=rng.randrange(1000, 1020), order_quantity=100,
+                                                      order_price=50.0) for _ in range(args.orders)]).results
+            for index, order in enumerate(orders):
+                order.created_at = start_time + step * index
+            return manager, orders
+
+        manager, orders = build_manager()
+        records = [broker_record(order, filled_quantity=100, average_fill_price=50.0) for order in orders]
+        missing = int(args.orders * args.missing)
+        with FakeBroker(records, latency=args.latency) as broker:
+            for label, workers, window in (("serial", 1, timedelta(days=1)),
+                                           ("parallel", args.workers, timedelta(minutes=args.window_minutes))):
+                manager, orders = build_manager()
+                manager.fill_orders([(order.order_number, 50.0, 100) for order in orders[missing:]])
+                adapter = HttpBrokerAdapter(broker.url)
+                reconciler = Reconciler(manager, adapter, window=window, workers=workers)
+                start = time.perf_counter()
+                report = reconciler.reconcile(start_time, start_time + timedelta(days=1))
+                elapsed = time.perf_counter() - start
+                adapter.close()
+                print(f"{label:<9} {report.remote_orders:>8,} orders in {report.pages:>4} pages: {elapsed:6.2f} s "
+                      f"({report.fetch_seconds:.2f} s fetching), {len(report.fills_applied):,} fills applied")
+
+
+if __name__ == "__main__":
+    main()
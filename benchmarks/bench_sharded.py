@@ -0,0 +1,55 @@
+# benchmarks/bench_sharded.py
+"""Measures fill throughput of ShardedOrderManager on a multi-ticker workload for several shard counts"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_manager import OrderDetails
+from sharded_manager import ShardedOrderManager
+
+
+def run(shards: int, orders: int, batch_size: int) -> float:
+    details = [
+        OrderDetails(ticker_id=1000 + idx % 500, order_quantity=100, order_price=50.0, exchange_id=1 + idx % 3)
+        for idx in range(orders)
+    ]
+    with tempfile.TemporaryDirectory() as data_folder:
+        manager = ShardedOrderManager(data_folder=data_folder, shards=shards)
+        try:
+            order_numbers = [order.order_number for order in manager.add_orders(details).results]
+            # Four partial fills per order, interleaved across orders like a live feed
+            fills = [(number, 50.0, 25) for _ in range(4) for number in order_numbers]
+
+            start = time.perf_counter()
+            for offset in range(0, len(fills), batch_size):
+                manager.fill_orders(fills[offset:offset + batch_size])
+            elapsed = time.perf_counter() - start
+        finally:
+            manager.close()
+    return len(fills) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=20000)
+    parser.add_argument("--shards", default=",".join(str(count) for count in (1, 2, 4, 8)),
+                        help="Comma separated shard counts to try")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"{os.cpu_count()} cores")
+    baseline = None
+    for shards in (int(count) for count in args.shards.split(",")):
+        throughput = run(shards, args.orders, args.batch_size)
+        baseline = baseline or throughput
+        print(f"{shards:>3} shards: {throughput:>12,.0f} fills/s ({throughput / baseline:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# benchmarks/bench_snapshot.py
+"""Compares restarting an OrderManager from orders.json with restarting it from a binary snapshot"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from binary_snapshot import BinaryOrderStorage, OrderSnapshot, json_to_snapshot
+from fill_generator import FillGenerator, GeneratorConfig
+from order_manager import OrderManager
+from order_storage import JsonOrderStorage
+
+
+def timed(label, action):
+    start = time.perf_counter()
+    result = action()
+    print(f"{label:<34}{time.perf_counter() - start:>8.3f}s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=200000)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as data_folder:
+        manager = OrderManager(data_folder=data_folder)
+        FillGenerator(GeneratorConfig(seed=0), listings=[(1, 1), (2, 2), (3, 1)]).stream_into(manager, args.orders)
+        manager.save_orders()
+        manager.close()
+        json_to_snapshot(os.path.join(data_folder, "orders.json"), os.path.join(data_folder, "orders.snap"))
+        for name in ("orders.json", "orders.snap"):
+            size = os.path.getsize(os.path.join(data_folder, name))
+            print(f"{name:<34}{size / 1e6:>8.1f}MB")
+
+        timed("json, every order", lambda: OrderManager(data_folder=data_folder))
+        timed("json lazy, open orders", lambda: OrderManager(
+            data_folder=data_folder, storage=JsonOrderStorage(data_folder, lazy=True)))
+        timed("snapshot, every order", lambda: OrderManager(
+            data_folder=data_folder, storage=BinaryOrderStorage(data_folder, lazy=False)))
+        timed("snapshot lazy, open orders", lambda: OrderManager(
+            data_folder=data_folder, storage=BinaryOrderStorage(data_folder)))
+        snapshot = timed("snapshot open (checksum only)", lambda: OrderSnapshot(
+            os.path.join(data_folder, "orders.snap")))
+        timed("  filled orders per ticker", lambda: [len(snapshot.rows(ticker_id=ticker_id, needs_fills=False))
+                                                    for ticker_id in (1, 2, 3)])
+        snapshot.close()
+
+
+if __name__ == "__main__":
+    main()
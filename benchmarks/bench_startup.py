@@ -0,0 +1,54 @@
+# benchmarks/bench_startup.py
+"""Measures the time from process start to the first order placed, for each load mode"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PACKAGE_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PACKAGE_FOLDER)
+
+from order_manager import LOAD_MODES, OrderDetails, OrderManager
+
+WORKER = """
+from order_manager import OrderManager, OrderDetails
+manager = OrderManager(data_folder={data_folder!r}, journal=True, load={load!r})
+manager.add_order(OrderDetails(ticker_id=1001, order_quantity=10, order_price=5.0))
+manager.close()
+"""
+
+
+def time_process(code: str, runs: int) -> float:
+    """Median wall time of a fresh interpreter running code, in ms"""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], check=True, env={**os.environ, "PYTHONPATH": PACKAGE_FOLDER})
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--orders", type=int, default=10000, help="Orders saved before the workers start")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_folder:
+        manager = OrderManager(data_folder=data_folder)
+        manager.add_orders([OrderDetails(ticker_id=1000 + idx % 50, order_quantity=10, order_price=5.0)
+                            for idx in range(args.orders)], save=True)
+        manager.close()
+
+        print(f"{'python -c pass':>24}: {time_process('pass', args.runs):7.1f} ms")
+        print(f"{'import order_manager':>24}: {time_process('import order_manager', args.runs):7.1f} ms")
+        for load in LOAD_MODES:
+            elapsed = time_process(WORKER.format(data_folder=data_folder, load=load), args.runs)
+            print(f"{f'first order ({load})':>24}: {elapsed:7.1f} ms with {args.orders:,} saved orders")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+# benchmarks/run_benchmarks.py
+"""
+Times the main OrderManager operations on synthetic orders and fills at several scales
+
+Every operation runs on a fresh manager, once for throughput and once under tracemalloc for peak memory. Results are
+written as JSON, and --compare flags operations that got slower or use more memory than a stored baseline.
+
+    python benchmarks/run_benchmarks.py --scales 1000,10000 --output results.json
+    python benchmarks/run_benchmarks.py --scales 1000,10000 --compare results.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_manager import OrderManager, OrderDetails
+
+DEFAULT_SCALES = (1000, 10000, 100000, 1000000)
+DEFAULT_THRESHOLD = 0.2 # Relative change that counts as a regression
+APPEND_CHANGES = 1000 # Orders changed between saving and the timed append_orders
+
+
+@dataclass
+class BenchmarkResult:
+    operation: str
+    scale: int
+    items: int # Orders or fills handled by one run of the operation
+    seconds: float
+    items_per_second: float
+    peak_memory_bytes: Optional[int] = None
+
+
+def make_details(count: int, seed: int = 0) -> List[OrderDetails]:
+    """Synthetic orders spread over 50 tickers and 3 exchanges"""
+    rng = random.Random(seed)
+    return [
+        OrderDetails(ticker_id=1000 + rng.randrange(50), order_quantity=100 * rng.randint(1, 10),
+                     order_price=round(rng.uniform(10, 500), 2), exchange_id=rng.randint(1, 3))
+        for _ in range(count)
+    ]
+
+
+def make_fills(manager: OrderManager, seed: int = 0) -> List[Tuple[int, float, float]]:
+    """One fill per order, for half of the quantity of every other order and all of it for the rest"""
+    rng = random.Random(seed)
+    fills = []
+    for order in manager.orders:
+        quantity = order.quantity / 2 if order.order_number % 2 else order.quantity
+        fills.append((order.order_number, order.order_price, quantity))
+    rng.shuffle(fills)
+    return fills
+
+
+def _manager(data_folder: str, scale: int, filled: bool = False, saved: bool = False) -> OrderManager:
+    """A manager holding `scale` orders, optionally filled and saved"""
+    manager = OrderManager(data_folder=data_folder)
+    manager.add_orders(make_details(scale))
+    if filled:
+        manager.fill_orders(make_fills(manager))
+    if saved:
+        manager.save_orders()
+    return manager
+
+
+# Each benchmark has a setup that builds its state in a data folder, and a run that does the timed work and returns
+# how many items it handled
+def _setup_add_order(data_folder: str, scale: int):
+    return OrderManager(data_folder=data_folder), make_details(scale)
+
+
+def _run_add_order(state) -> int:
+    manager, details = state
+    for order_details in details:
+        manager.add_order(order_details)
+    return len(details)
+
+
+def _setup_fill_order(data_folder: str, scale: int):
+    manager = _manager(data_folder, scale)
+    return manager, make_fills(manager)
+
+
+def _run_fill_order(state) -> int:
+    manager, fills = state
+    for order_number, fill_price, fill_quantity in fills:
+        manager.fill_order(order_number, fill_price, fill_quantity)
+    return len(fills)
+
+
+def _setup_get_order(data_folder: str, scale: int):
+    manager = _manager(data_folder, scale)
+    order_numbers = list(range(1, scale + 1))
+    random.Random(0).shuffle(order_numbers)
+    return manager, order_numbers
+
+
+def _run_get_order(state) -> int:
+    manager, order_numbers = state
+    for order_number in order_numbers:
+        manager.get_order(order_number)
+    return len(order_numbers)
+
+
+def _setup_filled_manager(data_folder: str, scale: int):
+    return _manager(data_folder, scale, filled=True)
+
+
+def _run_get_open_orders(manager: OrderManager) -> int:
+    manager.get_open_orders()
+    return len(manager.orders)
+
+
+def _run_save_orders(manager: OrderManager) -> int:
+    manager.save_orders()
+    return len(manager.orders)
+
+
+def _setup_saved_manager(data_folder: str, scale: int):
+    return _manager(data_folder, scale, filled=True, saved=True)
+
+
+def _setup_append_orders(data_folder: str, scale: int):
+    # A saved history of `scale` orders with a fixed number of changes since, append cost depends on the changes
+    manager = _manager(data_folder, scale, filled=True, saved=True)
+    manager.add_orders(make_details(APPEND_CHANGES))
+    return manager
+
+
+def _run_append_orders(manager: OrderManager) -> int:
+    return manager.append_orders()
+
+
+def _setup_load_orders(data_folder: str, scale: int):
+    _manager(data_folder, scale, filled=True, saved=True).close()
+    return data_folder
+
+
+def _run_load_orders(data_folder: str) -> int:
+    manager = OrderManager(data_folder=data_folder)
+    return len(manager.orders)
+
+
+def _run_get_orders_as_dataframe(manager: OrderManager) -> int:
+    return len(manager.get_orders_as_dataframe())
+
+
+BENCHMARKS: Dict[str, Tuple[Callable[[str, int], Any], Callable[[Any], int]]] = {
+    "add_order": (_setup_add_order, _run_add_order),
+    "fill_order": (_setup_fill_order, _run_fill_order),
+    "get_order": (_setup_get_order, _run_get_order),
+    "get_open_orders": (_setup_filled_manager, _run_get_open_orders),
+    "save_orders": (_setup_filled_manager, _run_save_orders),
+    "append_orders": (_setup_append_orders, _run_append_orders),
+    "load_orders": (_setup_load_orders, _run_load_orders),
+    "get_orders_as_dataframe": (_setup_saved_manager, _run_get_orders_as_dataframe),
+}
+
+
+def _close(state) -> None:
+    manager = state[0] if isinstance(state, tuple) else state
+    if isinstance(manager, OrderManager):
+        manager.close()
+
+
+def run_benchmark(operation: str, scale: int, measure_memory: bool = True) -> BenchmarkResult:
+    """Runs one operation at one scale, each measurement on fresh state"""
+    setup, run = BENCHMARKS[operation]
+
+    with tempfile.TemporaryDirectory() as data_folder:
+        state = setup(data_folder, scale)
+        start = time.perf_counter()
+        items = run(state)
+        seconds = time.perf_counter() - start
+        _close(state)
+
+    peak_memory = None
+    if measure_memory:
+        # tracemalloc slows allocation down, so memory is measured on a separate run
+        with tempfile.TemporaryDirectory() as data_folder:
+            state = setup(data_folder, scale)
+            tracemalloc.start()
+            try:
+                run(state)
+                _, peak_memory = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            _close(state)
+
+    return BenchmarkResult(operation=operation, scale=scale, items=items, seconds=round(seconds, 6),
+                           items_per_second=round(items / seconds, 1) if seconds > 0 else float("inf"),
+                           peak_memory_bytes=peak_memory)
+
+
+def run_suite(scales, operations, measure_memory: bool = True) -> Dict[str, Any]:
+    """Runs every operation at every scale and returns the results with details of the machine"""
+    results = []
+    for scale in scales:
+        for operation in operations:
+            result = run_benchmark(operation, scale, measure_memory)
+            results.append(result)
+            memory = f", peak {result.peak_memory_bytes / 1e6:,.1f} MB" if result.peak_memory_bytes is not None else ""
+            print(f"{operation:>24} {scale:>9,}: {result.seconds:.3f}s "
+                  f"({result.items_per_second:,.0f} items/s{memory})", flush=True)
+
+    return {
+        "created_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": [asdict(result) for result in results],
+    }
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any],
+                    threshold: float = DEFAULT_THRESHOLD) -> List[Dict[str, Any]]:
+    """
+    Finds operations that got slower or use more memory than in the baseline
+
+    Args:
+    baseline: Results written by an earlier run
+    current: Results of this run
+    threshold: Relative change allowed before it counts, 0.2 allows 20% less throughput or 20% more memory
+
+    Returns:
+    List[Dict]: One entry per regression with the operation, scale, metric, baseline and current values
+    """
+    baseline_results = {(result["operation"], result["scale"]): result for result in baseline["results"]}
+    regressions = []
+
+    for result in current["results"]:
+        previous = baseline_results.get((result["operation"], result["scale"]))
+        if previous is None:
+            continue
+
+        if result["items_per_second"] < previous["items_per_second"] * (1 - threshold):
+            regressions.append(_regression(result, previous, "items_per_second"))
+        if (result.get("peak_memory_bytes") is not None and previous.get("peak_memory_bytes") is not None
+                and result["peak_memory_bytes"] > previous["peak_memory_bytes"] * (1 + threshold)):
+            regressions.append(_regression(result, previous, "peak_memory_bytes"))
+
+    return regressions
+
+
+def _regression(result: Dict[str, Any], previous: Dict[str, Any], metric: str) -> Dict[str, Any]:
+    return {
+        "operation": result["operation"],
+        "scale": result["scale"],
+        "metric": metric,
+        "baseline": previous[metric],
+        "current": result[metric],
+        "change": round(result[metric] / previous[metric] - 1, 4) if previous[metric] else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", default=",".join(str(scale) for scale in DEFAULT_SCALES),
+                        help="Comma separated numbers of orders")
+    parser.add_argument("--operations", default=",".join(BENCHMARKS),
+                        help="Comma separated operations to run, from: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the results")
+    parser.add_argument("--compare", help="Baseline results to check this run against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="Relative slowdown or memory growth that counts as a regression")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc runs")
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    scales = [int(float(scale)) for scale in args.scales.split(",")]
+    operations = args.operations.split(",")
+    unknown = [operation for operation in operations if operation not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown operations: {', '.join(unknown)}")
+
+    current = run_suite(scales, operations, measure_memory=not args.no_memory)
+    with open(args.output, 'w') as file:
+        json.dump(current, file, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        regressions = compare_results(baseline, current, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression['operation']} at {regression['scale']:,}: {regression['metric']} "
+                  f"{regression['baseline']:,} -> {regression['current']:,} ({regression['change']:+.1%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.compare}")
+
+
+if __name__ == "__main__":
+    main()
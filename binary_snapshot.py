@@ -0,0 +1,459 @@
+# binary_snapshot.py
+import argparse
+import logging
+import mmap
+import os
+import struct
+import zlib
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from order_manager import OrderSide, OrderStatus
+from order_storage import JsonOrderStorage, OrderRecord, OrderStorage
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_EXTENSION = ".snap"
+MAGIC = b"ORDSNAP\0"
+VERSION = 1
+
+# Header: magic, version, header size, string count, order count, fill count, orders offset, fills offset,
+# strings offset, highest order number, CRC32 of everything after the header. Padded to HEADER_SIZE.
+HEADER = struct.Struct("<8sHHIQQQQQQI")
+HEADER_SIZE = 128
+
+# Fixed width little endian records. Orders are sorted by order number and each order's fills are the fill_count
+# rows from first_fill, in the order they were added. status and side index the string table.
+ORDER_DTYPE = np.dtype([
+    ("order_number", "<i8"), ("ticker_id", "<i8"), ("exchange_id", "<i8"), ("original_quantity", "<f8"),
+    ("order_price", "<f8"), ("transaction_fee", "<f8"), ("filled_quantity", "<f8"), ("fill_notional", "<f8"),
+    ("created_at", "<i8"), ("first_fill", "<i8"), ("fill_count", "<u4"), ("status", "<u2"), ("side", "<u2"),
+])
+FILL_DTYPE = np.dtype([
+    ("order_number", "<i8"), ("fill_price", "<f8"), ("fill_quantity", "<f8"), ("filled_at", "<i8"),
+])
+
+# Enum values are written to the string table, so files don't depend on the order enums are declared in
+STRINGS = [status.value for status in OrderStatus] + [side.value for side in OrderSide]
+STRING_CODES = {value: code for code, value in enumerate(STRINGS)}
+
+
+def _to_ns(moments: List[datetime]) -> np.ndarray:
+    return np.array(moments, dtype="datetime64[us]").astype(np.int64) * 1000
+
+
+def _from_ns(values: np.ndarray) -> List[datetime]:
+    return (np.asarray(values, dtype=np.int64) // 1000).astype("datetime64[us]").tolist()
+
+
+def _records_to_arrays(orders_data: Iterable[OrderRecord]) -> Tuple[np.ndarray, np.ndarray]:
+    """Packs records in the layout of Order.to_dict into order and fill arrays"""
+    order_rows = []
+    created = []
+    fill_rows = []
+    filled = []
+    for order_data in orders_data:
+        order_number = order_data["order_number"]
+        # Totals are summed in the same order as Order does, so they match what loading the record gives
+        filled_quantity = 0
+        fill_notional = 0
+        for fill_data in order_data["fills"]:
+            filled_quantity += fill_data["fill_quantity"]
+            fill_notional += fill_data["fill_price"] * fill_data["fill_quantity"]
+            fill_rows.append((order_number, fill_data["fill_price"], fill_data["fill_quantity"], 0))
+            filled.append(datetime.fromisoformat(fill_data["filled_at"]))
+        order_rows.append((
+            order_number, order_data["ticker_id"], order_data["exchange_id"], order_data["original_quantity"],
+            order_data["order_price"], order_data.get("transaction_fee", 0.0), filled_quantity, fill_notional, 0,
+            0, len(order_data["fills"]), STRING_CODES[order_data["status"]],
+            STRING_CODES[order_data.get("side", OrderSide.BUY.value)]
+        ))
+        created.append(datetime.fromisoformat(order_data["created_at"]))
+
+    orders = np.array(order_rows, dtype=ORDER_DTYPE)
+    fills = np.array(fill_rows, dtype=FILL_DTYPE)
+    if len(orders):
+        orders["created_at"] = _to_ns(created)
+    if len(fills):
+        fills["filled_at"] = _to_ns(filled)
+    return orders, fills
+
+
+def _write_arrays(path: str, orders: np.ndarray, fills: np.ndarray) -> None:
+    """Sorts the records by order number, links orders to their fills and writes the file atomically"""
+    orders = orders[np.argsort(orders["order_number"], kind="stable")]
+    fills = fills[np.argsort(fills["order_number"], kind="stable")] # Stable keeps each order's fills in order
+    if len(np.unique(orders["order_number"])) != len(orders):
+        raise ValueError("Snapshot records have duplicate order numbers")
+    orders["first_fill"] = np.searchsorted(fills["order_number"], orders["order_number"])
+
+    strings = b"".join(struct.pack("<H", len(value.encode())) + value.encode() for value in STRINGS)
+    orders_offset = HEADER_SIZE
+    fills_offset = orders_offset + orders.nbytes
+    strings_offset = fills_offset + fills.nbytes
+    body = [orders.tobytes(), fills.tobytes(), strings]
+    checksum = 0
+    for part in body:
+        checksum = zlib.crc32(part, checksum)
+    last_order_number = int(orders["order_number"][-1]) if len(orders) else 0
+    header = HEADER.pack(MAGIC, VERSION, HEADER_SIZE, len(STRINGS), len(orders), len(fills), orders_offset,
+                         fills_offset, strings_offset, last_order_number, checksum)
+
+    temp_path = path + ".tmp"
+    with open(temp_path, 'wb') as file:
+        file.write(header.ljust(HEADER_SIZE, b"\0"))
+        for part in body:
+            file.write(part)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temp_path, path)
+
+
+def write_snapshot(path: str, orders_data: Iterable[OrderRecord]) -> int:
+    """
+    Writes orders to a binary snapshot
+
+    Args:
+    path: The snapshot file, replaced atomically
+    orders_data: Orders in the layout of Order.to_dict, e.g. from OrderStorage.load_orders
+
+    Returns:
+    int: The number of orders written
+    """
+    orders, fills = _records_to_arrays(orders_data)
+    _write_arrays(path, orders, fills)
+    return len(orders)
+
+
+class OrderSnapshot:
+    """
+    A binary snapshot opened with mmap
+
+    orders and fills are NumPy record arrays that read straight from the mapped file, so opening a snapshot costs
+    the header, the string table and (with verify) one checksum pass. Only the records asked for are turned into
+    dictionaries. The arrays are only valid until close.
+    """
+
+    def __init__(self, path: str, verify: bool = True):
+        """
+        Args:
+        path: The snapshot file
+        verify: Check the CRC32 of the records, one sequential read of the file
+        """
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{path} is empty, not an order snapshot")
+
+        try:
+            self._read_header(verify)
+        except Exception:
+            self.close()
+            raise
+
+    def _read_header(self, verify: bool) -> None:
+        if len(self._map) < HEADER_SIZE:
+            raise ValueError(f"{self.path} is too short to be an order snapshot")
+        (magic, version, header_size, string_count, order_count, fill_count, orders_offset, fills_offset,
+         strings_offset, last_order_number, checksum) = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not an order snapshot")
+        if version > VERSION:
+            raise ValueError(f"{self.path} is snapshot version {version}, this code reads up to {VERSION}")
+        if fills_offset != orders_offset + order_count * ORDER_DTYPE.itemsize or \
+                strings_offset != fills_offset + fill_count * FILL_DTYPE.itemsize or strings_offset > len(self._map):
+            raise ValueError(f"{self.path} is truncated or its header is damaged")
+
+        if verify:
+            with memoryview(self._map) as view:
+                body = view[header_size:]
+                actual = zlib.crc32(body)
+                body.release()
+            if actual != checksum:
+                raise ValueError(f"{self.path} failed its checksum, the file is damaged")
+
+        self.strings = []
+        position = strings_offset
+        for _ in range(string_count):
+            (length,) = struct.unpack_from("<H", self._map, position)
+            self.strings.append(self._map[position + 2:position + 2 + length].decode())
+            position += 2 + length
+
+        self.last_order_number = last_order_number
+        self.orders = np.frombuffer(self._map, dtype=ORDER_DTYPE, count=order_count, offset=orders_offset)
+        self.fills = np.frombuffer(self._map, dtype=FILL_DTYPE, count=fill_count, offset=fills_offset)
+
+    def __enter__(self) -> "OrderSnapshot":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.orders)
+
+    def close(self) -> None:
+        """Unmaps the file, arrays taken from orders and fills must not be used afterwards"""
+        self.orders = self.fills = None
+        if not self._map.closed:
+            try:
+                self._map.close()
+            except BufferError:
+                # A caller still holds a view, the mapping goes when that view does
+                pass
+        self._file.close()
+
+    def _code(self, value: str) -> int:
+        return self.strings.index(value) if value in self.strings else -1
+
+    def find(self, order_number: int) -> Optional[int]:
+        """Returns the row of an order number by binary search, None if it isn't in the snapshot"""
+        order_numbers = self.orders["order_number"]
+        row = int(np.searchsorted(order_numbers, order_number))
+        if row < len(order_numbers) and order_numbers[row] == order_number:
+            return row
+        return None
+
+    def rows(self, ticker_id: Optional[int] = None, exchange_id: Optional[int] = None,
+             status: Optional[OrderStatus] = None, needs_fills: Optional[bool] = None) -> np.ndarray:
+        """Returns the rows matching every filter given, read from the mapped columns"""
+        mask = np.ones(len(self.orders), dtype=bool)
+        if ticker_id is not None:
+            mask &= self.orders["ticker_id"] == ticker_id
+        if exchange_id is not None:
+            mask &= self.orders["exchange_id"] == exchange_id
+        if status is not None:
+            mask &= self.orders["status"] == self._code(status.value)
+        if needs_fills is not None:
+            filled = self.orders["status"] == self._code(OrderStatus.FILLED.value)
+            mask &= ~filled if needs_fills else filled
+        return np.flatnonzero(mask)
+
+    def records(self, rows: Optional[Iterable[int]] = None) -> Iterator[OrderRecord]:
+        """Yields rows (default all) in the layout of Order.to_dict, a block of rows at a time"""
+        rows = np.arange(len(self.orders)) if rows is None else np.asarray(rows, dtype=np.int64)
+        for start in range(0, len(rows), 4096):
+            yield from self._records_block(rows[start:start + 4096])
+
+    def record(self, row: int) -> OrderRecord:
+        return next(self._records_block(np.array([row])))
+
+    def _records_block(self, rows: np.ndarray) -> Iterator[OrderRecord]:
+        block = self.orders[rows]
+        created = list(map(str, _from_ns(block["created_at"])))
+        fill_rows = np.concatenate([np.arange(first, first + count) for first, count in
+                                    zip(block["first_fill"].tolist(), block["fill_count"].tolist())] or [[]])
+        fill_block = self.fills[fill_rows.astype(np.int64)]
+        fill_times = list(map(str, _from_ns(fill_block["filled_at"])))
+        fill_prices = fill_block["fill_price"].tolist()
+        fill_quantities = fill_block["fill_quantity"].tolist()
+        filled_status = self._code(OrderStatus.FILLED.value)
+
+        position = 0
+        for index, order in enumerate(block.tolist()):
+            (order_number, ticker_id, exchange_id, quantity, price, fee, filled_quantity, fill_notional, _, _,
+             fill_count, status, side) = order
+            end = position + fill_count
+            fills = [
+                {"fill_price": fill_price, "fill_quantity": fill_quantity, "filled_at": filled_at}
+                for fill_price, fill_quantity, filled_at in zip(
+                    fill_prices[position:end], fill_quantities[position:end], fill_times[position:end]
+                )
+            ]
+            position = end
+            yield {
+                "order_number": order_number,
+                "ticker_id": ticker_id,
+                "exchange_id": exchange_id,
+                "side": self.strings[side],
+                "original_quantity": quantity,
+                "order_price": price,
+                "created_at": created[index],
+                "status": self.strings[status],
+                "needs_fills": status != filled_status,
+                "filled_quantity": filled_quantity,
+                "remaining_quantity": quantity - filled_quantity,
+                "average_fill_price": fill_notional / filled_quantity if fill_count else 0.0,
+                "transaction_fee": fee,
+                "fills": fills
+            }
+
+    def portable_arrays(self, keep: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Copies the records (optionally only the rows in keep) with codes for this code's string table"""
+        orders = self.orders[keep] if keep is not None else self.orders.copy()
+        fills = self.fills[np.isin(self.fills["order_number"], orders["order_number"])]
+        remap = np.array([STRING_CODES.get(value, 0) for value in self.strings], dtype=np.uint16)
+        if len(orders):
+            orders["status"] = remap[orders["status"]]
+            orders["side"] = remap[orders["side"]]
+        return orders, fills
+
+
+def json_to_snapshot(json_path: str, snapshot_path: str) -> int:
+    """Converts an orders.json (or .jsonl) file to a binary snapshot, returns the number of orders"""
+    folder, filename = os.path.split(json_path)
+    records = JsonOrderStorage(folder or ".").load_orders(filename)
+    if records is None:
+        raise FileNotFoundError(json_path)
+    count = write_snapshot(snapshot_path, records)
+    logger.info("Converted %s orders from %s to %s", count, json_path, snapshot_path)
+    return count
+
+
+def snapshot_to_json(snapshot_path: str, json_path: str, indent: Optional[int] = 4) -> int:
+    """Converts a binary snapshot to the orders.json (or .jsonl) layout, returns the number of orders"""
+    folder, filename = os.path.split(json_path)
+    with OrderSnapshot(snapshot_path) as snapshot:
+        count = len(snapshot)
+        JsonOrderStorage(folder or ".", indent=indent).save_orders(snapshot.records(), filename)
+    logger.info("Converted %s orders from %s to %s", count, snapshot_path, json_path)
+    return count
+
+
+class BinaryOrderStorage(OrderStorage):
+    """
+    Keeps orders in a binary snapshot per filename, e.g. orders.json is stored as orders.snap
+
+    In lazy mode (the default) load_orders only returns orders that still need fills, and read_order finds filled
+    orders in the mapped file by binary search. A snapshot can't be appended to in place: saving merges the orders
+    given into the saved ones and writes a new file, so pair it with the journal rather than frequent saves.
+    """
+
+    def __init__(self, data_folder: str, lazy: bool = True, verify: bool = True):
+        """
+        Args:
+        data_folder: Folder holding the snapshot files
+        lazy: Load only orders that still need fills, page the rest in from the snapshot
+        verify: Check each snapshot's checksum when it is opened
+        """
+        self.data_folder = data_folder
+        self.lazy = lazy
+        self.verify = verify
+        self._snapshots: Dict[str, OrderSnapshot] = {}
+
+    def _file_path(self, filename: str) -> str:
+        return os.path.join(self.data_folder, os.path.splitext(filename)[0] + SNAPSHOT_EXTENSION)
+
+    def _snapshot(self, filename: str) -> Optional[OrderSnapshot]:
+        snapshot = self._snapshots.get(filename)
+        if snapshot is None and os.path.exists(self._file_path(filename)):
+            snapshot = self._snapshots[filename] = OrderSnapshot(self._file_path(filename), self.verify)
+        return snapshot
+
+    def _close_snapshot(self, filename: str) -> None:
+        snapshot = self._snapshots.pop(filename, None)
+        if snapshot is not None:
+            snapshot.close()
+
+    def _write(self, orders_data: List[OrderRecord], filename: str, keep_saved: bool) -> None:
+        """Writes a new snapshot of the given orders, plus the saved orders not among them if keep_saved"""
+        orders, fills = _records_to_arrays(orders_data)
+        snapshot = self._snapshot(filename)
+        if snapshot is not None and keep_saved:
+            kept_orders, kept_fills = snapshot.portable_arrays(
+                np.flatnonzero(~np.isin(snapshot.orders["order_number"], orders["order_number"]))
+            )
+            orders = np.concatenate([kept_orders, orders])
+            fills = np.concatenate([kept_fills, fills])
+        self._close_snapshot(filename) # The file is replaced, and mapped files can't be replaced on every platform
+        _write_arrays(self._file_path(filename), orders, fills)
+
+    def save_orders(self, orders_data: List[OrderRecord], filename: str) -> None:
+        # Filled orders that were never paged in only exist in the snapshot, so lazy mode keeps them
+        self._write(orders_data, filename, keep_saved=self.lazy)
+
+    def append_orders(self, orders_data: List[OrderRecord], filename: str) -> None:
+        self._write(orders_data, filename, keep_saved=True)
+
+    def load_orders(self, filename: str) -> Optional[Iterable[OrderRecord]]:
+        snapshot = self._snapshot(filename)
+        if snapshot is None:
+            logger.info("No saved orders snapshot found at %s", self._file_path(filename))
+            return None
+        return snapshot.records(snapshot.rows(needs_fills=True) if self.lazy else None)
+
+    def read_order(self, filename: str, order_number: int) -> Optional[OrderRecord]:
+        snapshot = self._snapshot(filename)
+        row = snapshot.find(order_number) if snapshot is not None else None
+        return snapshot.record(row) if row is not None else None
+
+    def iter_orders(self, filename: str) -> Iterator[OrderRecord]:
+        snapshot = self._snapshot(filename)
+        if snapshot is not None:
+            yield from snapshot.records()
+
+    def last_order_number(self, filename: str) -> int:
+        snapshot = self._snapshot(filename)
+        return snapshot.last_order_number if snapshot is not None else 0
+
+    def get_orders_as_dataframe(self, filename: str, ticker_id: Optional[int] = None,
+                                exchange_id: Optional[int] = None, status: Optional[str] = None) -> "pd.DataFrame":
+        import pandas as pd
+
+        snapshot = self._snapshot(filename)
+        if snapshot is None:
+            logger.warning("No saved orders snapshot found at %s", self._file_path(filename))
+            return pd.DataFrame()
+
+        rows = snapshot.rows(ticker_id, exchange_id, OrderStatus(status) if status is not None else None)
+        if not len(rows):
+            return pd.DataFrame()
+
+        # Columns are built from the mapped arrays, only the fills are grouped per order
+        orders = snapshot.orders[rows]
+        strings = np.array(snapshot.strings, dtype=object)
+        filled_quantity = orders["filled_quantity"]
+        orders_df = pd.DataFrame({
+            "order_number": orders["order_number"],
+            "ticker_id": orders["ticker_id"],
+            "exchange_id": orders["exchange_id"],
+            "side": strings[orders["side"]],
+            "original_quantity": orders["original_quantity"],
+            "order_price": orders["order_price"],
+            "created_at": pd.to_datetime(orders["created_at"]),
+            "status": strings[orders["status"]],
+            "needs_fills": strings[orders["status"]] != OrderStatus.FILLED.value,
+            "filled_quantity": filled_quantity,
+            "remaining_quantity": orders["original_quantity"] - filled_quantity,
+            "average_fill_price": np.divide(orders["fill_notional"], filled_quantity,
+                                            out=np.zeros(len(orders)), where=orders["fill_count"] > 0),
+            "transaction_fee": orders["transaction_fee"],
+        })
+
+        fills_df = pd.DataFrame(snapshot.fills[np.isin(snapshot.fills["order_number"], orders["order_number"])])
+        fills_df["filled_at"] = pd.to_datetime(fills_df["filled_at"])
+        fills_by_order = {
+            order_number: group.drop(columns="order_number").reset_index(drop=True)
+            for order_number, group in fills_df.groupby("order_number")
+        }
+        orders_df["fills"] = [fills_by_order.get(order_number, []) for order_number in orders_df["order_number"]]
+        return orders_df
+
+    def close(self) -> None:
+        for filename in list(self._snapshots):
+            self._close_snapshot(filename)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Converts between orders.json files and binary order snapshots")
+    parser.add_argument("source", help="A .json or .jsonl orders file, or a .snap snapshot")
+    parser.add_argument("target", help="The file to write, a snapshot if the source is JSON and JSON otherwise")
+    args = parser.parse_args()
+
+    if args.source.endswith(SNAPSHOT_EXTENSION):
+        count = snapshot_to_json(args.source, args.target)
+    else:
+        count = json_to_snapshot(args.source, args.target)
+    print(f"Converted {count:,} orders")
+
+
+if __name__ == '__main__':
+    from order_logging import configure_logging
+    configure_logging()
+    main()
@@ -0,0 +1,266 @@
+# change_feed.py
+import bisect
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import TYPE_CHECKING, Callable, Iterator, List, NamedTuple, Optional, Tuple
+
+from order_manager import Order, OrderFill, OrderStatus
+
+if TYPE_CHECKING:
+    from order_manager import OrderManager
+
+logger = logging.getLogger(__name__)
+
+CHANGE_KINDS = ("order_added", "fill_added", "status_changed")
+SPILL_INDEX_EVERY = 1024 # Spilled events between entries of the in-memory offset index
+
+
+class CursorExpired(ValueError):
+    """The events after a cursor are no longer in the feed, the consumer has to read the full state again"""
+
+
+class ChangeEvent(NamedTuple):
+    """One change to an order, numbered in the order the feed saw it"""
+    sequence: int
+    kind: str # One of CHANGE_KINDS
+    order_number: int
+    ticker_id: int
+    exchange_id: int
+    side: str
+    status: str # Status of the order after the change
+    fill_price: Optional[float] # Set for fill_added
+    fill_quantity: Optional[float]
+    at: datetime # When the order was created or filled
+
+    def to_line(self) -> bytes:
+        """Returns the event as a JSON array in field order, the spill file's format"""
+        # Formatted directly, json.dumps was most of the cost of spilling. Kinds, sides and statuses are plain words.
+        fill_price = "null" if self.fill_price is None else repr(float(self.fill_price))
+        fill_quantity = "null" if self.fill_quantity is None else repr(float(self.fill_quantity))
+        return (f'[{self.sequence},"{self.kind}",{self.order_number},{self.ticker_id},{self.exchange_id},'
+                f'"{self.side}","{self.status}",{fill_price},{fill_quantity},"{self.at}"]\n').encode()
+
+    @classmethod
+    def from_line(cls, line: bytes) -> "ChangeEvent":
+        values = json.loads(line)
+        values[-1] = datetime.fromisoformat(values[-1])
+        return cls(*values)
+
+
+class ChangeFeed:
+    """
+    Numbered order changes for consumers that pull what happened since their last cursor
+
+    The newest events sit in a ring buffer of fixed capacity, so reading the changes since a recent cursor costs
+    O(changes). With a spill file every event is also appended to disk, so cursors older than the ring can still be
+    read and sequence numbers carry on across restarts. Without one, a cursor that has fallen out of the ring raises
+    CursorExpired and the consumer reloads from the manager.
+    """
+
+    def __init__(self, capacity: int = 65536, spill_path: Optional[str] = None):
+        """
+        Args:
+        capacity: Events kept in memory
+        spill_path: JSON lines file every event is appended to, None to keep events in memory only
+        """
+        if capacity < 1:
+            raise ValueError(f"capacity must be at least 1, got {capacity}")
+        self.capacity = capacity
+        self.spill_path = spill_path
+        self.manager: Optional["OrderManager"] = None
+        self._ring: List[Optional[ChangeEvent]] = [None] * capacity
+        self._sequence = 0
+        self._first_sequence = 1 # First sequence held by this process's ring
+        self._subscribers: List[Callable[[ChangeEvent], None]] = []
+        # Waiters in changes_since are woken by each publish
+        self._condition = threading.Condition(threading.RLock())
+
+        self._spill_file = None
+        self._spill_index: List[Tuple[int, int]] = [] # (sequence, byte offset) of every SPILL_INDEX_EVERY-th event
+        self._spill_first = 0
+        if spill_path is not None:
+            self._open_spill()
+
+    def _open_spill(self) -> None:
+        """Reads the spill file's offsets and last sequence, dropping a torn last line"""
+        if os.path.exists(self.spill_path):
+            with open(self.spill_path, 'rb') as file:
+                offset = 0
+                for line in file:
+                    try:
+                        sequence = json.loads(line)[0]
+                    except ValueError:
+                        logger.warning("Dropping incomplete change event at byte %s of %s", offset, self.spill_path)
+                        break
+                    if not self._spill_first:
+                        self._spill_first = sequence
+                    if sequence == self._spill_first or sequence % SPILL_INDEX_EVERY == 0:
+                        self._spill_index.append((sequence, offset))
+                    self._sequence = sequence
+                    offset += len(line)
+            if offset < os.path.getsize(self.spill_path):
+                with open(self.spill_path, 'r+b') as file:
+                    file.truncate(offset)
+        self._spill_file = open(self.spill_path, 'ab')
+        self._first_sequence = self._sequence + 1
+        if self._sequence:
+            logger.info("Change feed %s continues after sequence %s", self.spill_path, self._sequence)
+
+    @classmethod
+    def for_manager(cls, manager: "OrderManager", **kwargs) -> "ChangeFeed":
+        """Creates a feed and attaches it to manager"""
+        feed = cls(**kwargs)
+        feed.attach(manager)
+        return feed
+
+    def attach(self, manager: "OrderManager") -> None:
+        """Publishes the manager's new orders and fills from now on, earlier history is read from the manager"""
+        if self.manager is not None:
+            raise ValueError("ChangeFeed is already attached to an OrderManager")
+        manager.add_order_listener(self._order_added)
+        manager.add_fill_listener(self._fill_added, replay=False)
+        self.manager = manager
+
+    def detach(self) -> None:
+        if self.manager is not None:
+            self.manager.remove_order_listener(self._order_added)
+            self.manager.remove_fill_listener(self._fill_added)
+            self.manager = None
+
+    def close(self) -> None:
+        """Detaches and closes the spill file"""
+        self.detach()
+        with self._condition:
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+
+    @property # Getter
+    def sequence(self) -> int:
+        """Returns the sequence of the newest event, a cursor that is up to date"""
+        return self._sequence
+
+    @property # Getter
+    def oldest_sequence(self) -> int:
+        """Returns the oldest sequence changes_since can still return"""
+        if self._spill_first:
+            return self._spill_first
+        return max(self._first_sequence, self._sequence - self.capacity + 1)
+
+    def _order_added(self, order: Order) -> None:
+        self._publish([("order_added", order, None, order.created_at)])
+
+    def _fill_added(self, order: Order, fill: OrderFill) -> None:
+        changes = [("fill_added", order, fill, fill.filled_at)]
+        # Orders only move forward, so the status before this fill follows from the number of fills
+        old_status = OrderStatus.OPEN if order.fill_count == 1 else OrderStatus.PARTIALLY_FILLED
+        if order.status is not old_status:
+            changes.append(("status_changed", order, None, fill.filled_at))
+        self._publish(changes)
+
+    def _publish(self, changes: List[Tuple[str, Order, Optional[OrderFill], datetime]]) -> None:
+        with self._condition:
+            events = []
+            for kind, order, fill, at in changes:
+                self._sequence += 1
+                event = ChangeEvent(
+                    self._sequence, kind, order.order_number, order.ticker_id, order.exchange_id, order.side.value,
+                    order.status.value, fill.fill_price if fill is not None else None,
+                    fill.fill_quantity if fill is not None else None, at
+                )
+                self._ring[event.sequence % self.capacity] = event
+                events.append(event)
+            if self._spill_file is not None:
+                self._spill(events)
+            for event in events:
+                for subscriber in self._subscribers:
+                    subscriber(event)
+            self._condition.notify_all()
+
+    def _spill(self, events: List[ChangeEvent]) -> None:
+        offset = self._spill_file.tell()
+        lines = []
+        for event in events:
+            line = event.to_line()
+            if not self._spill_first:
+                self._spill_first = event.sequence
+            if event.sequence == self._spill_first or event.sequence % SPILL_INDEX_EVERY == 0:
+                self._spill_index.append((event.sequence, offset))
+            offset += len(line)
+            lines.append(line)
+        # Flushed on every change, so a crash can't hand out a sequence number twice
+        self._spill_file.write(b''.join(lines))
+        self._spill_file.flush()
+
+    def _read_spill(self, start: int, end: int) -> Iterator[ChangeEvent]:
+        """Yields spilled events from sequence start up to end, seeking from the nearest indexed offset"""
+        position = bisect.bisect_right(self._spill_index, (start, float('inf'))) - 1
+        with open(self.spill_path, 'rb') as file:
+            file.seek(self._spill_index[max(position, 0)][1])
+            for line in file:
+                event = ChangeEvent.from_line(line)
+                if event.sequence >= end:
+                    return
+                if event.sequence >= start:
+                    yield event
+
+    def changes_since(self, cursor: int, limit: Optional[int] = None,
+                      timeout: Optional[float] = None) -> Tuple[int, List[ChangeEvent]]:
+        """
+        Returns the events after a cursor
+
+        Args:
+        cursor: Sequence of the last event the consumer has seen, 0 for everything the feed still has
+        limit: Most events to return, the consumer calls again with the new cursor for the rest
+        timeout: Seconds to wait for an event when there are none yet, None to return straight away
+
+        Returns:
+        Tuple[int, List[ChangeEvent]]: The new cursor, and the events after the old one oldest first
+
+        Raises:
+        CursorExpired: When events after the cursor have left the ring and weren't spilled, or the cursor is from
+        a feed that restarted without a spill file
+        """
+        with self._condition:
+            if cursor > self._sequence:
+                raise CursorExpired(f"Cursor {cursor} is ahead of the feed's last sequence {self._sequence}")
+            if timeout is not None and cursor == self._sequence:
+                self._condition.wait_for(lambda: self._sequence > cursor, timeout)
+
+            start, end = cursor + 1, self._sequence + 1
+            if limit is not None:
+                end = min(end, start + limit)
+            ring_first = max(self._first_sequence, self._sequence - self.capacity + 1)
+            events = []
+            if start < ring_first:
+                if not self._spill_first or start < self._spill_first:
+                    raise CursorExpired(f"Events after cursor {cursor} are no longer in the feed")
+                events.extend(self._read_spill(start, min(end, ring_first)))
+            events.extend(self._ring[sequence % self.capacity] for sequence in range(max(start, ring_first), end))
+        return (events[-1].sequence if events else cursor), events
+
+    def subscribe(self, callback: Callable[[ChangeEvent], None], cursor: Optional[int] = None) -> int:
+        """
+        Calls callback with each new event, in sequence order on the thread that made the change
+
+        Args:
+        callback: Called while the feed's lock is held, so it should hand the event off rather than do slow work
+        cursor: Deliver the events after this cursor first, so nothing is missed between a read and subscribing
+
+        Returns:
+        int: The sequence the subscription starts after
+        """
+        with self._condition:
+            if cursor is not None:
+                cursor, events = self.changes_since(cursor)
+                for event in events:
+                    callback(event)
+            self._subscribers = self._subscribers + [callback]
+            return self._sequence
+
+    def unsubscribe(self, callback: Callable[[ChangeEvent], None]) -> None:
+        with self._condition:
+            self._subscribers = [existing for existing in self._subscribers if existing != callback]
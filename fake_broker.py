@@ -0,0 +1,175 @@
+# fake_broker.py
+"""A local HTTP server that answers GET /v2/orders like Alpaca, for testing and benchmarking reconciliation"""
+import bisect
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from order_manager import Order
+
+logger = logging.getLogger(__name__)
+
+MAX_PAGE = 500 # Alpaca's largest page
+_OPEN_STATUSES = ("new", "partially_filled", "accepted", "pending_new")
+
+
+def broker_record(order: Order, filled_quantity: Optional[float] = None, average_fill_price: Optional[float] = None,
+                  status: Optional[str] = None, client_order_id: Optional[str] = None, symbol: Optional[str] = None,
+                  broker_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Returns the broker's copy of a local order in Alpaca's layout, by default matching it
+
+    Args:
+    order: The local order, submitted at its created_at
+    filled_quantity: Fill quantity the broker reports, the order's own by default
+    average_fill_price: Average fill price the broker reports, the order's own by default
+    status: The broker's status word, by default from the fill quantity
+    client_order_id: By default the order number
+    symbol: By default the ticker id
+    broker_id: By default derived from the order number
+    """
+    filled_quantity = order.filled_quantity if filled_quantity is None else filled_quantity
+    if average_fill_price is None and order.fill_count:
+        average_fill_price = order.average_fill_price
+    if status is None:
+        status = "filled" if filled_quantity >= order.quantity else "partially_filled" if filled_quantity else "new"
+    submitted_at = order.created_at.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+    return {
+        "id": broker_id or f"broker-{order.order_number}",
+        "client_order_id": client_order_id if client_order_id is not None else str(order.order_number),
+        "symbol": symbol if symbol is not None else str(order.ticker_id),
+        "side": order.side.value,
+        "type": "market",
+        "qty": str(order.quantity),
+        "filled_qty": str(filled_quantity),
+        "filled_avg_price": str(average_fill_price) if average_fill_price is not None else None,
+        "status": status,
+        "created_at": submitted_at,
+        "submitted_at": submitted_at,
+    }
+
+
+class FakeBroker:
+    """
+    Serves a list of orders, paged and filtered by the same query parameters as Alpaca's GET /v2/orders
+
+    Supports status (all, open, closed), after and until (both exclusive), limit (capped at 500) and direction. Each
+    order is encoded to JSON once when it is added, so pages cost little to serve. Use it as a context manager, or
+    call start and stop.
+    """
+
+    def __init__(self, records: Iterable[Dict[str, Any]] = (), host: str = "127.0.0.1", port: int = 0,
+                 latency: float = 0.0):
+        """
+        Args:
+        records: Orders in Alpaca's layout, e.g. from broker_record
+        host: Address to listen on
+        port: Port to listen on, 0 for any free port
+        latency: Seconds each response is held back, to stand in for the network
+        """
+        self.latency = latency
+        self.requests = 0
+        self._times: List[datetime] = []
+        self._records: List[Dict[str, Any]] = []
+        self._bodies: List[bytes] = []
+        self._by_id: Dict[str, Tuple[datetime, Dict[str, Any], bytes]] = {}
+        self._lock = threading.Lock()
+        self.add_records(records)
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property # Getter
+    def url(self) -> str:
+        """Returns the base URL to give an HttpBrokerAdapter"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def add_records(self, records: Iterable[Dict[str, Any]]) -> None:
+        """Adds orders, or replaces the ones with the same id"""
+        with self._lock:
+            for record in records:
+                submitted_at = datetime.fromisoformat(record["submitted_at"].replace("Z", "+00:00"))
+                self._by_id[record["id"]] = (submitted_at, record, json.dumps(record).encode())
+            entries = sorted(self._by_id.values(), key=lambda entry: entry[0])
+            self._times = [entry[0] for entry in entries]
+            self._records = [entry[1] for entry in entries]
+            self._bodies = [entry[2] for entry in entries]
+
+    def start(self) -> "FakeBroker":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-broker", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self) -> "FakeBroker":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    def _page(self, query: Dict[str, List[str]]) -> bytes:
+        def value(name: str) -> Optional[str]:
+            return query[name][0] if name in query else None
+
+        after, until = value("after"), value("until")
+        status = value("status") or "open"
+        with self._lock:
+            self.requests += 1
+            first = 0 if after is None else bisect.bisect_right(
+                self._times, datetime.fromisoformat(after.replace("Z", "+00:00")))
+            last = len(self._times) if until is None else bisect.bisect_left(
+                self._times, datetime.fromisoformat(until.replace("Z", "+00:00")))
+            indexes = range(first, last) if value("direction") == "asc" else range(last - 1, first - 1, -1)
+            limit = min(int(value("limit") or 50), MAX_PAGE)
+            bodies = []
+            for index in indexes:
+                if status != "all" and (self._records[index]["status"] in _OPEN_STATUSES) != (status == "open"):
+                    continue
+                bodies.append(self._bodies[index])
+                if len(bodies) == limit:
+                    break
+        return b"[" + b",".join(bodies) + b"]"
+
+    def _handler_class(self) -> type:
+        broker = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # Keep-alive, so clients can reuse connections
+
+            def do_GET(self) -> None:
+                parts = urlsplit(self.path)
+                if parts.path != "/v2/orders":
+                    self._respond(404, b'{"message": "not found"}')
+                    return
+                try:
+                    body = broker._page(parse_qs(parts.query))
+                except ValueError as e:
+                    self._respond(422, json.dumps({"message": str(e)}).encode())
+                    return
+                if broker.latency:
+                    time.sleep(broker.latency)
+                self._respond(200, body)
+
+            def _respond(self, status: int, body: bytes) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                logger.debug(format, *args)
+
+        return Handler
@@ -0,0 +1,336 @@
+# fill_generator.py
+import argparse
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Iterator, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from order_columns import SIDE_CODES, SIDES
+from order_manager import OrderDetails, OrderManager, OrderSide
+from reference_data import TickerTable
+
+logger = logging.getLogger(__name__)
+
+BUY_CODE = SIDE_CODES[OrderSide.BUY]
+SELL_CODE = SIDE_CODES[OrderSide.SELL]
+
+
+@dataclass
+class GeneratorConfig:
+    """Distributions used by FillGenerator, times are in seconds and spreads are relative to the price"""
+    seed: Optional[int] = None
+    min_lots: int = 1 # Order quantity is a whole number of lots
+    max_lots: int = 100
+    lot_size: float = 1.0
+    price_low: float = 10.0 # Each ticker gets a base price, log-uniform between these
+    price_high: float = 500.0
+    price_spread: float = 0.01 # Standard deviation of order prices around the ticker's base price
+    price_drift: float = 0.002 # Standard deviation of fill prices around the order price
+    tick_size: float = 0.01
+    transaction_fee: float = 0.0
+    buy_fraction: float = 0.5
+    ticker_skew: float = 0.0 # 0 picks tickers evenly, higher values favour the first listed (Zipf like)
+    fill_probability: float = 0.9 # Share of orders that get any fills
+    complete_probability: float = 0.8 # Share of those that are completely filled, the rest stay partially filled
+    mean_fills: float = 2.0 # Mean fills per filled order
+    max_fills: int = 20
+    mean_interarrival: float = 0.001 # Mean time between orders
+    mean_fill_delay: float = 0.05 # Mean time from an order (or its previous fill) to its next fill
+
+
+class OrderBatch(NamedTuple):
+    """Generated orders as columns"""
+    ticker_ids: np.ndarray
+    exchange_ids: np.ndarray
+    quantities: np.ndarray
+    prices: np.ndarray
+    sides: np.ndarray # Codes from order_columns.SIDE_CODES
+    arrivals: np.ndarray # Seconds since the start of the run
+
+
+class FillBatch(NamedTuple):
+    """Generated fills as columns, in time order"""
+    order_indexes: np.ndarray # Row of the filled order in its OrderBatch
+    prices: np.ndarray
+    quantities: np.ndarray
+    times: np.ndarray # Seconds since the start of the run
+
+
+class StreamSummary(NamedTuple):
+    orders: int
+    fills: int
+    rejected_orders: int
+    rejected_fills: int
+    elapsed: float
+
+
+class FillGenerator:
+    """
+    Produces synthetic orders and fills with NumPy, a chunk at a time
+
+    Every chunk is drawn as whole arrays, so the generator stays far faster than the OrderManager calls it feeds.
+    Orders are spread over the listings (ticker id, exchange id) of a ticker table, so a manager checking orders
+    against that table accepts them.
+    """
+
+    def __init__(self, config: Optional[GeneratorConfig] = None, ticker_table: Optional[TickerTable] = None,
+                 listings: Optional[Sequence[Tuple[int, int]]] = None):
+        """
+        Args:
+        config: The distributions to draw from, defaults to GeneratorConfig()
+        ticker_table: Table whose tickers (with their exchanges) are used
+        listings: (ticker_id, exchange_id) pairs to use instead of a ticker table
+        """
+        self.config = config if config is not None else GeneratorConfig()
+        if listings is not None:
+            ticker_ids, exchange_ids = zip(*listings) if listings else ((), ())
+        elif ticker_table is not None:
+            ticker_ids, exchange_ids = ticker_table.listings()
+        else:
+            raise ValueError("Give a ticker_table or listings to generate orders for")
+
+        self.ticker_ids = np.asarray(ticker_ids, dtype=np.int64)
+        self.exchange_ids = np.asarray(exchange_ids, dtype=np.int64)
+        if not len(self.ticker_ids):
+            raise ValueError("There are no tickers to generate orders for")
+
+        config = self.config
+        if not 1 <= config.min_lots <= config.max_lots:
+            raise ValueError("Need 1 <= min_lots <= max_lots")
+        if config.mean_fills < 1 or config.max_fills < 1:
+            raise ValueError("mean_fills and max_fills must be at least 1")
+
+        self.rng = np.random.default_rng(config.seed)
+        self.base_prices = np.exp(self.rng.uniform(np.log(config.price_low), np.log(config.price_high),
+                                                   len(self.ticker_ids)))
+        weights = 1.0 / np.arange(1, len(self.ticker_ids) + 1) ** config.ticker_skew
+        self.ticker_weights = weights / weights.sum()
+        self.clock = 0.0
+
+    def _round_price(self, prices: np.ndarray) -> np.ndarray:
+        tick = self.config.tick_size
+        return np.maximum(np.round(np.round(prices / tick) * tick, 8), tick)
+
+    def orders(self, count: int) -> OrderBatch:
+        """Draws count orders arriving after the previous batch"""
+        config, rng = self.config, self.rng
+        listing = rng.choice(len(self.ticker_ids), size=count, p=self.ticker_weights)
+        lots = rng.integers(config.min_lots, config.max_lots + 1, size=count)
+        prices = self._round_price(self.base_prices[listing] * (1 + rng.normal(0, config.price_spread, count)))
+        sides = np.where(rng.random(count) < config.buy_fraction, BUY_CODE, SELL_CODE).astype(np.int8)
+        arrivals = self.clock + np.cumsum(rng.exponential(config.mean_interarrival, count))
+        if count:
+            self.clock = float(arrivals[-1])
+        return OrderBatch(self.ticker_ids[listing], self.exchange_ids[listing], lots * config.lot_size, prices,
+                          sides, arrivals)
+
+    def fills(self, orders: OrderBatch) -> FillBatch:
+        """Draws the fills of a batch of orders, never more than an order's quantity"""
+        config, rng = self.config, self.rng
+        lots = np.rint(orders.quantities / config.lot_size).astype(np.int64)
+
+        # How many lots each order gets filled: none, some (at least one lot short) or all of them
+        filled = rng.random(len(lots)) < config.fill_probability
+        complete = rng.random(len(lots)) < config.complete_probability
+        short = np.floor(rng.random(len(lots)) * (lots - 1)).astype(np.int64) + 1 # 1 .. lots - 1 lots filled
+        target = np.where(complete | (lots < 2), lots, short)
+        target = np.where(filled, target, 0)
+
+        counts = 1 + rng.poisson(config.mean_fills - 1, len(lots))
+        counts = np.minimum(np.minimum(counts, config.max_fills), target) # Every fill gets at least one lot
+        rows = np.flatnonzero(counts)
+        counts, target = counts[rows], target[rows]
+
+        # Each fill gets one lot, the rest is shared by random weights with the rounding left over on the last fill
+        order_indexes = np.repeat(rows, counts)
+        starts = np.cumsum(counts) - counts
+        weights = rng.random(len(order_indexes))
+        shares = weights / np.repeat(np.add.reduceat(weights, starts), counts) if len(starts) else weights
+        fill_lots = 1 + np.floor(shares * np.repeat(target - counts, counts)).astype(np.int64)
+        if len(starts):
+            fill_lots[starts + counts - 1] += target - np.add.reduceat(fill_lots, starts)
+
+        order_prices = orders.prices[order_indexes]
+        prices = self._round_price(order_prices * (1 + rng.normal(0, config.price_drift, len(order_indexes))))
+
+        # Fills of one order follow each other, starting after the order arrives
+        delays = rng.exponential(config.mean_fill_delay, len(order_indexes))
+        elapsed = np.cumsum(delays)
+        if len(starts):
+            elapsed -= np.repeat(elapsed[starts] - delays[starts], counts)
+        times = orders.arrivals[order_indexes] + elapsed
+
+        by_time = np.argsort(times, kind="stable")
+        return FillBatch(order_indexes[by_time], prices[by_time], fill_lots[by_time] * config.lot_size,
+                         times[by_time])
+
+    def chunks(self, total: int, chunk_size: int = 100000) -> Iterator[Tuple[OrderBatch, FillBatch]]:
+        """Yields (orders, fills) for total orders, chunk_size orders at a time"""
+        remaining = total
+        while remaining > 0:
+            orders = self.orders(min(chunk_size, remaining))
+            remaining -= len(orders.ticker_ids)
+            yield orders, self.fills(orders)
+
+    def order_details(self, orders: OrderBatch) -> List[OrderDetails]:
+        """Converts a batch to OrderDetails for OrderManager.add_orders"""
+        fee = self.config.transaction_fee
+        return [
+            OrderDetails(ticker_id=ticker_id, order_quantity=quantity, order_price=price, exchange_id=exchange_id,
+                         transaction_fee=fee, side=SIDES[side])
+            for ticker_id, quantity, price, exchange_id, side in zip(
+                orders.ticker_ids.tolist(), orders.quantities.tolist(), orders.prices.tolist(),
+                orders.exchange_ids.tolist(), orders.sides.tolist()
+            )
+        ]
+
+    def stream_into(self, manager: OrderManager, total: int, chunk_size: int = 100000) -> StreamSummary:
+        """
+        Adds total orders to the manager and applies their fills, with one add_orders and one fill_orders per chunk
+
+        Returns:
+        StreamSummary: What was added and rejected, and how long it took
+        """
+        start = time.perf_counter()
+        order_count = fill_count = rejected_orders = rejected_fills = 0
+
+        for orders, fills in self.chunks(total, chunk_size):
+            added = manager.add_orders(self.order_details(orders))
+            order_numbers = np.array([order.order_number if order is not None else -1 for order in added.results],
+                                     dtype=np.int64)
+            fill_numbers = order_numbers[fills.order_indexes]
+            accepted = fill_numbers >= 0
+            filled = manager.fill_orders(list(zip(fill_numbers[accepted].tolist(), fills.prices[accepted].tolist(),
+                                                  fills.quantities[accepted].tolist())))
+
+            order_count += added.succeeded
+            fill_count += filled.succeeded
+            rejected_orders += len(added.errors)
+            rejected_fills += len(filled.errors) + int((~accepted).sum())
+
+        summary = StreamSummary(order_count, fill_count, rejected_orders, rejected_fills, time.perf_counter() - start)
+        logger.info("Streamed %s orders and %s fills in %.2fs", order_count, fill_count, summary.elapsed)
+        return summary
+
+    def write_replay(self, path: str, total: int, chunk_size: int = 100000) -> int:
+        """
+        Writes total orders and their fills to a JSON lines replay file for replay()
+
+        Each line is an add_order or fill_order event with the time "at" in seconds. Orders are identified by "id",
+        their position in the file starting at 1. Each chunk writes its add_order events in arrival order and then
+        its fill_order events in fill time order, so every fill follows its order but "at" is not in time order
+        across the two.
+
+        Returns:
+        int: Number of events written
+        """
+        written = 0
+        next_id = 1
+        with open(path, 'w') as file:
+            for orders, fills in self.chunks(total, chunk_size):
+                ids = range(next_id, next_id + len(orders.ticker_ids))
+                next_id += len(orders.ticker_ids)
+                fee = self.config.transaction_fee
+                lines = [
+                    f'{{"op": "add_order", "id": {order_id}, "at": {at:.6f}, "ticker_id": {ticker_id}, '
+                    f'"exchange_id": {exchange_id}, "order_quantity": {quantity}, "order_price": {price}, '
+                    f'"transaction_fee": {fee}, "side": "{SIDES[side].value}"}}\n'
+                    for order_id, at, ticker_id, exchange_id, quantity, price, side in zip(
+                        ids, orders.arrivals.tolist(), orders.ticker_ids.tolist(), orders.exchange_ids.tolist(),
+                        orders.quantities.tolist(), orders.prices.tolist(), orders.sides.tolist()
+                    )
+                ]
+                lines.extend(
+                    f'{{"op": "fill_order", "id": {order_id}, "at": {at:.6f}, "fill_price": {price}, '
+                    f'"fill_quantity": {quantity}}}\n'
+                    for order_id, at, price, quantity in zip(
+                        (fills.order_indexes + ids.start).tolist(), fills.times.tolist(), fills.prices.tolist(),
+                        fills.quantities.tolist()
+                    )
+                )
+                file.writelines(lines)
+                written += len(lines)
+
+        logger.info("Wrote %s replay events to %s", written, path)
+        return written
+
+
+def replay(manager: OrderManager, path: str, chunk_size: int = 100000) -> StreamSummary:
+    """
+    Applies a replay file written by FillGenerator.write_replay, chunk_size events at a time
+
+    Replay ids are mapped to the order numbers the manager gives out, so the file can be replayed into a manager
+    that already holds orders.
+
+    Returns:
+    StreamSummary: What was added and rejected, and how long it took
+    """
+    start = time.perf_counter()
+    order_numbers = {}
+    order_count = fill_count = rejected_orders = rejected_fills = 0
+
+    def apply(events):
+        nonlocal order_count, fill_count, rejected_orders, rejected_fills
+        # A fill always comes after its order, so adding a chunk's orders first keeps every fill valid
+        adds = [event for event in events if event["op"] == "add_order"]
+        added = manager.add_orders([
+            OrderDetails(ticker_id=event["ticker_id"], order_quantity=event["order_quantity"],
+                         order_price=event["order_price"], exchange_id=event["exchange_id"],
+                         transaction_fee=event.get("transaction_fee", 0.0), side=OrderSide(event.get("side", "buy")))
+            for event in adds
+        ])
+        for event, order in zip(adds, added.results):
+            if order is not None:
+                order_numbers[event["id"]] = order.order_number
+
+        fills = []
+        for event in events:
+            if event["op"] != "fill_order":
+                continue
+            order_number = order_numbers.get(event["id"])
+            if order_number is None:
+                rejected_fills += 1
+            else:
+                fills.append((order_number, event["fill_price"], event["fill_quantity"]))
+        filled = manager.fill_orders(fills)
+
+        order_count += added.succeeded
+        fill_count += filled.succeeded
+        rejected_orders += len(added.errors)
+        rejected_fills += len(filled.errors)
+
+    with open(path, 'r') as file:
+        events = []
+        for line in file:
+            events.append(json.loads(line))
+            if len(events) >= chunk_size:
+                apply(events)
+                events = []
+        if events:
+            apply(events)
+
+    summary = StreamSummary(order_count, fill_count, rejected_orders, rejected_fills, time.perf_counter() - start)
+    logger.info("Replayed %s orders and %s fills from %s in %.2fs", order_count, fill_count, path, summary.elapsed)
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Writes a synthetic order and fill replay file")
+    parser.add_argument("output", help="Replay file to write, e.g. replay.jsonl")
+    parser.add_argument("--orders", type=int, default=1000000)
+    parser.add_argument("--ticker-table", default="Data/ticker_table.csv")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=100000)
+    args = parser.parse_args()
+
+    generator = FillGenerator(GeneratorConfig(seed=args.seed), ticker_table=TickerTable(args.ticker_table))
+    start = time.perf_counter()
+    events = generator.write_replay(args.output, args.orders, args.chunk_size)
+    print(f"Wrote {events:,} events for {args.orders:,} orders in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == '__main__':
+    from order_logging import configure_logging
+    configure_logging()
+    main()
@@ -0,0 +1,416 @@
+# fill_store.py
+import json
+import logging
+import os
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Dict, Iterator, List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from order_manager import Order, OrderFill
+
+if TYPE_CHECKING:
+    from order_manager import OrderManager
+
+logger = logging.getLogger(__name__)
+
+FILLS_FOLDER = "fills"
+ROLLUP_INTERVALS = (1, 60, 3600) # Seconds per rollup bucket, each must divide a day
+ROLLUP_FILENAME = "rollups.json"
+STATE_FILENAME = "state.json"
+SECONDS_PER_DAY = 86400
+_EPOCH = datetime(1970, 1, 1)
+
+# Rollup buckets are [count, volume, notional, low, high]
+_COUNT, _VOLUME, _NOTIONAL, _LOW, _HIGH = range(5)
+
+
+class FillRecord(NamedTuple):
+    """A stored fill, with the time it happened"""
+    order_number: int
+    fill_index: int
+    ticker_id: int
+    exchange_id: int
+    side: str
+    fill_price: float
+    fill_quantity: float
+    filled_at: datetime
+
+
+class Bar(NamedTuple):
+    """Fills of one ticker over a time range, from the rollups"""
+    start: datetime
+    seconds: int
+    count: int
+    volume: float
+    notional: float
+    low: Optional[float]
+    high: Optional[float]
+
+    @property # Getter
+    def vwap(self) -> float:
+        """Returns the volume weighted average price, 0 when nothing filled"""
+        return self.notional / self.volume if self.volume else 0.0
+
+
+def _seconds(moment: datetime) -> float:
+    """Seconds since the epoch, naive times are taken as they are like the rest of the manager"""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return (moment - _EPOCH).total_seconds()
+
+
+def _day_name(day: int) -> str:
+    return (date(1970, 1, 1) + timedelta(days=day)).isoformat()
+
+
+class _Day:
+    """Rollups of one day partition, and the raw lines not written yet"""
+
+    def __init__(self):
+        self.rollups: Dict[int, Dict[int, Dict[int, list]]] = {} # Interval -> ticker -> bucket start -> bucket
+        self.raw_sizes: Dict[int, int] = {} # Ticker -> bytes of its raw file the rollups cover
+        self.pending: Dict[int, List[str]] = {} # Ticker -> raw lines waiting for flush
+        self.dirty = False
+
+
+class FillStore:
+    """
+    Fills as a time series, partitioned by day and ticker, with volume and VWAP rollups kept as fills arrive
+
+    Raw fills go to fills/YYYY-MM-DD/<ticker_id>.jsonl. Each day also has a rollups.json with a bucket per
+    interval (1s, 1m and 1h by default) holding the count, volume, notional, low and high of its fills, so range
+    queries add up a handful of buckets rather than scanning fills. Rollups record the raw file sizes they cover, and
+    a day whose raw files grew past them (a flush cut short) is rebuilt from its raw fills when it is read.
+    """
+
+    def __init__(self, folder: str, intervals: Sequence[int] = ROLLUP_INTERVALS, flush_every: int = 1000):
+        """
+        Args:
+        folder: Folder holding the day partitions, created if it doesn't exist
+        intervals: Rollup bucket sizes in seconds, each must divide a day
+        flush_every: Fills buffered before they are written, 0 to only write on flush and close
+        """
+        if not intervals or any(interval < 1 or SECONDS_PER_DAY % interval for interval in intervals):
+            raise ValueError(f"Rollup intervals must be whole seconds that divide a day, got {intervals}")
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self.intervals = tuple(sorted(set(intervals)))
+        self.flush_every = flush_every
+        self.manager: Optional["OrderManager"] = None
+        self._days: Dict[int, _Day] = {}
+        self._empty_days: Set[int] = set() # Days known to have no partition, so range queries skip them quickly
+        self._pending_count = 0
+        self._lock = threading.RLock()
+
+        # Key of the newest fill written, fills at or before it are skipped when a manager's history is replayed
+        self._watermark: Optional[Tuple[datetime, int, int]] = None
+        self._replay_skip: Optional[Tuple[Optional[Tuple[datetime, int, int]], Set[Tuple[int, int]]]] = None
+        self._replay_positions: Dict[int, Dict[int, int]] = {} # Order number -> fill id -> index, during replay
+        state_path = os.path.join(folder, STATE_FILENAME)
+        if os.path.exists(state_path):
+            with open(state_path) as file:
+                state = json.load(file)
+            if state.get("watermark"):
+                filled_at, order_number, fill_index = state["watermark"]
+                self._watermark = (datetime.fromisoformat(filled_at), order_number, fill_index)
+
+    @classmethod
+    def for_manager(cls, manager: "OrderManager", **kwargs) -> "FillStore":
+        """Opens the store in manager's data folder and attaches it"""
+        store = cls(os.path.join(manager.data_folder, FILLS_FOLDER), **kwargs)
+        store.attach(manager)
+        return store
+
+    def attach(self, manager: "OrderManager") -> None:
+        """Adds the manager's fills that aren't stored yet, then stores each new fill as it is added"""
+        if self.manager is not None:
+            raise ValueError("FillStore is already attached to an OrderManager")
+        # Fills written after the watermark by a flush that didn't finish are in the raw files already
+        watermark = self._watermark
+        since = watermark[0] if watermark is not None else _EPOCH
+        stored = {
+            (record.order_number, record.fill_index) for record in self._read_raw(since)
+            if watermark is None or (record.filled_at, record.order_number, record.fill_index) > watermark
+        }
+        # Only the replay is checked against what is stored, new fills are always added. The store's lock isn't
+        # held here, fills arrive holding the manager's locks and then take it.
+        self._replay_skip = (watermark, stored)
+        try:
+            manager.add_fill_listener(self.add_fill)
+        finally:
+            self._replay_skip = None
+            self._replay_positions = {}
+        self.manager = manager
+
+    def detach(self) -> None:
+        """Stops storing the manager's fills and writes the ones buffered"""
+        if self.manager is not None:
+            self.manager.remove_fill_listener(self.add_fill)
+            self.manager = None
+        self.flush()
+
+    def close(self) -> None:
+        self.detach()
+
+    def add_fill(self, order: Order, fill: OrderFill) -> None:
+        """Stores a fill on order, the fill listener added by attach"""
+        fill_index = order.fill_count - 1
+        if order.fills[fill_index] is not fill:
+            # Replayed fills aren't always the last on their order, so each order's fills are indexed once
+            positions = self._replay_positions.get(order.order_number)
+            if positions is None:
+                positions = {id(existing): index for index, existing in enumerate(order.fills)}
+                self._replay_positions[order.order_number] = positions
+            fill_index = positions[id(fill)]
+        if self._replay_skip is not None:
+            watermark, stored = self._replay_skip
+            if watermark is not None and (fill.filled_at, order.order_number, fill_index) <= watermark:
+                return
+            if (order.order_number, fill_index) in stored:
+                return
+        self.add(order.order_number, fill_index, order.ticker_id, order.exchange_id, order.side.value,
+                 fill.fill_price, fill.fill_quantity, fill.filled_at)
+
+    def add(self, order_number: int, fill_index: int, ticker_id: int, exchange_id: int, side: str,
+            fill_price: float, fill_quantity: float, filled_at: datetime) -> None:
+        """Stores one fill and adds it to every rollup"""
+        seconds = _seconds(filled_at)
+        line = json.dumps([order_number, fill_index, exchange_id, side, fill_price, fill_quantity, str(filled_at)],
+                          separators=(',', ':')) + '\n'
+        with self._lock:
+            day = self._day(int(seconds // SECONDS_PER_DAY))
+            day.pending.setdefault(ticker_id, []).append(line)
+            self._roll_up(day, ticker_id, seconds, fill_price, fill_quantity)
+            self._pending_count += 1
+            key = (filled_at, order_number, fill_index)
+            if self._watermark is None or key > self._watermark:
+                self._watermark = key
+            if self.flush_every and self._pending_count >= self.flush_every:
+                self.flush()
+
+    def _roll_up(self, day: _Day, ticker_id: int, seconds: float, fill_price: float, fill_quantity: float) -> None:
+        whole_seconds = int(seconds)
+        for interval in self.intervals:
+            buckets = day.rollups.setdefault(interval, {}).setdefault(ticker_id, {})
+            bucket_start = whole_seconds - whole_seconds % interval
+            bucket = buckets.get(bucket_start)
+            if bucket is None:
+                buckets[bucket_start] = [1, fill_quantity, fill_price * fill_quantity, fill_price, fill_price]
+            else:
+                bucket[_COUNT] += 1
+                bucket[_VOLUME] += fill_quantity
+                bucket[_NOTIONAL] += fill_price * fill_quantity
+                if fill_price < bucket[_LOW]:
+                    bucket[_LOW] = fill_price
+                if fill_price > bucket[_HIGH]:
+                    bucket[_HIGH] = fill_price
+        day.dirty = True
+
+    def _day_folder(self, day: int) -> str:
+        return os.path.join(self.folder, _day_name(day))
+
+    def _raw_path(self, day: int, ticker_id: int) -> str:
+        return os.path.join(self._day_folder(day), f"{ticker_id}.jsonl")
+
+    def _day(self, day: int, create: bool = True) -> Optional[_Day]:
+        """Returns a day's partition, reading its rollups the first time it is used"""
+        partition = self._days.get(day)
+        if partition is not None:
+            return partition
+        if not create and day in self._empty_days:
+            return None
+        folder = self._day_folder(day)
+        if not os.path.isdir(folder):
+            if not create:
+                self._empty_days.add(day)
+                return None
+            os.makedirs(folder, exist_ok=True)
+            self._empty_days.discard(day)
+            partition = self._days[day] = _Day()
+            return partition
+
+        partition = _Day()
+        rollup_path = os.path.join(folder, ROLLUP_FILENAME)
+        if os.path.exists(rollup_path):
+            with open(rollup_path) as file:
+                saved = json.load(file)
+            partition.raw_sizes = {int(ticker_id): size for ticker_id, size in saved["raw_sizes"].items()}
+            for interval, tickers in saved["rollups"].items():
+                partition.rollups[int(interval)] = {
+                    int(ticker_id): {bucket[0]: bucket[1:] for bucket in buckets}
+                    for ticker_id, buckets in tickers.items()
+                }
+
+        raw_sizes = {int(name[:-len(".jsonl")]): os.path.getsize(os.path.join(folder, name))
+                     for name in os.listdir(folder) if name.endswith(".jsonl")}
+        if raw_sizes != partition.raw_sizes or set(partition.rollups) != set(self.intervals):
+            logger.warning("Rollups of %s don't match its raw fills, rebuilding them", folder)
+            partition = self._rebuild_day(day, raw_sizes)
+        self._days[day] = partition
+        return partition
+
+    def _rebuild_day(self, day: int, raw_sizes: Dict[int, int]) -> _Day:
+        partition = _Day()
+        partition.raw_sizes = raw_sizes
+        for ticker_id in raw_sizes:
+            for record in self._read_partition(day, ticker_id):
+                self._roll_up(partition, ticker_id, _seconds(record.filled_at), record.fill_price,
+                              record.fill_quantity)
+        partition.dirty = True
+        return partition
+
+    def _read_partition(self, day: int, ticker_id: int) -> Iterator[FillRecord]:
+        path = self._raw_path(day, ticker_id)
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb') as file:
+            for line in file:
+                try:
+                    order_number, fill_index, exchange_id, side, fill_price, fill_quantity, filled_at = json.loads(line)
+                except ValueError:
+                    logger.warning("Ignoring incomplete fill line in %s", path)
+                    continue
+                yield FillRecord(order_number, fill_index, ticker_id, exchange_id, side, fill_price, fill_quantity,
+                                 datetime.fromisoformat(filled_at))
+
+    def _read_raw(self, since: datetime) -> Iterator[FillRecord]:
+        """Yields the stored fills of every ticker from the day of since onwards"""
+        first_day = _day_name(int(_seconds(since) // SECONDS_PER_DAY))
+        for name in sorted(os.listdir(self.folder)):
+            if name < first_day or not os.path.isdir(os.path.join(self.folder, name)):
+                continue
+            day = (date.fromisoformat(name) - date(1970, 1, 1)).days
+            for filename in os.listdir(os.path.join(self.folder, name)):
+                if filename.endswith(".jsonl"):
+                    yield from self._read_partition(day, int(filename[:-len(".jsonl")]))
+
+    def flush(self) -> None:
+        """Writes buffered fills, then the rollups of the days they changed, then the watermark"""
+        with self._lock:
+            dirty = [(day, partition) for day, partition in self._days.items() if partition.dirty]
+            if not dirty:
+                return
+            for day, partition in dirty:
+                for ticker_id, lines in partition.pending.items():
+                    with open(self._raw_path(day, ticker_id), 'a') as file:
+                        file.writelines(lines)
+                        file.flush()
+                        os.fsync(file.fileno())
+                        partition.raw_sizes[ticker_id] = file.tell()
+                partition.pending = {}
+                self._write_rollups(day, partition)
+                partition.dirty = False
+
+            state_path = os.path.join(self.folder, STATE_FILENAME)
+            watermark = self._watermark
+            with open(state_path + ".tmp", 'w') as file:
+                json.dump({"watermark": [str(watermark[0]), watermark[1], watermark[2]] if watermark else None}, file)
+            os.replace(state_path + ".tmp", state_path)
+            logger.debug("Flushed %s fills over %s days", self._pending_count, len(dirty))
+            self._pending_count = 0
+
+    def _write_rollups(self, day: int, partition: _Day) -> None:
+        path = os.path.join(self._day_folder(day), ROLLUP_FILENAME)
+        saved = {
+            "raw_sizes": {str(ticker_id): size for ticker_id, size in partition.raw_sizes.items()},
+            "rollups": {
+                str(interval): {
+                    str(ticker_id): [[bucket_start] + bucket for bucket_start, bucket in sorted(buckets.items())]
+                    for ticker_id, buckets in tickers.items()
+                }
+                for interval, tickers in partition.rollups.items()
+            }
+        }
+        with open(path + ".tmp", 'w') as file:
+            json.dump(saved, file, separators=(',', ':'))
+        os.replace(path + ".tmp", path)
+
+    def _bucket(self, interval: int, ticker_id: int, bucket_start: int) -> Optional[list]:
+        partition = self._day(bucket_start // SECONDS_PER_DAY, create=False)
+        if partition is None:
+            return None
+        return partition.rollups.get(interval, {}).get(ticker_id, {}).get(bucket_start)
+
+    def _cover(self, start: int, end: int, intervals: Sequence[int]) -> Iterator[Tuple[int, int]]:
+        """Yields the fewest (interval, bucket start) pairs that tile [start, end), largest buckets first"""
+        if start >= end:
+            return
+        interval = intervals[-1]
+        first = -(-start // interval) * interval
+        last = end - end % interval
+        if first >= last and len(intervals) > 1:
+            yield from self._cover(start, end, intervals[:-1])
+            return
+        for bucket_start in range(first, last, interval):
+            yield interval, bucket_start
+        if len(intervals) > 1:
+            yield from self._cover(start, first, intervals[:-1])
+            yield from self._cover(last, end, intervals[:-1])
+
+    def _range(self, start: datetime, end: datetime) -> Tuple[int, int]:
+        """Rounds a time range down to the finest rollup"""
+        finest = self.intervals[0]
+        start_seconds, end_seconds = int(_seconds(start) // 1), int(_seconds(end) // 1)
+        return start_seconds - start_seconds % finest, end_seconds - end_seconds % finest
+
+    def summary(self, ticker_id: int, start: datetime, end: datetime) -> Bar:
+        """
+        Adds up a ticker's fills from start up to end, reading rollups only
+
+        Args:
+        ticker_id: The ticker
+        start, end: The range, rounded down to the finest rollup interval
+
+        Returns:
+        Bar: The count, volume, notional, low and high of the fills in the range
+        """
+        start_seconds, end_seconds = self._range(start, end)
+        count, volume, notional, low, high = 0, 0.0, 0.0, None, None
+        with self._lock:
+            for interval, bucket_start in self._cover(start_seconds, end_seconds, self.intervals):
+                bucket = self._bucket(interval, ticker_id, bucket_start)
+                if bucket is None:
+                    continue
+                count += bucket[_COUNT]
+                volume += bucket[_VOLUME]
+                notional += bucket[_NOTIONAL]
+                low = bucket[_LOW] if low is None else min(low, bucket[_LOW])
+                high = bucket[_HIGH] if high is None else max(high, bucket[_HIGH])
+        return Bar(_EPOCH + timedelta(seconds=start_seconds), end_seconds - start_seconds, count, volume, notional,
+                   low, high)
+
+    def vwap(self, ticker_id: int, start: datetime, end: datetime) -> float:
+        """Returns a ticker's volume weighted average fill price from start up to end, 0 when nothing filled"""
+        return self.summary(ticker_id, start, end).vwap
+
+    def volume(self, ticker_id: int, start: datetime, end: datetime) -> float:
+        """Returns a ticker's filled quantity from start up to end"""
+        return self.summary(ticker_id, start, end).volume
+
+    def bars(self, ticker_id: int, start: datetime, end: datetime, interval: int = 60) -> List[Bar]:
+        """Returns a bar per interval from start up to end that had fills, interval must be one of the rollups"""
+        if interval not in self.intervals:
+            raise ValueError(f"interval must be one of {self.intervals}, got {interval}")
+        start_seconds, end_seconds = self._range(start, end)
+        bars = []
+        with self._lock:
+            for day in range(start_seconds // SECONDS_PER_DAY, (end_seconds - 1) // SECONDS_PER_DAY + 1):
+                partition = self._day(day, create=False)
+                if partition is None:
+                    continue
+                buckets = partition.rollups.get(interval, {}).get(ticker_id, {})
+                for bucket_start in sorted(buckets):
+                    if start_seconds <= bucket_start < end_seconds:
+                        bucket = buckets[bucket_start]
+                        bars.append(Bar(_EPOCH + timedelta(seconds=bucket_start), interval, *bucket))
+        return bars
+
+    def fills(self, ticker_id: int, start: datetime, end: datetime) -> List[FillRecord]:
+        """Returns a ticker's raw fills from start up to end in the order they were stored, reading only those days"""
+        self.flush()
+        start_seconds, end_seconds = _seconds(start), _seconds(end)
+        records = []
+        for day in range(int(start_seconds // SECONDS_PER_DAY), int(end_seconds // SECONDS_PER_DAY) + 1):
+            records.extend(record for record in self._read_partition(day, ticker_id)
+                           if start_seconds <= _seconds(record.filled_at) < end_seconds)
+        return records
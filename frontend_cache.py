@@ -0,0 +1,121 @@
+# frontend_cache.py
+import logging
+import os
+import threading
+from typing import Any, Dict, Optional, Tuple
+import pandas as pd
+from order_manager import Order, OrderDetails, OrderManager
+
+logger = logging.getLogger(__name__)
+
+
+class CachedOrderBook:
+    """
+    A long lived OrderManager with order and fill frames that are updated in place
+
+    Meant to be created once per process (e.g. with st.cache_resource) and shared by every session. refresh only
+    rebuilds the rows of orders that changed since the last refresh. The manager is only reloaded from disk when
+    another process changes the files in the data folder.
+    """
+
+    def __init__(self, data_folder: str = "Data", **manager_options: Any):
+        """
+        Args:
+        data_folder: Folder holding the orders file and journal
+        manager_options: Passed on to OrderManager, journal=True and thread_safe=True are set unless given
+        """
+        self.data_folder = data_folder
+        self.manager_options = {"journal": True, "thread_safe": True, **manager_options}
+        self._lock = threading.RLock() # Sessions run on their own threads
+        self.manager: Optional[OrderManager] = None
+        self._load()
+
+    def _load(self) -> None:
+        """(Re)creates the manager from disk and builds the frames from scratch"""
+        if self.manager is not None:
+            self.manager.close()
+        self.manager = OrderManager(data_folder=self.data_folder, **self.manager_options)
+        self._revision = self.manager.revision # Read first, changes made while building are applied again later
+        orders_df, self.fills_df = self.manager.get_order_frames()
+        self.orders_df = orders_df.set_index("order_number", drop=False)
+        self._fill_counts: Dict[int, int] = {order.order_number: order.fill_count for order in self.manager.orders}
+        self._files = self._files_signature()
+        logger.info("Loaded %s orders into the front end cache", len(self.orders_df))
+
+    def _files_signature(self) -> Tuple[Tuple[str, int, int], ...]:
+        """Name, modification time and size of every file in the data folder"""
+        try:
+            entries = list(os.scandir(self.data_folder))
+        except FileNotFoundError:
+            return ()
+        return tuple(sorted(
+            (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size) for entry in entries if entry.is_file()
+        ))
+
+    @property # Getter
+    def revision(self) -> int:
+        return self._revision
+
+    def refresh(self) -> bool:
+        """
+        Brings the frames up to date
+
+        Returns:
+        bool: True if anything changed
+        """
+        with self._lock:
+            if self._files_signature() != self._files:
+                logger.info("Orders in %s changed on disk, reloading", self.data_folder)
+                self._load()
+                return True
+
+            revision, changed = self.manager.changed_orders_since(self._revision)
+            self._revision = revision
+            if changed:
+                self._apply_changes(changed)
+            return bool(changed)
+
+    def _apply_changes(self, changed) -> None:
+        """Updates the rows of changed orders and appends their new fills"""
+        changed_df, _ = self.manager.get_order_frames(changed)
+        changed_df = changed_df.set_index("order_number", drop=False)
+
+        existing = changed_df.index.isin(self.orders_df.index)
+        if existing.any():
+            self.orders_df.loc[changed_df.index[existing]] = changed_df[existing]
+        if not existing.all():
+            self.orders_df = pd.concat([self.orders_df, changed_df[~existing]])
+
+        # Fills are never changed once added, so only the ones past what is shown are new
+        new_fills = []
+        for order in changed:
+            shown = self._fill_counts.get(order.order_number, 0)
+            new_fills.extend((order.order_number, fill.fill_price, fill.fill_quantity, fill.filled_at)
+                             for fill in order.fills[shown:])
+            self._fill_counts[order.order_number] = order.fill_count
+        if new_fills:
+            fills_df = pd.DataFrame.from_records(new_fills, columns=self.fills_df.columns)
+            fills_df["filled_at"] = pd.to_datetime(fills_df["filled_at"])
+            self.fills_df = pd.concat([self.fills_df, fills_df], ignore_index=True) if len(self.fills_df) else fills_df
+
+    def _after_write(self) -> None:
+        """Our own writes change the files too, they must not look like another process's changes"""
+        self._files = self._files_signature()
+
+    def add_order(self, details: OrderDetails) -> Order:
+        with self._lock:
+            order = self.manager.add_order(details)
+            self._after_write()
+        return order
+
+    def fill_order(self, order_number: int, fill_price: float, fill_quantity: float) -> None:
+        with self._lock:
+            try:
+                self.manager.fill_order(order_number, fill_price, fill_quantity)
+            finally:
+                self._after_write()
+
+    def close(self) -> None:
+        with self._lock:
+            if self.manager is not None:
+                self.manager.close()
@@ -0,0 +1,462 @@
+# ingest.py
+"""Applies a JSON lines file of add_order and fill_order commands to an OrderManager, batch by batch"""
+import argparse
+import itertools
+import json
+import logging
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from order_logging import LogSampler, log_event
+from order_manager import OrderDetails, OrderManager, OrderSide
+from order_storage import JsonOrderStorage
+
+logger = logging.getLogger(__name__)
+
+CHUNK_BYTES = 1 << 20 # Bytes read and parsed at a time, cut back to the last whole line
+_SIDES = {side.value: side for side in OrderSide}
+
+# Parsed commands, line is the index of the line within its chunk until the batch numbers it
+# add: (line, offset, id, ticker_id, exchange_id, order_quantity, order_price, transaction_fee, side)
+# fill: (line, offset, id, order_number, fill_price, fill_quantity)
+_ADD_LINE, _ADD_ID = 0, 2
+_FILL_LINE, _FILL_ID, _FILL_ORDER_NUMBER, _FILL_PRICE, _FILL_QUANTITY = 0, 2, 3, 4, 5
+
+
+class IngestSummary(NamedTuple):
+    """What an ingest run did"""
+    lines: int
+    orders: int
+    fills: int
+    errors: int
+    batches: int
+    elapsed: float
+    resumed_from: int # Byte offset the run started at
+
+
+class _ParsedChunk(NamedTuple):
+    start_offset: int
+    end_offset: int
+    line_count: int
+    adds: List[tuple]
+    fills: List[tuple]
+    errors: List[Tuple[int, int, str]] # (line, offset, error)
+
+
+def _number(command: Dict[str, Any], name: str, default: Any = None) -> Any:
+    value = command.get(name, default)
+    if value is None:
+        raise KeyError(name)
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"{name} must be a number, got {value!r}")
+    return value
+
+
+def _parse_chunk(data: bytes, start_offset: int) -> _ParsedChunk:
+    """Parses and checks the commands in a run of whole lines, on a worker process"""
+    adds, fills, errors = [], [], []
+    offset = start_offset
+    # ASCII chunks are decoded once, where a character is a byte. Otherwise lines stay bytes, so offsets count
+    # bytes, and each is decoded on its own so invalid UTF-8 is reported for its line rather than replaced.
+    ascii_only = data.isascii()
+    lines = data.decode('ascii').split('\n') if ascii_only else data.split(b'\n')
+    if lines and not lines[-1]:
+        lines.pop()
+    for index, line in enumerate(lines):
+        line_offset = offset
+        offset += len(line) + 1
+        if not line.strip():
+            continue
+        try:
+            command = json.loads(line if ascii_only else line.decode('utf-8'))
+            op = command["op"]
+            if op == "fill_order":
+                fill_price, fill_quantity = _number(command, "fill_price"), _number(command, "fill_quantity")
+                if fill_quantity <= 0:
+                    raise ValueError(f"Fill quantity must be positive, got {fill_quantity}")
+                if command.get("order_number") is None and command.get("id") is None:
+                    raise ValueError("fill_order needs an order_number or the id of an add_order line")
+                order_number = command.get("order_number")
+                if order_number is not None:
+                    order_number = int(_number(command, "order_number"))
+                fills.append((index, line_offset, command.get("id"), order_number, fill_price, fill_quantity))
+            elif op == "add_order":
+                quantity, price = _number(command, "order_quantity"), _number(command, "order_price")
+                fee = _number(command, "transaction_fee", 0.0)
+                side = command.get("side", OrderSide.BUY.value)
+                if quantity <= 0:
+                    raise ValueError(f"Order quantity must be positive, got {quantity}")
+                if price < 0 or fee < 0:
+                    raise ValueError("Order price and transaction fee can't be negative")
+                if side not in _SIDES:
+                    raise ValueError(f"Unknown side {side!r}")
+                adds.append((index, line_offset, command.get("id"), int(_number(command, "ticker_id")),
+                             int(_number(command, "exchange_id", 0)), quantity, price, fee, side))
+            else:
+                raise ValueError(f"Unknown op {op!r}")
+        except KeyError as e:
+            errors.append((index, line_offset, f"Missing field {e}"))
+        except (TypeError, ValueError) as e:
+            # json.JSONDecodeError is a ValueError
+            errors.append((index, line_offset, f"{type(e).__name__}: {e}"))
+    return _ParsedChunk(start_offset, start_offset + len(data), len(lines), adds, fills, errors)
+
+
+class CommandIngestor:
+    """
+    Streams a command file into an OrderManager: read in chunks, parse on a worker pool, check and batch, apply,
+    and commit each batch once
+
+    Commands are applied in file order: each run of consecutive add_order lines goes to add_orders and each run of
+    fill_order lines to fill_orders, so a fill can only refer to an order added on an earlier line. A batch is
+    committed with one journal sync (journal mode) or one append_orders call, then the checkpoint moves past it.
+
+    Before a batch is applied the checkpoint records how far the manager had got, so a run that stopped part way
+    through a batch resumes by re-applying only the orders and fills that didn't reach storage. Lines that can't be
+    parsed or that the manager rejects are reported with their line number and the run carries on.
+    """
+
+    def __init__(self, manager: OrderManager, batch_size: int = 50000, workers: Optional[int] = None,
+                 chunk_bytes: int = CHUNK_BYTES, checkpoint_path: Optional[str] = None,
+                 errors_path: Optional[str] = None, filename: str = "orders.json", max_pending: Optional[int] = None):
+        """
+        Args:
+        manager: The manager commands are applied to
+        batch_size: Commands applied and committed together
+        workers: Parser processes, defaults to one per CPU beyond the first, 0 parses on the calling thread
+        chunk_bytes: Bytes read and handed to a parser at a time
+        checkpoint_path: File recording how far the run got, so a later run resumes there. Orders created by
+        add_order lines are listed next to it (checkpoint_path + ".orders") so later fills can refer to them by id.
+        errors_path: JSON lines file for rejected lines, defaults to logging them
+        filename: Orders file append_orders commits to when the manager has no journal
+        max_pending: Chunks read ahead of the one being applied, defaults to two per worker
+        """
+        self.manager = manager
+        self.batch_size = batch_size
+        self.workers = workers if workers is not None else max((os.cpu_count() or 1) - 1, 0)
+        self.chunk_bytes = chunk_bytes
+        self.checkpoint_path = checkpoint_path
+        self.errors_path = errors_path
+        self.filename = filename
+        self.max_pending = max_pending if max_pending is not None else max(2 * self.workers, 1)
+
+        self._order_numbers: Dict[Any, int] = {} # add_order id -> order number
+        self._line_orders: Dict[int, int] = {} # Line -> order number, for the lines of an unfinished batch
+        self._errors_file = None
+        self._log_rejected = LogSampler(logger, "ingest_line_rejected", logging.WARNING, every=1000)
+        self._error_count = 0
+
+    def _read_chunks(self, path: str, offset: int) -> Iterator[Tuple[bytes, int]]:
+        """Yields (data, start offset) runs of whole lines from offset on"""
+        with open(path, 'rb') as file:
+            file.seek(offset)
+            carry = b''
+            while True:
+                data = file.read(self.chunk_bytes)
+                if not data:
+                    break
+                data = carry + data
+                cut = data.rfind(b'\n') + 1
+                if not cut:
+                    carry = data
+                    continue
+                yield data[:cut], offset
+                offset += cut
+                carry = data[cut:]
+            if carry:
+                yield carry, offset
+
+    def _parsed_chunks(self, path: str, offset: int) -> Iterator[_ParsedChunk]:
+        """Parses chunks on the worker pool in file order, reading ahead at most max_pending chunks"""
+        if not self.workers:
+            for data, start_offset in self._read_chunks(path, offset):
+                yield _parse_chunk(data, start_offset)
+            return
+
+        with ProcessPoolExecutor(self.workers) as pool:
+            pending = deque()
+            for data, start_offset in self._read_chunks(path, offset):
+                # Backpressure: the reader waits for the oldest chunk once max_pending are in flight
+                if len(pending) >= self.max_pending:
+                    yield pending.popleft().result()
+                pending.append(pool.submit(_parse_chunk, data, start_offset))
+            while pending:
+                yield pending.popleft().result()
+
+    def _load_checkpoint(self) -> Dict[str, Any]:
+        state = {"offset": 0, "line": 0, "pending": None}
+        if self.checkpoint_path is None or not os.path.exists(self.checkpoint_path):
+            return state
+        with open(self.checkpoint_path) as file:
+            state.update(json.load(file))
+
+        orders_path = self.checkpoint_path + ".orders"
+        if os.path.exists(orders_path):
+            with open(orders_path, 'rb') as file:
+                for line in file:
+                    try:
+                        line_number, order_id, order_number = json.loads(line)
+                    except ValueError:
+                        break # Torn last line, its batch wasn't committed
+                    if order_id is not None:
+                        self._order_numbers[order_id] = order_number
+                    if line_number > state["line"]:
+                        self._line_orders[line_number] = order_number
+        return state
+
+    def _write_checkpoint(self, state: Dict[str, Any]) -> None:
+        if self.checkpoint_path is None:
+            return
+        with open(self.checkpoint_path + ".tmp", 'w') as file:
+            json.dump(state, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(self.checkpoint_path + ".tmp", self.checkpoint_path)
+
+    def _record_orders(self, entries: List[Tuple[int, Any, int]]) -> None:
+        if self.checkpoint_path is None or not entries:
+            return
+        with open(self.checkpoint_path + ".orders", 'a') as file:
+            file.writelines(json.dumps(entry, separators=(',', ':')) + '\n' for entry in entries)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def _reject(self, line: int, offset: int, error: str) -> None:
+        self._error_count += 1
+        if self._errors_file is not None:
+            self._errors_file.write(json.dumps({"line": line, "offset": offset, "error": error}) + '\n')
+        else:
+            self._log_rejected(line=line, offset=offset, error=error)
+
+    def _commit(self) -> None:
+        """Makes the applied batch durable in one write"""
+        if self.manager.journal is not None:
+            self.manager.journal.sync()
+        else:
+            self.manager.append_orders(self.filename)
+
+    def run(self, path: str) -> IngestSummary:
+        """
+        Applies the commands in path, starting after the checkpoint if there is one
+
+        Returns:
+        IngestSummary: Counts of lines, applied orders and fills, rejected lines and batches
+        """
+        start = time.perf_counter()
+        self.manager.wait_until_loaded()
+        state = self._load_checkpoint()
+        resumed_from = state["offset"]
+        if resumed_from:
+            logger.info("Resuming %s at byte %s (line %s)", path, resumed_from, state["line"])
+        totals = {"orders": 0, "fills": 0, "batches": 0}
+        self._error_count = 0
+        if self.errors_path is not None:
+            self._errors_file = open(self.errors_path, 'a')
+
+        try:
+            first_line = line = state["line"]
+            batch: List[Tuple[int, _ParsedChunk]] = []
+            batch_commands = 0
+            recovery = state["pending"]
+            chunks = self._parsed_chunks(path, state["offset"])
+            for chunk in chunks:
+                batch.append((line, chunk))
+                line += chunk.line_count
+                batch_commands += chunk.line_count
+                # The unfinished batch is applied again with the same bounds, so its recovery lines up
+                if recovery is not None:
+                    if chunk.end_offset < recovery["end_offset"]:
+                        continue
+                elif batch_commands < self.batch_size:
+                    continue
+                state = self._apply_batch(batch, state, line, totals, recovery)
+                recovery = None
+                batch, batch_commands = [], 0
+            if batch:
+                state = self._apply_batch(batch, state, line, totals, recovery)
+        finally:
+            if self._errors_file is not None:
+                self._errors_file.close()
+                self._errors_file = None
+
+        summary = IngestSummary(line - first_line, totals["orders"], totals["fills"], self._error_count,
+                                totals["batches"], time.perf_counter() - start, resumed_from)
+        log_event(logger, logging.INFO, "ingest_finished", path=path, lines=summary.lines, orders=summary.orders,
+                  fills=summary.fills, errors=summary.errors, batches=summary.batches,
+                  elapsed_ms=round(summary.elapsed * 1000, 1))
+        return summary
+
+    def _apply_batch(self, batch: List[Tuple[int, _ParsedChunk]], state: Dict[str, Any], end_line: int,
+                     totals: Dict[str, int], recovery: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Applies and commits one batch, then moves the checkpoint past it"""
+        manager = self.manager
+        adds, fills = [], []
+        for first_line, chunk in batch:
+            for line_index, offset, error in chunk.errors:
+                self._reject(first_line + line_index + 1, offset, error)
+            adds.extend((first_line + add[_ADD_LINE] + 1,) + add[1:] for add in chunk.adds)
+            fills.extend((first_line + fill[_FILL_LINE] + 1,) + fill[1:] for fill in chunk.fills)
+        end_offset = batch[-1][1].end_offset
+
+        if recovery is not None:
+            adds, fills = self._skip_committed(adds, fills, recovery)
+        else:
+            # Orders this batch fills that exist already, with how many fills they had, for resuming mid batch
+            fill_counts = {}
+            for fill in fills:
+                order_number = fill[_FILL_ORDER_NUMBER]
+                if order_number is None:
+                    order_number = self._order_numbers.get(fill[_FILL_ID])
+                if order_number is not None and order_number not in fill_counts:
+                    try:
+                        fill_counts[order_number] = manager.get_order(order_number).fill_count
+                    except ValueError:
+                        pass
+            state = dict(state, pending={"end_offset": end_offset, "end_line": end_line,
+                                         "next_order_number": manager.next_order_number, "fill_counts": fill_counts})
+            self._write_checkpoint(state)
+
+        # Runs of adds and fills in file order, each applied with one batch call
+        commands = [(add[_ADD_LINE], True, add) for add in adds] + [(fill[_FILL_LINE], False, fill) for fill in fills]
+        commands.sort(key=lambda command: command[0])
+        orders_added = fills_added = 0
+        for is_add, run in itertools.groupby(commands, key=lambda command: command[1]):
+            if is_add:
+                orders_added += self._apply_adds([command[2] for command in run])
+            else:
+                fills_added += self._apply_fills([command[2] for command in run])
+
+        self._commit()
+        totals["orders"] += orders_added
+        totals["fills"] += fills_added
+        totals["batches"] += 1
+        self._line_orders = {}
+        state = {"offset": end_offset, "line": end_line, "pending": None}
+        self._write_checkpoint(state)
+        logger.debug("Ingested batch up to line %s: %s orders, %s fills", end_line, orders_added, fills_added)
+        return state
+
+    def _apply_adds(self, adds: List[tuple]) -> int:
+        """Adds a run of add_order commands, returns how many orders were added"""
+        added = self.manager.add_orders([
+            OrderDetails(ticker_id=add[3], order_quantity=add[5], order_price=add[6], exchange_id=add[4],
+                         transaction_fee=add[7], side=_SIDES[add[8]])
+            for add in adds
+        ])
+        created = []
+        for index, (add, order) in enumerate(zip(adds, added.results)):
+            if order is None:
+                self._reject(add[_ADD_LINE], add[1], added.errors[index])
+                continue
+            if add[_ADD_ID] is not None:
+                self._order_numbers[add[_ADD_ID]] = order.order_number
+            created.append((add[_ADD_LINE], add[_ADD_ID], order.order_number))
+        # Listed before the commit, so a resumed run can tell which lines' orders reached storage
+        self._record_orders(created)
+        return added.succeeded
+
+    def _apply_fills(self, fills: List[tuple]) -> int:
+        """Applies a run of fill_order commands, returns how many fills were applied"""
+        to_fill, fill_lines = [], []
+        for fill in fills:
+            order_number = fill[_FILL_ORDER_NUMBER]
+            if order_number is None:
+                order_number = self._order_numbers.get(fill[_FILL_ID])
+                if order_number is None:
+                    self._reject(fill[_FILL_LINE], fill[1], f"No add_order line with id {fill[_FILL_ID]!r}")
+                    continue
+            to_fill.append((order_number, fill[_FILL_PRICE], fill[_FILL_QUANTITY]))
+            fill_lines.append(fill)
+        filled = self.manager.fill_orders(to_fill)
+        for index, error in filled.errors.items():
+            self._reject(fill_lines[index][_FILL_LINE], fill_lines[index][1], error)
+        return filled.succeeded
+
+    def _skip_committed(self, adds: List[tuple], fills: List[tuple],
+                        recovery: Dict[str, Any]) -> Tuple[List[tuple], List[tuple]]:
+        """Drops the orders and fills of an unfinished batch that reached storage before the run stopped"""
+        manager = self.manager
+        remaining_adds = []
+        for add in adds:
+            order_number = self._line_orders.get(add[_ADD_LINE])
+            if order_number is not None and order_number < manager.next_order_number:
+                continue # Its order was committed, and is already in the id map
+            remaining_adds.append(add)
+
+        # Fills on an order are applied in file order, so the committed ones are the first that would succeed
+        fill_counts = {int(order_number): count for order_number, count in recovery["fill_counts"].items()}
+        committed_fills: Dict[int, int] = {}
+        simulated_filled: Dict[int, float] = {}
+        remaining_fills = []
+        for fill in fills:
+            order_number = fill[_FILL_ORDER_NUMBER]
+            if order_number is None:
+                order_number = self._order_numbers.get(fill[_FILL_ID])
+            if order_number is None or order_number >= manager.next_order_number:
+                remaining_fills.append(fill)
+                continue
+            try:
+                order = manager.get_order(order_number)
+            except ValueError:
+                remaining_fills.append(fill)
+                continue
+            if order_number not in committed_fills:
+                committed_fills[order_number] = order.fill_count - fill_counts.get(order_number, 0)
+                # Quantity filled before the batch, replayed forward to find which fills succeeded
+                simulated_filled[order_number] = sum(
+                    earlier.fill_quantity for earlier in order.fills[:fill_counts.get(order_number, 0)])
+            if committed_fills[order_number] > 0 and \
+                    simulated_filled[order_number] + fill[_FILL_QUANTITY] <= order.quantity:
+                committed_fills[order_number] -= 1
+                simulated_filled[order_number] += fill[_FILL_QUANTITY]
+                continue
+            remaining_fills.append(fill)
+
+        logger.info("Resuming an unfinished batch: %s of %s orders and %s of %s fills were already committed",
+                    len(adds) - len(remaining_adds), len(adds), len(fills) - len(remaining_fills), len(fills))
+        return remaining_adds, remaining_fills
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("commands", help="JSON lines file of add_order and fill_order commands")
+    parser.add_argument("--data-folder", default="Data")
+    parser.add_argument("--journal", action="store_true", help="Commit batches to the journal")
+    parser.add_argument("--batch-size", type=int, default=50000)
+    parser.add_argument("--workers", type=int, default=None, help="Parser processes, 0 to parse in this process")
+    parser.add_argument("--chunk-bytes", type=int, default=CHUNK_BYTES)
+    parser.add_argument("--checkpoint", default=None,
+                        help="Checkpoint file to resume from and update, defaults to <data folder>/ingest.checkpoint")
+    parser.add_argument("--errors", default=None, help="JSON lines file for rejected lines")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint and start over")
+    args = parser.parse_args()
+
+    checkpoint = args.checkpoint or os.path.join(args.data_folder, "ingest.checkpoint")
+    if args.restart:
+        for path in (checkpoint, checkpoint + ".orders"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    # In journal mode each batch ends with one sync, so the journal doesn't sync on its own within a batch
+    # Compact JSON is written by the C encoder, indenting made each commit several times slower
+    manager = OrderManager(data_folder=args.data_folder, journal=args.journal, fsync_every=2 * args.batch_size,
+                           storage=JsonOrderStorage(args.data_folder, indent=None))
+    ingestor = CommandIngestor(manager, batch_size=args.batch_size, workers=args.workers,
+                               chunk_bytes=args.chunk_bytes, checkpoint_path=checkpoint, errors_path=args.errors)
+    summary = ingestor.run(args.commands)
+    if manager.journal is None:
+        manager.storage.compact_appended("orders.json")
+    manager.close()
+
+    rate = summary.lines / summary.elapsed * 60 if summary.elapsed else 0
+    print(f"{summary.lines:,} lines in {summary.elapsed:.2f}s ({rate:,.0f} lines/min): {summary.orders:,} orders, "
+          f"{summary.fills:,} fills, {summary.errors:,} rejected, {summary.batches:,} batches")
+
+
+if __name__ == '__main__':
+    from order_logging import configure_logging
+    configure_logging()
+    main()
@@ -3,6 +3,7 @@ import json
 import os
 from datetime import datetime
 from order_manager import OrderManager, OrderDetails, OrderStatus, Order, OrderFill
+from order_logging import configure_logging
 
 
 
@@ -79,5 +80,6 @@ def main():
 
 
 if __name__ == '__main__':
+    configure_logging()
     main()
    
\ No newline at end of file
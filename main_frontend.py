@@ -1,19 +1,39 @@
 import streamlit as st
 import json
 import os
-from order_manager import OrderManager, OrderDetails, OrderStatus, Order, OrderFill
+from frontend_cache import CachedOrderBook
+from order_manager import OrderDetails, OrderStatus, Order, OrderFill
+from order_logging import configure_logging
 
-# Initialize the OrderManager
-manager = OrderManager(data_folder="Data")
+
+# Streamlit reruns this script on every click, the manager and its frames are created once and shared by all sessions
+@st.cache_resource
+def get_order_book() -> CachedOrderBook:
+    configure_logging()
+    # Every change is journaled so there is no need to rewrite orders.json on each click
+    return CachedOrderBook(data_folder="Data", snapshot_every=1000)
+
+
+book = get_order_book()
+book.refresh()  # Only changed orders are rebuilt, the files are only reloaded if another process changed them
 
 # Streamlit app
 st.title("Order Manager")
 
 # Load and display orders by default
 st.header("Current Orders")
-orders_df = manager.get_orders_as_dataframe()
+orders_df, fills_df = book.orders_df, book.fills_df
 if not orders_df.empty:
-    st.dataframe(orders_df)
+    statuses = st.multiselect("Status", [status.value for status in OrderStatus],
+                              default=[OrderStatus.OPEN.value, OrderStatus.PARTIALLY_FILLED.value])
+    max_rows = st.number_input("Rows to show (newest first)", min_value=10, value=1000, step=100)
+
+    # Only the rows on screen are sent to the browser
+    shown_df = orders_df[orders_df["status"].isin(statuses)].tail(int(max_rows)).iloc[::-1]
+    st.caption(f"{len(orders_df):,} orders in total")
+    st.dataframe(shown_df, hide_index=True)
+    with st.expander("Fills"):
+        st.dataframe(fills_df.tail(int(max_rows)).iloc[::-1], hide_index=True)
 else:
     st.info("No orders found.")
 
@@ -26,8 +46,7 @@ exchange_id = st.number_input("Exchange ID", min_value=0, step=1)
 
 if st.button("Add Order"):
     order_details = OrderDetails(ticker_id=ticker_id, order_quantity=order_quantity, order_price=order_price, exchange_id=exchange_id)
-    manager.add_order(order_details)
-    manager.save_orders("orders.json")  # Save orders after adding
+    book.add_order(order_details)  # Journaled as it is added
     st.success("Order added successfully!")
     st.rerun()  # Refresh the page to show the updated orders
 
@@ -39,8 +58,7 @@ fill_quantity = st.number_input("Fill Quantity", min_value=0.0, step=1.0)
 
 if st.button("Fill Order"):
     try:
-        manager.fill_order(order_number=order_number, fill_price=fill_price, fill_quantity=fill_quantity)
-        manager.save_orders("orders.json")  # Save orders after filling
+        book.fill_order(order_number=order_number, fill_price=fill_price, fill_quantity=fill_quantity)  # Journaled as it is filled
         st.success("Order filled successfully!")
         st.rerun()  # Refresh the page to show the updated orders
     except ValueError as e:
@@ -0,0 +1,236 @@
+# matching_engine.py
+import heapq
+import logging
+from collections import deque
+from typing import Deque, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from order_manager import BatchResult, Order, OrderManager, OrderSide
+
+logger = logging.getLogger(__name__)
+
+_BUY = OrderSide.BUY # Enum attribute lookups are slow enough to show up in the matching loop
+
+
+class Match(NamedTuple):
+    """One trade between an incoming order (or market tick) and a resting order, at the resting order's price"""
+    ticker_id: int
+    buy_order_number: Optional[int] # None when the buyer was a market tick
+    sell_order_number: Optional[int] # None when the seller was a market tick
+    price: float
+    quantity: float
+
+
+class _BookSide:
+    """
+    Resting orders on one side of one ticker's book
+
+    Prices are kept in a heap (negated for bids so the best price is always on top) and each price level is a
+    FIFO deque of [order_number, remaining] entries, which gives price-time priority. Emptied levels and cancelled
+    entries are dropped lazily when they reach the top.
+    """
+
+    __slots__ = ("sign", "levels", "prices")
+
+    def __init__(self, is_bid: bool):
+        self.sign = -1 if is_bid else 1
+        self.levels: Dict[float, Deque[list]] = {}
+        self.prices: List[float] = []
+
+    def add(self, price: float, entry: list) -> None:
+        level = self.levels.get(price)
+        if level is None:
+            self.levels[price] = deque((entry,))
+            heapq.heappush(self.prices, self.sign * price)
+        else:
+            level.append(entry)
+
+    def best_price(self) -> Optional[float]:
+        """Returns the best price that still has resting quantity, None if the side is empty"""
+        prices = self.prices
+        levels = self.levels
+        while prices:
+            price = self.sign * prices[0]
+            level = levels[price]
+            while level and level[0][1] <= 0:
+                level.popleft() # Cancelled
+            if level:
+                return price
+            heapq.heappop(prices)
+            del levels[price]
+        return None
+
+    def depth(self, count: int) -> List[Tuple[float, float]]:
+        """Returns up to count (price, resting quantity) levels, best first, skipping emptied levels not yet dropped"""
+        levels = []
+        for key in sorted(self.prices):
+            if len(levels) >= count:
+                break
+            price = self.sign * key
+            quantity = sum(entry[1] for entry in self.levels[price] if entry[1] > 0)
+            if quantity > 0:
+                levels.append((price, quantity))
+        return levels
+
+
+class _TickerBook:
+    __slots__ = ("bids", "asks")
+
+    def __init__(self):
+        self.bids = _BookSide(is_bid=True)
+        self.asks = _BookSide(is_bid=False)
+
+
+class MatchingEngine:
+    """
+    Simulated exchange that matches OrderManager orders with price-time priority, one limit order book per ticker
+
+    Orders are matched at the resting order's price. The resulting fills are applied through
+    OrderManager.fill_orders in batches of batch_size (and on flush), so journaling and saving work as for any
+    other fill. The engine isn't thread safe, drive it from one thread.
+    """
+
+    def __init__(self, manager: OrderManager, batch_size: int = 10000):
+        """
+        Args:
+        manager: The manager whose orders are matched and filled
+        batch_size: Fills collected before they are applied to the manager, 1 applies every fill at once
+        """
+        self.manager = manager
+        self.batch_size = max(batch_size, 1)
+        self.match_count = 0
+        self._books: Dict[int, _TickerBook] = {}
+        self._resting: Dict[int, list] = {} # Order number -> its book entry, for cancels
+        self._pending_fills: List[Tuple[int, float, float]] = []
+        # Order number -> quantity matched in _pending_fills, which the order's remaining_quantity doesn't show yet
+        self._unapplied: Dict[int, float] = {}
+
+    def _book(self, ticker_id: int) -> _TickerBook:
+        book = self._books.get(ticker_id)
+        if book is None:
+            book = self._books[ticker_id] = _TickerBook()
+        return book
+
+    def _match(self, book: _TickerBook, ticker_id: int, buying: bool, order_number: Optional[int],
+               limit: Optional[float], quantity: float, matches: List[Match]) -> float:
+        """Takes liquidity from the opposite side, returns the quantity left unmatched"""
+        opposite = book.asks if buying else book.bids
+        pending = self._pending_fills
+        resting = self._resting
+        unapplied = self._unapplied
+
+        while quantity > 0:
+            best = opposite.best_price()
+            if best is None or (limit is not None and (best > limit if buying else best < limit)):
+                break
+            level = opposite.levels[best]
+            while level and quantity > 0:
+                entry = level[0]
+                if entry[1] <= 0:
+                    level.popleft()
+                    continue
+                traded = entry[1] if entry[1] < quantity else quantity
+                entry[1] -= traded
+                quantity -= traded
+                if entry[1] <= 0:
+                    level.popleft()
+                    del resting[entry[0]]
+
+                pending.append((entry[0], best, traded))
+                unapplied[entry[0]] = unapplied.get(entry[0], 0) + traded
+                if order_number is not None:
+                    pending.append((order_number, best, traded))
+                    unapplied[order_number] = unapplied.get(order_number, 0) + traded
+                if buying:
+                    matches.append(Match(ticker_id, order_number, entry[0], best, traded))
+                else:
+                    matches.append(Match(ticker_id, entry[0], order_number, best, traded))
+
+        self.match_count += len(matches)
+        if len(pending) >= self.batch_size:
+            self.flush()
+        return quantity
+
+    def submit(self, order: Order, market: bool = False) -> List[Match]:
+        """
+        Matches an order from the manager against the book, resting whatever is left at its limit price
+
+        Args:
+        order: An order that still needs fills and isn't already resting. Matches not yet applied to the manager
+        count against its remaining quantity, so a cancelled order can be submitted again before a flush.
+        market: Ignore the order price, and drop (rather than rest) whatever can't be matched now
+
+        Returns:
+        List[Match]: The trades, in the order they happened
+        """
+        if not order.needs_fills:
+            raise ValueError(f"Order #{order.order_number} is already filled")
+        if order.order_number in self._resting:
+            raise ValueError(f"Order #{order.order_number} is already in the book")
+        quantity = order.remaining_quantity - self._unapplied.get(order.order_number, 0)
+        if quantity <= 0:
+            raise ValueError(f"Order #{order.order_number} is already filled by matches waiting for flush")
+
+        matches: List[Match] = []
+        details = order.details
+        book = self._book(details.ticker_id)
+        buying = details.side is _BUY
+        remaining = self._match(book, details.ticker_id, buying, order.order_number,
+                                None if market else details.order_price, quantity, matches)
+        if remaining > 0 and not market:
+            entry = [order.order_number, remaining]
+            (book.bids if buying else book.asks).add(details.order_price, entry)
+            self._resting[order.order_number] = entry
+        return matches
+
+    def submit_orders(self, orders: Iterable[Order]) -> List[Match]:
+        """Submits orders one after another, e.g. manager.get_open_orders() at startup"""
+        matches = []
+        for order in orders:
+            matches.extend(self.submit(order))
+        return matches
+
+    def market_tick(self, ticker_id: int, side: OrderSide, price: float, quantity: float) -> List[Match]:
+        """
+        Matches outside liquidity against the book, e.g. a trade print from a market data feed
+
+        Args:
+        ticker_id: The ticker traded
+        side: Side of the outside order, a SELL tick fills resting buys priced at or above price
+        price: Limit price of the outside order
+        quantity: Most quantity it can take, whatever is left isn't rested
+
+        Returns:
+        List[Match]: The trades, with None as the outside order's number
+        """
+        matches: List[Match] = []
+        self._match(self._book(ticker_id), ticker_id, side is _BUY, None, price, quantity, matches)
+        return matches
+
+    def cancel(self, order_number: int) -> bool:
+        """Takes a resting order out of the book, returns False if it wasn't resting"""
+        entry = self._resting.pop(order_number, None)
+        if entry is None:
+            return False
+        entry[1] = 0
+        return True
+
+    def best_bid(self, ticker_id: int) -> Optional[float]:
+        return self._book(ticker_id).bids.best_price()
+
+    def best_ask(self, ticker_id: int) -> Optional[float]:
+        return self._book(ticker_id).asks.best_price()
+
+    def depth(self, ticker_id: int, levels: int = 5) -> Dict[str, List[Tuple[float, float]]]:
+        """Returns the best price levels on each side as (price, resting quantity)"""
+        book = self._book(ticker_id)
+        return {"bids": book.bids.depth(levels), "asks": book.asks.depth(levels)}
+
+    def flush(self) -> Optional[BatchResult]:
+        """Applies the collected fills to the manager, returns None if there were none"""
+        if not self._pending_fills:
+            return None
+        fills, self._pending_fills = self._pending_fills, []
+        self._unapplied = {}
+        result = self.manager.fill_orders(fills)
+        if result.errors:
+            logger.warning("Manager rejected %s of %s matched fills", len(result.errors), len(fills))
+        return result
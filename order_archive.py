@@ -0,0 +1,193 @@
+# order_archive.py
+import json
+import logging
+import os
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_FOLDER = "archive"
+INDEX_FILENAME = "index.jsonl"
+
+
+@dataclass
+class RetentionPolicy:
+    """When OrderManager moves filled orders out of memory and into its archive"""
+    max_filled_age_hours: Optional[float] = 24.0 # Archive orders last filled longer ago than this, None for no limit
+    max_orders: Optional[int] = None # Archive the longest filled orders while more orders than this are in memory
+    check_every: int = 1000 # Fills between automatic checks, 0 to only archive when archive_orders is called
+
+
+class ArchivedOrder(NamedTuple):
+    """What stays in memory for an archived order, the full record is read from its partition when asked for"""
+    order_number: int
+    ticker_id: int
+    exchange_id: int
+    side: str
+    filled_quantity: float
+    average_fill_price: float
+    fill_count: int
+    last_fill_at: str
+    partition: str
+    offset: int
+
+
+class OrderArchive:
+    """
+    Filled orders moved out of an OrderManager, as JSON lines partitioned by the day of their last fill
+
+    Each partition (e.g. archive/2024-05-01.jsonl) holds full order records. index.jsonl lists an ArchivedOrder
+    summary per order with the byte offset of its record, and is all that is read at startup. Records are in the
+    layout of Order.to_dict, like the rest of the storage layer.
+    """
+
+    def __init__(self, folder: str):
+        """
+        Args:
+        folder: Folder holding the partitions and the index, created if it doesn't exist
+        """
+        self.folder = folder
+        os.makedirs(folder, exist_ok=True)
+        self.last_order_number = 0
+        self._summaries: Dict[int, ArchivedOrder] = {}
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def _index_path(self) -> str:
+        return os.path.join(self.folder, INDEX_FILENAME)
+
+    def _load_index(self) -> None:
+        if not os.path.exists(self._index_path()):
+            return
+        with open(self._index_path(), 'rb') as file:
+            for line_number, line in enumerate(file, 1):
+                try:
+                    summary = ArchivedOrder(**json.loads(line))
+                except ValueError:
+                    # Written last, so only the final line can be torn, its order is still in the manager's files
+                    logger.warning("Ignoring incomplete archive index entry on line %s of %s", line_number,
+                                   self._index_path())
+                    break
+                self._summaries[summary.order_number] = summary
+                self.last_order_number = max(self.last_order_number, summary.order_number)
+        logger.info("Archive %s holds %s orders", self.folder, len(self._summaries))
+
+    def __contains__(self, order_number: int) -> bool:
+        return order_number in self._summaries
+
+    def __len__(self) -> int:
+        return len(self._summaries)
+
+    def get_summary(self, order_number: int) -> Optional[ArchivedOrder]:
+        return self._summaries.get(order_number)
+
+    def summaries(self, ticker_id: Optional[int] = None, exchange_id: Optional[int] = None) -> List[ArchivedOrder]:
+        """Returns the summaries of archived orders, by order number"""
+        return sorted(
+            (summary for summary in self._summaries.values()
+             if (ticker_id is None or summary.ticker_id == ticker_id)
+             and (exchange_id is None or summary.exchange_id == exchange_id)),
+            key=lambda summary: summary.order_number
+        )
+
+    def add(self, orders_data: List[Dict]) -> int:
+        """
+        Writes filled orders to their partitions and the index
+
+        Args:
+        orders_data: Records of filled orders in the layout of Order.to_dict
+
+        Returns:
+        int: The number of orders archived, orders already in the archive are skipped
+        """
+        by_partition = defaultdict(list)
+        for order_data in orders_data:
+            if order_data["order_number"] in self._summaries:
+                continue
+            if order_data["needs_fills"]:
+                raise ValueError(f"Order #{order_data['order_number']} still needs fills and can't be archived")
+            last_fill_at = order_data["fills"][-1]["filled_at"] if order_data["fills"] else order_data["created_at"]
+            by_partition[last_fill_at[:10] + ".jsonl"].append((last_fill_at, order_data))
+
+        with self._lock:
+            summaries = []
+            # Records go to disk before the index, so every indexed order can be read back
+            for partition, entries in by_partition.items():
+                with open(os.path.join(self.folder, partition), 'ab') as file:
+                    offset = file.seek(0, os.SEEK_END)
+                    lines = []
+                    for last_fill_at, order_data in entries:
+                        line = (json.dumps(order_data, separators=(',', ':')) + '\n').encode()
+                        lines.append(line)
+                        summaries.append(ArchivedOrder(
+                            order_data["order_number"], order_data["ticker_id"], order_data["exchange_id"],
+                            order_data.get("side", "buy"), order_data["filled_quantity"],
+                            order_data["average_fill_price"], len(order_data["fills"]), last_fill_at, partition,
+                            offset
+                        ))
+                        offset += len(line)
+                    file.write(b''.join(lines))
+                    file.flush()
+                    os.fsync(file.fileno())
+
+            if summaries:
+                with open(self._index_path(), 'a') as file:
+                    file.writelines(json.dumps(summary._asdict(), separators=(',', ':')) + '\n'
+                                    for summary in summaries)
+                    file.flush()
+                    os.fsync(file.fileno())
+            for summary in summaries:
+                self._summaries[summary.order_number] = summary
+                self.last_order_number = max(self.last_order_number, summary.order_number)
+
+        if summaries:
+            logger.info("Archived %s filled orders to %s", len(summaries), self.folder)
+        return len(summaries)
+
+    def read(self, order_number: int) -> Optional[Dict]:
+        """Reads one archived order's record, None if it isn't archived"""
+        summary = self._summaries.get(order_number)
+        if summary is None:
+            return None
+        with open(os.path.join(self.folder, summary.partition), 'rb') as file:
+            file.seek(summary.offset)
+            return json.loads(file.readline())
+
+    def records(self, order_numbers: Optional[Iterable[int]] = None) -> Iterator[Dict]:
+        """Reads the records of archived orders (default all), opening each partition once and reading in file order"""
+        if order_numbers is None:
+            summaries = list(self._summaries.values())
+        else:
+            summaries = [self._summaries[number] for number in order_numbers if number in self._summaries]
+
+        by_partition = defaultdict(list)
+        for summary in summaries:
+            by_partition[summary.partition].append(summary.offset)
+        for partition in sorted(by_partition):
+            with open(os.path.join(self.folder, partition), 'rb') as file:
+                for offset in sorted(by_partition[partition]):
+                    file.seek(offset)
+                    yield json.loads(file.readline())
+
+    def get_orders_as_dataframe(self, ticker_id: Optional[int] = None, exchange_id: Optional[int] = None,
+                                status: Optional[str] = None) -> "pd.DataFrame":
+        """Returns archived orders in the layout of JsonOrderStorage.get_orders_as_dataframe, reading only matches"""
+        import pandas as pd
+
+        # Archived orders are all filled
+        if status is not None and status != "Filled":
+            return pd.DataFrame()
+        summaries = self.summaries(ticker_id, exchange_id)
+        orders_df = pd.DataFrame(list(self.records(summary.order_number for summary in summaries)))
+        if orders_df.empty:
+            return orders_df
+
+        orders_df['created_at'] = pd.to_datetime(orders_df['created_at'])
+        orders_df['fills'] = [pd.DataFrame(fills) if fills else fills for fills in orders_df['fills']]
+        return orders_df.sort_values("order_number", ignore_index=True)
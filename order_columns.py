@@ -0,0 +1,455 @@
+# order_columns.py
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import numpy as np
+from order_manager import OrderDetails, OrderFill, OrderSide, OrderStatus
+
+# Status codes stored in the status column, in OrderStatus declaration order
+STATUS_CODES = {status: code for code, status in enumerate(OrderStatus)}
+STATUSES = list(OrderStatus)
+OPEN_CODE = STATUS_CODES[OrderStatus.OPEN]
+PARTIALLY_FILLED_CODE = STATUS_CODES[OrderStatus.PARTIALLY_FILLED]
+FILLED_CODE = STATUS_CODES[OrderStatus.FILLED]
+
+# Side codes stored in the side column, in OrderSide declaration order
+SIDE_CODES = {side: code for code, side in enumerate(OrderSide)}
+SIDES = list(OrderSide)
+
+NO_FILL = -1 # Fill row link meaning "no fill"
+
+
+def _to_ns(moment: datetime) -> int:
+    """Converts a datetime to nanoseconds since the epoch, as stored in the timestamp columns"""
+    return int(np.datetime64(moment, 'ns').astype(np.int64))
+
+
+def _parse_ns(texts: List[str]) -> np.ndarray:
+    """Converts datetime.isoformat strings to nanoseconds since the epoch in one NumPy call"""
+    return np.array(texts, dtype='datetime64[ns]').astype(np.int64)
+
+
+def _from_ns(value: int) -> datetime:
+    return np.datetime64(int(value), 'ns').astype('datetime64[us]').item()
+
+
+class ColumnarOrderBook:
+    """
+    Keeps orders in NumPy columns, one row per order, with fills in a flat table keyed by order row
+
+    Orders are kept in increasing order number order, and numbers may have gaps (a manager's order_number_step,
+    or orders archived or left on disk by lazy storage). An order is found straight from its number while the
+    numbers have no gaps, and by binary search over the order_number column otherwise. Each order links to its fills
+    through head/tail/next row columns, so reading the fills of one order costs O(fills of that order). Rows are read
+    through lightweight OrderView objects.
+
+    The book stands on its own rather than inside OrderManager: the manager's listeners, journal, storage and indexes
+    all hand out Order objects, so the book is for holding and querying order counts too large for them, e.g. built
+    with from_records from saved orders.
+    """
+
+    ORDER_COLUMNS = {
+        "order_number": np.int64,
+        "ticker_id": np.int32,
+        "exchange_id": np.int32,
+        "side": np.int8,
+        "quantity": np.float64,
+        "price": np.float64,
+        "fee": np.float64,
+        "status": np.int8,
+        "created_at": np.int64, # Nanoseconds since the epoch
+        "filled_quantity": np.float64,
+        "fill_notional": np.float64,
+        "fill_count": np.int32,
+        "fill_head": np.int64, # First fill row, NO_FILL if none
+        "fill_tail": np.int64, # Last fill row, NO_FILL if none
+    }
+
+    FILL_COLUMNS = {
+        "fill_order_row": np.int64,
+        "fill_price": np.float64,
+        "fill_quantity": np.float64,
+        "filled_at": np.int64, # Nanoseconds since the epoch
+        "fill_next": np.int64, # Next fill row of the same order, NO_FILL at the end
+    }
+
+    def __init__(self, capacity: int = 1024, fill_capacity: int = 1024, order_number_start: int = 1,
+                 order_number_step: int = 1):
+        """
+        Args:
+        capacity: Order rows to allocate up front, the columns double when they fill up
+        fill_capacity: Fill rows to allocate up front
+        order_number_start: First order number given out, as in OrderManager
+        order_number_step: Gap between the order numbers given out, as in OrderManager
+        """
+        if order_number_start < 1 or order_number_step < 1:
+            raise ValueError("order_number_start and order_number_step must be at least 1")
+        self.order_number_start = order_number_start
+        self.order_number_step = order_number_step
+        self.order_count = 0
+        self.fill_row_count = 0
+        for name, dtype in self.ORDER_COLUMNS.items():
+            setattr(self, name, np.empty(max(capacity, 1), dtype=dtype))
+        for name, dtype in self.FILL_COLUMNS.items():
+            setattr(self, name, np.empty(max(fill_capacity, 1), dtype=dtype))
+
+    def __len__(self) -> int:
+        return self.order_count
+
+    @property # Getter
+    def nbytes(self) -> int:
+        """Returns the memory held by all columns, including spare capacity"""
+        names = list(self.ORDER_COLUMNS) + list(self.FILL_COLUMNS)
+        return sum(getattr(self, name).nbytes for name in names)
+
+    @property # Getter
+    def next_order_number(self) -> int:
+        """Returns the number add_orders gives the next order when it isn't given numbers"""
+        if not self.order_count:
+            return self.order_number_start
+        return int(self.order_number[self.order_count - 1]) + self.order_number_step
+
+    def _reserve(self, columns: Dict[str, Any], current: int, needed: int) -> None:
+        """Grows a group of columns (doubling) so they hold at least needed rows"""
+        capacity = len(getattr(self, next(iter(columns))))
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in columns:
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:current] = old[:current]
+            setattr(self, name, new)
+
+    def _row(self, order_number: int) -> int:
+        count = self.order_count
+        if count:
+            # Numbers without gaps put the order at a fixed offset from the first one
+            row = (order_number - int(self.order_number[0])) // self.order_number_step
+            if 0 <= row < count and self.order_number[row] == order_number:
+                return row
+            row = int(np.searchsorted(self.order_number[:count], order_number))
+            if row < count and self.order_number[row] == order_number:
+                return row
+        raise ValueError(f"Order #{order_number} not found")
+
+    def add_order(self, details: OrderDetails, created_at: Optional[datetime] = None,
+                  order_number: Optional[int] = None) -> "OrderView":
+        """Adds one order and returns a view of it"""
+        order_numbers = self.add_orders(
+            ticker_ids=[details.ticker_id],
+            quantities=[details.order_quantity],
+            prices=[details.order_price],
+            exchange_ids=[details.exchange_id],
+            fees=[details.transaction_fee],
+            created_at=[_to_ns(created_at or datetime.now())],
+            sides=[SIDE_CODES[details.side]],
+            order_numbers=None if order_number is None else [order_number],
+        )
+        return OrderView(self, self.order_count - 1)
+
+    def add_orders(self, ticker_ids, quantities, prices, exchange_ids=None, fees=None, created_at=None,
+                   sides=None, order_numbers=None) -> np.ndarray:
+        """
+        Appends a batch of orders column by column
+
+        Args:
+        ticker_ids, quantities, prices: Array-likes of equal length
+        exchange_ids, fees: Optional array-likes, default 0
+        created_at: Optional nanosecond timestamps, default now
+        sides: Optional side codes from SIDE_CODES, default buy
+        order_numbers: Optional increasing order numbers above any already in the book, by default the next ones
+        from next_order_number
+
+        Returns:
+        np.ndarray: The order numbers given to the new orders
+        """
+        ticker_ids = np.asarray(ticker_ids)
+        count = len(ticker_ids)
+        if order_numbers is None:
+            order_numbers = self.next_order_number + self.order_number_step * np.arange(count, dtype=np.int64)
+        else:
+            order_numbers = np.asarray(order_numbers, dtype=np.int64)
+            if len(order_numbers) != count:
+                raise ValueError(f"Got {len(order_numbers)} order numbers for {count} orders")
+            last = int(self.order_number[self.order_count - 1]) if self.order_count else 0
+            if count and (order_numbers[0] <= last or np.any(np.diff(order_numbers) <= 0)):
+                raise ValueError(f"Order numbers must increase and follow the last order number #{last}")
+        start = self.order_count
+        end = start + count
+        self._reserve(self.ORDER_COLUMNS, start, end)
+
+        self.order_number[start:end] = order_numbers
+        self.ticker_id[start:end] = ticker_ids
+        self.quantity[start:end] = quantities
+        self.price[start:end] = prices
+        self.exchange_id[start:end] = 0 if exchange_ids is None else exchange_ids
+        self.side[start:end] = SIDE_CODES[OrderSide.BUY] if sides is None else sides
+        self.fee[start:end] = 0.0 if fees is None else fees
+        self.created_at[start:end] = _to_ns(datetime.now()) if created_at is None else created_at
+        self.status[start:end] = OPEN_CODE
+        self.filled_quantity[start:end] = 0.0
+        self.fill_notional[start:end] = 0.0
+        self.fill_count[start:end] = 0
+        self.fill_head[start:end] = NO_FILL
+        self.fill_tail[start:end] = NO_FILL
+
+        self.order_count = end
+        return order_numbers
+
+    def fill_order(self, order_number: int, fill_price: float, fill_quantity: float,
+                   filled_at: Optional[datetime] = None) -> None:
+        """Adds a fill to an order, with the same checks as Order.add_fill"""
+        row = self._row(order_number)
+        if self.status[row] == FILLED_CODE:
+            raise ValueError("Order is already completely filled")
+        remaining = self.quantity[row] - self.filled_quantity[row]
+        if fill_quantity > remaining:
+            raise ValueError(f"Fill quantity ({fill_quantity}) exceeds remaining quantity ({remaining})")
+
+        fill_row = self.fill_row_count
+        self._reserve(self.FILL_COLUMNS, fill_row, fill_row + 1)
+        self.fill_order_row[fill_row] = row
+        self.fill_price[fill_row] = fill_price
+        self.fill_quantity[fill_row] = fill_quantity
+        self.filled_at[fill_row] = _to_ns(filled_at or datetime.now())
+        self.fill_next[fill_row] = NO_FILL
+        self.fill_row_count += 1
+
+        # Link the fill onto the end of the order's fill chain
+        if self.fill_tail[row] == NO_FILL:
+            self.fill_head[row] = fill_row
+        else:
+            self.fill_next[self.fill_tail[row]] = fill_row
+        self.fill_tail[row] = fill_row
+
+        self.fill_count[row] += 1
+        self.filled_quantity[row] += fill_quantity
+        self.fill_notional[row] += fill_price * fill_quantity
+        self.status[row] = FILLED_CODE if self.filled_quantity[row] >= self.quantity[row] else PARTIALLY_FILLED_CODE
+
+    def get_order(self, order_number: int) -> "OrderView":
+        """Returns a view of an order by its order number"""
+        return OrderView(self, self._row(order_number))
+
+    def open_order_numbers(self) -> np.ndarray:
+        """Returns the order numbers of orders that still need fills"""
+        return self.order_number[:self.order_count][self.status[:self.order_count] != FILLED_CODE]
+
+    def get_open_orders(self) -> List["OrderView"]:
+        """Returns views of the orders that still need fills"""
+        return [OrderView(self, int(row)) for row in np.flatnonzero(self.status[:self.order_count] != FILLED_CODE)]
+
+    def aggregate(self, by: str = "ticker_id", open_only: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Totals order columns per ticker or exchange without touching individual orders
+
+        Args:
+        by: "ticker_id" or "exchange_id"
+        open_only: Only include orders that still need fills
+
+        Returns:
+        Dict[str, np.ndarray]: Aligned arrays of the group keys, order counts, quantities, filled quantities,
+        remaining quantities and fill notional
+        """
+        if by not in ("ticker_id", "exchange_id"):
+            raise ValueError(f"Can't aggregate by {by}")
+
+        size = self.order_count
+        mask = slice(None) if not open_only else self.status[:size] != FILLED_CODE
+        keys = getattr(self, by)[:size][mask]
+        quantity = self.quantity[:size][mask]
+        filled = self.filled_quantity[:size][mask]
+        notional = self.fill_notional[:size][mask]
+
+        groups, inverse = np.unique(keys, return_inverse=True)
+        filled_totals = np.bincount(inverse, weights=filled, minlength=len(groups))
+        quantity_totals = np.bincount(inverse, weights=quantity, minlength=len(groups))
+        return {
+            by: groups,
+            "order_count": np.bincount(inverse, minlength=len(groups)),
+            "quantity": quantity_totals,
+            "filled_quantity": filled_totals,
+            "remaining_quantity": quantity_totals - filled_totals,
+            "fill_notional": np.bincount(inverse, weights=notional, minlength=len(groups)),
+        }
+
+    @classmethod
+    def from_records(cls, orders_data: List[Dict[str, Any]]) -> "ColumnarOrderBook":
+        """
+        Builds a book from records written by Order.to_dict, e.g. from OrderStorage.load_orders
+
+        Records may come in any order and their numbers may have gaps, but each number may appear only once. The
+        records are read into one list per field and each column is assigned whole, with fill totals summed per
+        order by np.bincount. Fills are taken as saved, they were checked when they were first added.
+        """
+        orders_data = sorted(orders_data, key=lambda order_data: order_data["order_number"])
+        fills_data = [order_data["fills"] for order_data in orders_data]
+        fill_counts = np.fromiter((len(fills) for fills in fills_data), dtype=np.int32, count=len(orders_data))
+        fill_total = int(fill_counts.sum())
+        book = cls(capacity=len(orders_data), fill_capacity=fill_total)
+        count = book.add_orders(
+            ticker_ids=[order_data["ticker_id"] for order_data in orders_data],
+            quantities=[order_data["original_quantity"] for order_data in orders_data],
+            prices=[order_data["order_price"] for order_data in orders_data],
+            exchange_ids=[order_data["exchange_id"] for order_data in orders_data],
+            fees=[order_data.get("transaction_fee", 0.0) for order_data in orders_data],
+            created_at=_parse_ns([order_data["created_at"] for order_data in orders_data]),
+            sides=[SIDE_CODES[OrderSide(order_data.get("side", OrderSide.BUY.value))] for order_data in orders_data],
+            order_numbers=[order_data["order_number"] for order_data in orders_data],
+        ).size
+        if not fill_total:
+            return book
+
+        # Each order's fills take consecutive rows, so its chain runs from its first row to its last
+        fill_rows = np.arange(fill_total, dtype=np.int64)
+        order_rows = np.repeat(np.arange(count, dtype=np.int64), fill_counts)
+        book.fill_order_row[:fill_total] = order_rows
+        book.fill_price[:fill_total] = [fill["fill_price"] for fills in fills_data for fill in fills]
+        book.fill_quantity[:fill_total] = [fill["fill_quantity"] for fills in fills_data for fill in fills]
+        book.filled_at[:fill_total] = _parse_ns([fill["filled_at"] for fills in fills_data for fill in fills])
+        book.fill_next[:fill_total] = fill_rows + 1
+        has_fills = fill_counts > 0
+        tails = np.cumsum(fill_counts, dtype=np.int64) - 1
+        book.fill_next[tails[has_fills]] = NO_FILL
+        book.fill_head[:count] = np.where(has_fills, tails - fill_counts + 1, NO_FILL)
+        book.fill_tail[:count] = np.where(has_fills, tails, NO_FILL)
+        book.fill_row_count = fill_total
+
+        quantities = book.fill_quantity[:fill_total]
+        book.fill_count[:count] = fill_counts
+        book.filled_quantity[:count] = np.bincount(order_rows, weights=quantities, minlength=count)
+        book.fill_notional[:count] = np.bincount(order_rows, weights=book.fill_price[:fill_total] * quantities,
+                                                 minlength=count)
+        book.status[:count] = np.where(book.filled_quantity[:count] >= book.quantity[:count], FILLED_CODE,
+                                       np.where(has_fills, PARTIALLY_FILLED_CODE, OPEN_CODE))
+        return book
+
+    def to_records(self) -> List[Dict[str, Any]]:
+        """Returns every order in the layout of Order.to_dict, ready for OrderStorage.save_orders"""
+        return [OrderView(self, row).to_dict() for row in range(self.order_count)]
+
+
+class OrderView:
+    """Read-only view of one row of a ColumnarOrderBook, with the same getters as Order"""
+
+    __slots__ = ("_book", "_row")
+
+    def __init__(self, book: ColumnarOrderBook, row: int):
+        self._book = book
+        self._row = row
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, OrderView) and other._book is self._book and other._row == self._row
+
+    def __hash__(self) -> int:
+        return hash((id(self._book), self._row))
+
+    def __repr__(self) -> str:
+        return f"OrderView(order_number={self.order_number}, status={self.status.value})"
+
+    @property # Getter
+    def order_number(self) -> int:
+        return int(self._book.order_number[self._row])
+
+    @property # Getter
+    def ticker_id(self) -> int:
+        return int(self._book.ticker_id[self._row])
+
+    @property # Getter
+    def exchange_id(self) -> int:
+        return int(self._book.exchange_id[self._row])
+
+    @property # Getter
+    def quantity(self) -> float:
+        return float(self._book.quantity[self._row])
+
+    @property # Getter
+    def order_price(self) -> float:
+        return float(self._book.price[self._row])
+
+    @property # Getter
+    def transaction_fee(self) -> float:
+        return float(self._book.fee[self._row])
+
+    @property # Getter
+    def side(self) -> OrderSide:
+        return SIDES[self._book.side[self._row]]
+
+    @property # Getter
+    def created_at(self) -> datetime:
+        return _from_ns(self._book.created_at[self._row])
+
+    @property # Getter
+    def status(self) -> OrderStatus:
+        return STATUSES[self._book.status[self._row]]
+
+    @property # Getter
+    def is_filled(self) -> bool:
+        return self._book.status[self._row] == FILLED_CODE
+
+    @property # Getter
+    def needs_fills(self) -> bool:
+        return self._book.status[self._row] != FILLED_CODE
+
+    @property # Getter
+    def filled_quantity(self) -> float:
+        return float(self._book.filled_quantity[self._row])
+
+    @property # Getter
+    def remaining_quantity(self) -> float:
+        return self.quantity - self.filled_quantity
+
+    @property # Getter
+    def fill_count(self) -> int:
+        return int(self._book.fill_count[self._row])
+
+    @property # Getter
+    def average_fill_price(self) -> float:
+        if not self.fill_count:
+            return 0.0
+        return float(self._book.fill_notional[self._row] / self._book.filled_quantity[self._row])
+
+    @property # Getter
+    def fills(self) -> List[OrderFill]:
+        """Returns the order's fills, built from the fills table on each call"""
+        book = self._book
+        fills = []
+        fill_row = book.fill_head[self._row]
+        while fill_row != NO_FILL:
+            fills.append(OrderFill(
+                float(book.fill_price[fill_row]), float(book.fill_quantity[fill_row]),
+                _from_ns(book.filled_at[fill_row])
+            ))
+            fill_row = book.fill_next[fill_row]
+        return fills
+
+    def add_fill(self, price: float, quantity: float, filled_at: Optional[datetime] = None) -> None:
+        """Adds a fill to the underlying row"""
+        self._book.fill_order(self.order_number, price, quantity, filled_at)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the order in the layout of Order.to_dict"""
+        return {
+            "order_number": self.order_number,
+            "ticker_id": self.ticker_id,
+            "exchange_id": self.exchange_id,
+            "side": self.side.value,
+            "original_quantity": self.quantity,
+            "order_price": self.order_price,
+            "created_at": str(self.created_at),
+            "status": self.status.value,
+            "needs_fills": self.needs_fills,
+            "filled_quantity": self.filled_quantity,
+            "remaining_quantity": self.remaining_quantity,
+            "average_fill_price": self.average_fill_price,
+            "transaction_fee": self.transaction_fee,
+            "fills": [
+                {
+                    "fill_price": fill.fill_price,
+                    "fill_quantity": fill.fill_quantity,
+                    "filled_at": str(fill.filled_at)
+                }
+                for fill in self.fills
+            ]
+        }
@@ -0,0 +1,110 @@
+# order_journal.py
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+
+class OrderJournal:
+    """Append-only log of order events, replayed on top of the last orders snapshot"""
+
+    def __init__(self, file_path: str, fsync_every: int = 1):
+        """
+        Args:
+        file_path: Path of the journal file, it is created if it doesn't exist
+        fsync_every: Number of events written between fsync calls, 1 syncs every event
+        """
+        if fsync_every < 1:
+            raise ValueError("fsync_every must be at least 1")
+
+        self.file_path = file_path
+        self.fsync_every = fsync_every
+        self.events_since_snapshot = 0 # Events written since the journal was last truncated
+        self._unsynced = 0 # Events written since the last fsync
+        self._lock = threading.Lock() # Writers may be on several threads
+        self._file = open(self.file_path, 'a', encoding='utf-8')
+
+    def append(self, event: Dict[str, Any]) -> None:
+        """Writes a single event to the end of the journal"""
+        self.append_many((event,))
+
+    def append_many(self, events: Iterable[Dict[str, Any]]) -> None:
+        """Writes events to the end of the journal with a single write call"""
+        lines = [json.dumps(event, separators=(',', ':')) + '\n' for event in events]
+        if not lines:
+            return
+
+        # Flushed on every write so a crashed process loses nothing, fsync is batched for power loss
+        with self._lock:
+            self._file.write(''.join(lines))
+            self._file.flush()
+            self.events_since_snapshot += len(lines)
+            self._unsynced += len(lines)
+            if self._unsynced >= self.fsync_every:
+                self._sync()
+
+    def sync(self) -> None:
+        """Forces written events to disk"""
+        with self._lock:
+            self._sync()
+
+    def _sync(self) -> None:
+        if self._file.closed:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def replay(self) -> Iterator[Dict[str, Any]]:
+        """
+        Reads the journal from the start
+
+        Returns:
+        Iterator[Dict]: The events in the order they were written, a torn last line is skipped
+        """
+        self._file.flush()
+        count = 0
+        valid_size = 0 # Bytes up to the end of the last complete event
+        torn = False
+        with open(self.file_path, 'rb') as file:
+            for line_number, line in enumerate(file, 1):
+                try:
+                    event = json.loads(line) if line.strip() else None
+                except ValueError:
+                    # Only the last write can be partial, anything after it is unreadable anyway
+                    logger.warning("Ignoring incomplete journal entry on line %s of %s", line_number, self.file_path)
+                    torn = True
+                    break
+                if not line.endswith(b'\n'):
+                    torn = True
+                    break
+                valid_size += len(line)
+                if event is not None:
+                    count += 1
+                    yield event
+        self.events_since_snapshot = count
+
+        # Cut the torn tail off so new events aren't appended after it
+        if torn:
+            self._file.close()
+            with open(self.file_path, 'r+b') as file:
+                file.truncate(valid_size)
+            self._file = open(self.file_path, 'a', encoding='utf-8')
+
+    def truncate(self) -> None:
+        """Empties the journal, called once its events are part of a snapshot"""
+        with self._lock:
+            self._file.close()
+            self._file = open(self.file_path, 'w', encoding='utf-8')
+            self._sync()
+            self.events_since_snapshot = 0
+
+    def close(self) -> None:
+        """Syncs and closes the journal file"""
+        with self._lock:
+            if not self._file.closed:
+                self._sync()
+                self._file.close()
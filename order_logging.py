@@ -0,0 +1,105 @@
+# order_logging.py
+import json
+import logging
+import sys
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+# Default for LogSampler, set with configure_logging
+_sample_every = 1000
+
+
+class _Fields:
+    """key=value rendering of event fields, only built if a handler formats the record"""
+
+    __slots__ = ("fields",)
+
+    def __init__(self, fields: Dict[str, Any]):
+        self.fields = fields
+
+    def __str__(self) -> str:
+        return " ".join(f"{key}={value}" for key, value in self.fields.items())
+
+
+class StructuredFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, including the fields passed to log_event"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+        }
+        event = getattr(record, "event", None)
+        if event is not None:
+            entry["event"] = event
+            entry.update(record.fields)
+        else:
+            entry["message"] = record.getMessage()
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+def configure_logging(level: int = logging.INFO, structured: bool = False, sample_every: int = 1000,
+                      stream=None) -> None:
+    """
+    Sets up logging for scripts using the order manager, libraries importing it leave logging alone
+
+    Args:
+    level: Lowest level that is written
+    structured: Write JSON lines instead of plain text
+    sample_every: How often LogSampler writes a per operation line
+    stream: Where to write, defaults to stderr
+    """
+    global _sample_every
+    _sample_every = max(sample_every, 1)
+
+    handler = logging.StreamHandler(stream if stream is not None else sys.stderr)
+    if structured:
+        handler.setFormatter(StructuredFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(level)
+
+
+def log_event(logger: logging.Logger, level: int, event: str, **fields: Any) -> None:
+    """Logs an event with key=value fields, nothing is formatted unless the level is enabled"""
+    if logger.isEnabledFor(level):
+        logger.log(level, "%s %s", event, _Fields(fields), extra={"event": event, "fields": fields})
+
+
+@contextmanager
+def log_timing(logger: logging.Logger, event: str, level: int = logging.INFO) -> Iterator[Dict[str, Any]]:
+    """
+    Logs one summary event for a bulk operation, with its duration in elapsed_ms
+
+    Yields:
+    Dict[str, Any]: Fields to add to the event, e.g. the number of orders handled
+    """
+    fields: Dict[str, Any] = {}
+    start = time.perf_counter()
+    yield fields
+    fields["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    log_event(logger, level, event, **fields)
+
+
+class LogSampler:
+    """Logs the first and then every Nth occurrence of a frequent event, with how many have happened"""
+
+    def __init__(self, logger: logging.Logger, event: str, level: int = logging.INFO, every: Optional[int] = None):
+        self.logger = logger
+        self.event = event
+        self.level = level
+        self.every = every
+        self.count = 0
+
+    def __call__(self, **fields: Any) -> None:
+        self.count += 1
+        every = self.every if self.every is not None else _sample_every
+        if self.count == 1 or self.count % every == 0:
+            log_event(self.logger, self.level, self.event, count=self.count, **fields)
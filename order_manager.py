@@ -1,23 +1,52 @@
 # order_manager.py
-from dataclasses import dataclass
-from typing import List
+import bisect
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager, nullcontext
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
 import logging
-from datetime import datetime
-import json
+from datetime import datetime, timedelta
 import os
 import pathlib
+import time
+import threading
 from enum import Enum
-import pandas as pd
+from order_archive import ARCHIVE_FOLDER, OrderArchive, RetentionPolicy
+from order_journal import OrderJournal
+from order_logging import LogSampler, log_event, log_timing
+from order_storage import JsonOrderStorage, OrderStorage
+from reference_data import TickerTable
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# pandas is only needed for data frames, it is imported on first use so workers that place and fill orders start quickly
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Logging is configured by the scripts that use the manager, see order_logging.configure_logging
 logger = logging.getLogger(__name__)
 
+JOURNAL_FILENAME = "orders.journal"
+LOCK_STRIPES = 64 # Fill locks in thread safe mode, orders share a lock when their numbers match modulo this
+LOAD_MODES = ("eager", "deferred", "background") # When OrderManager loads saved orders
+
+# Columns of the frames built by OrderManager.get_order_frames
+ORDER_FRAME_COLUMNS = [
+    "order_number", "ticker_id", "exchange_id", "original_quantity", "order_price", "created_at", "status",
+    "needs_fills", "filled_quantity", "remaining_quantity", "average_fill_price", "transaction_fee", "fill_count",
+    "side"
+]
+FILL_FRAME_COLUMNS = ["order_number", "fill_price", "fill_quantity", "filled_at"]
+
 class OrderStatus(Enum):
     """Enum for order status"""
     OPEN = "Open"
     PARTIALLY_FILLED = "Partially Filled"
     FILLED = "Filled"
+
+
+class OrderSide(Enum):
+    """Enum for order side"""
+    BUY = "buy"
+    SELL = "sell"
    
 
 @dataclass
@@ -28,6 +57,7 @@ class OrderDetails:
     order_price: float = 0.0
     exchange_id: int = 0
     transaction_fee: float = 0.0
+    side: OrderSide = OrderSide.BUY
 
 
 @dataclass
@@ -35,22 +65,41 @@ class OrderFill:
     """Represents a single fill for an order"""
     fill_price: float
     fill_quantity: float
-    filled_at: datetime = datetime.now()
+    filled_at: datetime = field(default_factory=datetime.now)
+
+
+@dataclass
+class BatchResult:
+    """Outcome of a batch call, with one entry in results per input item"""
+    results: List[Any] = field(default_factory=list) # Order or OrderFill per item, None where the item was rejected
+    errors: Dict[int, str] = field(default_factory=dict) # Index of each rejected item -> reason
+
+    @property # Getter
+    def succeeded(self) -> int:
+        """Returns the number of items that were applied"""
+        return len(self.results) - len(self.errors)
+
+    def _reject(self, index: int, error: str) -> None:
+        self.results.append(None)
+        self.errors[index] = error
 
 class Order:
     """Represents a single trading order"""
 
     # Constructor creates an order wtih the given details 
-    def __init__(self, details: OrderDetails):
+    def __init__(self, details: OrderDetails, order_number: int = 0):
         self.details = details
+        self.order_number = order_number # Stable order number, assigned by the OrderManager
         self.created_at = datetime.now() # Logs when the 
         self.fills: List[OrderFill] = [] # List of fills, by default there are no fills until they are filled. 
         self._status = OrderStatus.OPEN # By default, all orders are open until filled. 
-        logger.info(f"Order created with status: {self._status.value} and transaction fee: {self.details.transaction_fee}") # Logs when the object is created
+        self._observer = None # OrderManager indexing this order, told about status changes
 
-    # Destructor: Destoryts the object 
-    def __del__(self):
-        logger.info("Order destroyed")
+        # Running fill totals, kept in step with self.fills so the getters below don't re-sum the list
+        self._filled_quantity = 0
+        self._fill_notional = 0
+        self.first_fill_at: Optional[datetime] = None
+        self.last_fill_at: Optional[datetime] = None
 
     @property # Getter
     def status(self) -> OrderStatus:
@@ -70,7 +119,17 @@ class Order:
     @property # Getter
     def filled_quantity(self) -> float:
         """Returns the total quantity filled so far"""
-        return sum(fill.fill_quantity for fill in self.fills)
+        return self._filled_quantity
+
+    @property # Getter
+    def fill_notional(self) -> float:
+        """Returns the total value (price * quantity) filled so far"""
+        return self._fill_notional
+
+    @property # Getter
+    def fill_count(self) -> int:
+        """Returns the number of fills received"""
+        return len(self.fills)
 
     @property # Getter
     def remaining_quantity(self) -> float:
@@ -82,8 +141,7 @@ class Order:
         """Returns the weighted average fill price"""
         if not self.fills:
             return 0.0
-        total_value = sum(fill.fill_price * fill.fill_quantity for fill in self.fills)
-        return total_value / self.filled_quantity
+        return self._fill_notional / self._filled_quantity
 
     @property # Getter
     def ticker_id(self) -> int:
@@ -101,6 +159,10 @@ class Order:
     def exchange_id(self) -> int:
         return self.details.exchange_id
 
+    @property # Getter
+    def side(self) -> OrderSide:
+        return self.details.side
+
     @property
     def transaction_fee(self) -> float:
         """Returns the transaction fee for the order"""
@@ -109,126 +171,732 @@ class Order:
     # Updates the status on an order
     def _update_status(self) -> None:
         """Updates the order status based on fills"""
+        old_status = self._status
         if self.filled_quantity >= self.quantity:
             self._status = OrderStatus.FILLED
-            logger.info(f"Order is now completely filled")
+            logger.debug("Order #%s is now completely filled", self.order_number)
         elif self.fills:
             self._status = OrderStatus.PARTIALLY_FILLED
         else:
             self._status = OrderStatus.OPEN
 
+        if self._status is not old_status and self._observer is not None:
+            self._observer._order_status_changed(self, old_status)
+
     # Adds a fill to the order 
-    def add_fill(self, price: float, quantity: float) -> None:
-        """Adds a new fill to the order"""
+    def add_fill(self, price: float, quantity: float, filled_at: Optional[datetime] = None) -> OrderFill:
+        """Adds a new fill to the order, filled_at defaults to now"""
+        error = self._check_fill(quantity)
+        if error is not None:
+            raise ValueError(error)
+
+        fill = OrderFill(price, quantity, filled_at if filled_at is not None else datetime.now())
+        self._append_fill(fill)
+        logger.debug("Order #%s received fill: %s @ %s. Status: %s", self.order_number, quantity, price, self._status.value)
+        return fill
+
+    def _check_fill(self, quantity: float) -> Optional[str]:
+        """Returns why a fill of this quantity can't be added, None if it can"""
         if not self.needs_fills:
-            raise ValueError("Order is already completely filled")
-
+            return "Order is already completely filled"
         if quantity > self.remaining_quantity:
-            raise ValueError(f"Fill quantity ({quantity}) exceeds remaining quantity ({self.remaining_quantity})")
+            return f"Fill quantity ({quantity}) exceeds remaining quantity ({self.remaining_quantity})"
+        return None
 
-        fill = OrderFill(price, quantity)
+    def _append_fill(self, fill: OrderFill) -> None:
+        """Adds an already checked fill and updates the totals and status"""
         self.fills.append(fill)
+        self._record_fill(fill)
         self._update_status()
-        logger.info(f"Order received fill: {quantity} @ {price}. Status: {self._status.value}")
+        if self._observer is not None:
+            self._observer._order_filled(self, fill)
+
+    def _record_fill(self, fill: OrderFill) -> None:
+        """Adds a fill that was just appended to self.fills to the running totals"""
+        self._filled_quantity += fill.fill_quantity
+        self._fill_notional += fill.fill_price * fill.fill_quantity
+        if self.first_fill_at is None:
+            self.first_fill_at = fill.filled_at
+        self.last_fill_at = fill.filled_at
+
+    def _rebuild_fill_totals(self) -> None:
+        """Recomputes the running totals from self.fills, used after fills are restored in bulk"""
+        self._filled_quantity = 0
+        self._fill_notional = 0
+        self.first_fill_at = None
+        self.last_fill_at = None
+        for fill in self.fills:
+            self._record_fill(fill)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Returns the order as a JSON serializable dictionary"""
+        return {
+            "order_number": self.order_number,
+            "ticker_id": self.ticker_id,
+            "exchange_id": self.exchange_id,
+            "side": self.side.value,
+            "original_quantity": self.quantity,
+            "order_price": self.order_price,
+            "created_at": str(self.created_at),
+            "status": self.status.value,
+            "needs_fills": self.needs_fills,
+            "filled_quantity": self.filled_quantity,
+            "remaining_quantity": self.remaining_quantity,
+            "average_fill_price": self.average_fill_price,
+            "transaction_fee": self.transaction_fee,
+            "fills": [
+                {
+                    "fill_price": fill.fill_price,
+                    "fill_quantity": fill.fill_quantity,
+                    "filled_at": str(fill.filled_at)
+                }
+                for fill in self.fills
+            ]
+        }
+
+    @classmethod
+    def from_dict(cls, order_data: Dict[str, Any]) -> "Order":
+        """
+        Rebuilds an order from a dictionary written by to_dict
+
+        Args:
+        order_data: The saved order
+
+        Returns:
+        Order: The restored order, fills are added without validation
+        """
+        details = OrderDetails(
+            ticker_id=order_data["ticker_id"],
+            order_quantity=order_data["original_quantity"],
+            order_price=order_data["order_price"],
+            exchange_id=order_data["exchange_id"],
+            # Older files were written without the fee or side
+            transaction_fee=order_data.get("transaction_fee", 0.0),
+            side=OrderSide(order_data.get("side", OrderSide.BUY.value))
+        )
+
+        # Create a new order with the saved order number
+        order = cls(details, order_number=order_data["order_number"])
+        order.created_at = datetime.fromisoformat(order_data["created_at"])
+
+        # Add fills by directly adding to the fills list
+        for fill_data in order_data["fills"]:
+            fill_price = fill_data["fill_price"]
+            fill_quantity = fill_data["fill_quantity"]
+            # Fills saved without a time are dated with their order rather than with the time they were loaded
+            filled_at = fill_data.get("filled_at")
+            filled_at = datetime.fromisoformat(filled_at) if filled_at else order.created_at
+
+            # Add fill directly to the list to bypass validation
+            order.fills.append(OrderFill(fill_price, fill_quantity, filled_at))
+
+        # Totals are rebuilt once for all restored fills, then the status follows from them
+        order._rebuild_fill_totals()
+        order._update_status()
+        return order
+
+def _insert_in_order(index: Dict[int, Order], order: Order) -> None:
+    """Adds an order to an index keyed by order number, keeping the keys in ascending order"""
+    if index and next(reversed(index)) > order.order_number:
+        entries = sorted([*index.items(), (order.order_number, order)], key=lambda entry: entry[0])
+        index.clear()
+        index.update(entries)
+    else:
+        index[order.order_number] = order
 
 class OrderManager:
     """Manages a collection of trading orders"""
 
     
-    def __init__(self, data_folder: str = "data"):
+    def __init__(self, data_folder: str = "data", journal: bool = False, fsync_every: int = 1,
+                 snapshot_every: int = 0, storage: Optional[OrderStorage] = None, thread_safe: bool = False,
+                 order_number_start: int = 1, order_number_step: int = 1, load: str = "eager",
+                 reference_data: Optional[TickerTable] = None, retention: Optional[RetentionPolicy] = None):
+        """
+        Args:
+        data_folder: Folder holding the orders file (and journal)
+        journal: Log every add_order and fill_order to an append-only journal instead of relying on save_orders
+        fsync_every: Journal events written between fsync calls
+        snapshot_every: Compact the journal into orders.json after this many events, 0 to only compact on request
+        storage: Where orders are saved and loaded, defaults to JSON files in data_folder
+        thread_safe: Lock the manager so orders can be added and filled from several threads at once
+        order_number_start: First order number given out
+        order_number_step: Gap between order numbers, so several managers can share one number space
+        load: When saved orders are loaded. "eager" loads them now, "deferred" on the first call that needs them,
+        and "background" starts loading them on a thread now, with calls that need them waiting for it
+        reference_data: Ticker table that new orders are checked against and data frames are enriched from
+        retention: When filled orders are moved out of memory into the archive in data_folder/archive
+        """
+        if order_number_start < 1 or order_number_step < 1:
+            raise ValueError("order_number_start and order_number_step must be at least 1")
+        if load not in LOAD_MODES:
+            raise ValueError(f"load must be one of {LOAD_MODES}, got {load!r}")
+
         self.orders: List[Order] = []
-        self.next_order_number = 1  # Default to 1 for new instances with no orders
+        self.order_number_start = order_number_start
+        self.order_number_step = order_number_step
+        self.next_order_number = order_number_start  # Default to the first number for new instances with no orders
         self.data_folder = data_folder
+
+        # Indexes over self.orders, keyed by order number so entries can be found and moved in O(1)
+        self._orders_by_number: Dict[int, Order] = {}
+        self._orders_by_ticker: Dict[int, Dict[int, Order]] = defaultdict(dict)
+        self._orders_by_exchange: Dict[int, Dict[int, Order]] = defaultdict(dict)
+        self._orders_by_status: Dict[OrderStatus, Dict[int, Order]] = {status: {} for status in OrderStatus}
+
+        # Bumped on every added order and fill, so views can ask for only the orders that changed since they looked
+        self.revision = 0
+        self._order_revisions: Dict[int, int] = {} # Order number -> revision of its last change, oldest change first
+        self._written_revisions: Dict[str, int] = {} # Filename -> revision of the orders last written to it
+        self._fill_listeners: List[Callable[[Order, OrderFill], Any]] = [] # Called with each new fill
+        self._order_listeners: List[Callable[[Order], Any]] = [] # Called with each new order
+
+        # In thread safe mode self._lock guards the indexes and order numbers, and fills on an order are
+        # serialized by its striped fill lock. Fill locks are always taken before self._lock.
+        self.thread_safe = thread_safe
+        if thread_safe:
+            self._lock = threading.RLock()
+            self._fill_locks = [threading.RLock() for _ in range(LOCK_STRIPES)]
+        else:
+            self._lock = nullcontext()
+            self._fill_locks = [self._lock] * LOCK_STRIPES
+
         self._ensure_data_folder_exists()
+
+        self.storage = storage if storage is not None else JsonOrderStorage(self.data_folder)
+        self.reference_data = reference_data
+        self._loaded_filename = "orders.json" # Saved orders that get_order falls back to
+
+        # Archived orders are skipped when loading, so the archive is opened first. An archive written under a
+        # retention policy is still read without one, its orders only exist there.
+        self.retention = retention
+        self.archive: Optional[OrderArchive] = None
+        archive_folder = os.path.join(self.data_folder, ARCHIVE_FOLDER)
+        if retention is not None or os.path.isdir(archive_folder):
+            self.archive = OrderArchive(archive_folder)
+        self._fills_since_archive = 0
+
+        self.snapshot_every = snapshot_every
+        self.journal: Optional[OrderJournal] = None
+        if journal:
+            self.journal = OrderJournal(os.path.join(self.data_folder, JOURNAL_FILENAME), fsync_every)
+        # Per operation lines are sampled, so busy managers log a steady trickle rather than every call
+        self._log_order_added = LogSampler(logger, "order_added")
+        self._log_fill_added = LogSampler(logger, "fill_added")
         logger.info("OrderManager created")
 
-        # Automatically load orders when creating the manager
-        # This ensures we have the correct next_order_number right from initialization
-        self.load_orders()
+        # Saved orders must be loaded before orders are added or looked up
+        # This ensures we have the correct next_order_number before the first new order
+        self._loaded = False
+        self._load_lock = threading.Lock()
+        self._loader: Optional[threading.Thread] = None
+        if load == "eager":
+            self._ensure_loaded()
+        elif load == "background":
+            self._loader = threading.Thread(target=self._ensure_loaded, name="order-manager-load", daemon=True)
+            self._loader.start()
+
+    def _ensure_loaded(self) -> None:
+        """Loads saved orders on first use, waiting for a background load that is already running"""
+        if self._loaded:
+            return
+        with self._load_lock:
+            if not self._loaded:
+                self.load_orders()
+                self._loaded = True
+                if self.retention is not None:
+                    self.archive_orders()
 
-    def __del__(self):
-        logger.info("OrderManager destroyed")
+    def wait_until_loaded(self) -> None:
+        """Blocks until saved orders are in memory, for callers that read manager.orders directly"""
+        self._ensure_loaded()
 
     def _ensure_data_folder_exists(self) -> None:
         """Ensures the data folder exists, creates it if it doesn't"""
         pathlib.Path(self.data_folder).mkdir(parents=True, exist_ok=True)
-        logger.info(f"Using data folder: {self.data_folder}")
+        logger.info("Using data folder: %s", self.data_folder)
+
+    def _order_number_after(self, order_number: int) -> int:
+        """Returns the first order number this manager gives out that is above order_number"""
+        if order_number < self.order_number_start:
+            return self.order_number_start
+        steps = (order_number - self.order_number_start) // self.order_number_step + 1
+        return self.order_number_start + steps * self.order_number_step
+
+    def _fill_lock(self, order_number: int):
+        """Returns the lock that serializes fills on an order"""
+        return self._fill_locks[order_number % LOCK_STRIPES]
+
+    @contextmanager
+    def _exclusive(self):
+        """Holds every lock, for operations that need a consistent view of all orders"""
+        if not self.thread_safe:
+            yield
+            return
+        with ExitStack() as stack:
+            for lock in self._fill_locks:
+                stack.enter_context(lock)
+            stack.enter_context(self._lock)
+            yield
+
+    def _index_order(self, order: Order) -> None:
+        """Adds an order to the order list and all lookup indexes"""
+        with self._lock:
+            self.orders.append(order)
+            self._orders_by_number[order.order_number] = order
+            self._orders_by_ticker[order.ticker_id][order.order_number] = order
+            self._orders_by_exchange[order.exchange_id][order.order_number] = order
+            self._orders_by_status[order.status][order.order_number] = order
+            order._observer = self
+            self._order_changed(order)
+
+    def _page_in(self, order: Order) -> None:
+        """
+        Indexes a saved order that wasn't loaded, in order number order and without recording a change
+
+        Paged in orders are unchanged since they were saved, so writers and views don't need to see them again.
+        """
+        with self._lock:
+            if self.orders and self.orders[-1].order_number > order.order_number:
+                bisect.insort(self.orders, order, key=lambda other: other.order_number)
+            else:
+                self.orders.append(order)
+            self._orders_by_number[order.order_number] = order
+            for index in (self._orders_by_ticker[order.ticker_id], self._orders_by_exchange[order.exchange_id],
+                          self._orders_by_status[order.status]):
+                _insert_in_order(index, order)
+            order._observer = self
+
+    def _is_archived(self, order_number: int) -> bool:
+        return self.archive is not None and order_number in self.archive
+
+    def _remove_orders(self, orders: Sequence[Order]) -> None:
+        """Takes orders out of the order list and every index, in one pass over the list"""
+        order_numbers = {order.order_number for order in orders}
+        with self._lock:
+            self.orders = [order for order in self.orders if order.order_number not in order_numbers]
+            for order in orders:
+                del self._orders_by_number[order.order_number]
+                for index, key in ((self._orders_by_ticker, order.ticker_id),
+                                   (self._orders_by_exchange, order.exchange_id)):
+                    index[key].pop(order.order_number, None)
+                    if not index[key]:
+                        del index[key]
+                self._orders_by_status[order.status].pop(order.order_number, None)
+                self._order_revisions.pop(order.order_number, None)
+                order._observer = None
+
+    def _order_changed(self, order: Order) -> None:
+        """Records a new revision for an added or filled order, called by the order itself on fills"""
+        with self._lock:
+            self.revision += 1
+            # Reinserting keeps the dict ordered by revision
+            self._order_revisions.pop(order.order_number, None)
+            self._order_revisions[order.order_number] = self.revision
+
+    def _order_filled(self, order: Order, fill: OrderFill) -> None:
+        """Records the new revision of a filled order and passes the fill on, called by the order itself"""
+        self._order_changed(order)
+        for listener in self._fill_listeners:
+            listener(order, fill)
+
+    def _order_status_changed(self, order: Order, old_status: OrderStatus) -> None:
+        """Moves an order between status indexes, called by the order itself"""
+        with self._lock:
+            self._orders_by_status[old_status].pop(order.order_number, None)
+            self._orders_by_status[order.status][order.order_number] = order
+
+    def _write_journal(self, events: List[Dict[str, Any]]) -> None:
+        """Appends events to the journal when journaling is on"""
+        if self.journal is not None:
+            self.journal.append_many(events)
+
+    def _maybe_compact(self) -> None:
+        """Compacts the journal once it has grown past snapshot_every, called after the caller's locks are released"""
+        if self.journal is not None and self.snapshot_every and self.journal.events_since_snapshot >= self.snapshot_every:
+            self.compact()
+
+    @staticmethod
+    def _order_added_event(order: Order) -> Dict[str, Any]:
+        """Journal event for a new order"""
+        return {
+            "event": "order_added",
+            "order_number": order.order_number,
+            "ticker_id": order.ticker_id,
+            "exchange_id": order.exchange_id,
+            "side": order.side.value,
+            "order_quantity": order.quantity,
+            "order_price": order.order_price,
+            "transaction_fee": order.transaction_fee,
+            "created_at": str(order.created_at)
+        }
+
+    @staticmethod
+    def _fill_added_event(order: Order, fill: OrderFill) -> Dict[str, Any]:
+        """Journal event for a new fill, fill_index makes replaying it over a snapshot idempotent"""
+        return {
+            "event": "fill_added",
+            "order_number": order.order_number,
+            "fill_index": order.fill_count - 1,
+            "fill_price": fill.fill_price,
+            "fill_quantity": fill.fill_quantity,
+            "filled_at": str(fill.filled_at)
+        }
+
+    def _apply_journal_event(self, event: Dict[str, Any], pending_fills: Dict[int, Dict[int, Dict[str, Any]]]) -> None:
+        """
+        Replays one journal event, skipping anything the loaded snapshot already contains
+
+        Args:
+        event: The journal event
+        pending_fills: Fill events that arrived ahead of an earlier fill (or their order), by order and fill index.
+        Threads journal their changes independently, so events for one order can be out of order.
+        """
+        order_number = event["order_number"]
+        if self._is_archived(order_number):
+            return # Archived orders are filled, the archive already has every event for them
+        if event["event"] == "order_added":
+            if order_number in self._orders_by_number:
+                return
+            details = OrderDetails(
+                ticker_id=event["ticker_id"],
+                order_quantity=event["order_quantity"],
+                order_price=event["order_price"],
+                exchange_id=event["exchange_id"],
+                transaction_fee=event["transaction_fee"],
+                side=OrderSide(event.get("side", OrderSide.BUY.value))
+            )
+            order = Order(details, order_number=order_number)
+            order.created_at = datetime.fromisoformat(event["created_at"])
+            self._index_order(order)
+            self.next_order_number = max(self.next_order_number, self._order_number_after(order_number))
+        elif event["event"] == "fill_added":
+            pending_fills[order_number][event["fill_index"]] = event
+            try:
+                order = self._get_order(order_number)
+            except ValueError:
+                return # Its order_added event comes later
+        else:
+            raise ValueError(f"Unknown journal event: {event['event']}")
+
+        # Apply this order's fills that are next in line
+        fills = pending_fills.get(order_number)
+        while fills:
+            for fill_index in [fill_index for fill_index in fills if fill_index < order.fill_count]:
+                del fills[fill_index]
+            fill_event = fills.pop(order.fill_count, None)
+            if fill_event is None:
+                break
+            order.add_fill(fill_event["fill_price"], fill_event["fill_quantity"],
+                           datetime.fromisoformat(fill_event["filled_at"]))
+        if not fills:
+            pending_fills.pop(order_number, None)
 
     def add_order(self, details: OrderDetails) -> Order:
         """Creates and adds a new order with the given detailsuration"""
-        new_order = Order(details)
-        self.orders.append(new_order)
-        logger.info(f"Added Order #{self.next_order_number} with transaction fee: {details.transaction_fee}")
-        self.next_order_number += 1
+        self._ensure_loaded()
+        if self.reference_data is not None:
+            error = self.reference_data.check_order(details.ticker_id, details.exchange_id)
+            if error is not None:
+                raise ValueError(error)
+        with self._lock:
+            new_order = Order(details, order_number=self.next_order_number)
+            self._index_order(new_order)
+            self.next_order_number += self.order_number_step
+            self._write_journal([self._order_added_event(new_order)])
+            for listener in self._order_listeners:
+                listener(new_order)
+        logger.debug("Added Order #%s with transaction fee: %s", new_order.order_number, details.transaction_fee)
+        self._log_order_added(order_number=new_order.order_number)
+        self._maybe_compact()
         return new_order
 
+    def _check_details(self, details: Any) -> Optional[str]:
+        """Returns why details can't be used for a new order in a batch, None if they can"""
+        if not isinstance(details, OrderDetails):
+            return f"Expected OrderDetails, got {type(details).__name__}"
+        if details.order_quantity <= 0:
+            return f"Order quantity must be positive, got {details.order_quantity}"
+        if details.order_price < 0:
+            return f"Order price can't be negative, got {details.order_price}"
+        if details.transaction_fee < 0:
+            return f"Transaction fee can't be negative, got {details.transaction_fee}"
+        if not isinstance(details.side, OrderSide):
+            return f"Expected OrderSide, got {type(details.side).__name__}"
+        if self.reference_data is not None:
+            return self.reference_data.check_order(details.ticker_id, details.exchange_id)
+        return None
+
+    def _finish_batch(self, events: List[Dict[str, Any]], save: bool, filename: str) -> None:
+        """Persists a batch with at most one journal write and one save"""
+        self._write_journal(events)
+        self._maybe_compact()
+        if save:
+            self.save_orders(filename)
+
+    def add_orders(self, orders_to_add: Sequence[OrderDetails], save: bool = False,
+                   filename: str = "orders.json") -> BatchResult:
+        """
+        Adds a batch of orders, checking each one and logging a single summary
+
+        Args:
+        orders_to_add: Details of the orders to add
+        save: Call save_orders once after the batch (not needed in journal mode)
+        filename: The file save_orders writes to
+
+        Returns:
+        BatchResult: The new Order for each item, or why it was rejected
+        """
+        self._ensure_loaded()
+        result = BatchResult()
+        events = []
+
+        with log_timing(logger, "orders_added_in_batch") as summary, self._lock:
+            for index, details in enumerate(orders_to_add):
+                error = self._check_details(details)
+                if error is not None:
+                    result._reject(index, error)
+                    continue
+
+                new_order = Order(details, order_number=self.next_order_number)
+                self._index_order(new_order)
+                self.next_order_number += self.order_number_step
+                result.results.append(new_order)
+                if self.journal is not None:
+                    events.append(self._order_added_event(new_order))
+                for listener in self._order_listeners:
+                    listener(new_order)
+
+            # Written under the lock so add events reach the journal in order number order
+            self._write_journal(events)
+            summary.update(added=result.succeeded, rejected=len(result.errors))
+
+        self._finish_batch([], save, filename)
+        return result
+
+    def fill_orders(self, fills_to_add: Sequence[Tuple[int, float, float]], save: bool = False,
+                    filename: str = "orders.json") -> BatchResult:
+        """
+        Applies a batch of fills in order, checking each one and logging a single summary
+
+        Args:
+        fills_to_add: (order_number, fill_price, fill_quantity) per fill, e.g. a list of tuples or an N x 3 array
+        save: Call save_orders once after the batch (not needed in journal mode)
+        filename: The file save_orders writes to
+
+        Returns:
+        BatchResult: The new OrderFill for each item, or why it was rejected
+        """
+        self._ensure_loaded()
+        result = BatchResult()
+        events = []
+
+        with log_timing(logger, "fills_added_in_batch") as summary:
+            self._fill_batch(fills_to_add, result, events)
+            self._finish_batch(events, save, filename)
+            summary.update(added=result.succeeded, rejected=len(result.errors))
+        self._maybe_archive(result.succeeded)
+        return result
+
+    def _fill_batch(self, fills_to_add: Sequence[Tuple[int, float, float]], result: BatchResult,
+                    events: List[Dict[str, Any]]) -> None:
+        """Applies the fills of a fill_orders call, recording each outcome in result and the journal events in events"""
+        orders_by_number = self._orders_by_number
+        for index, (order_number, fill_price, fill_quantity) in enumerate(fills_to_add):
+            order_number = int(order_number)
+            order = orders_by_number.get(order_number)
+            if order is None:
+                try:
+                    order = self._get_order(order_number)
+                except ValueError as e:
+                    result._reject(index, str(e))
+                    continue
+
+            if fill_quantity <= 0:
+                result._reject(index, f"Fill quantity must be positive, got {fill_quantity}")
+                continue
+
+            with self._fill_lock(order_number):
+                error = order._check_fill(fill_quantity)
+                if error is not None:
+                    result._reject(index, f"Order #{order_number}: {error}")
+                    continue
+
+                fill = OrderFill(fill_price, fill_quantity, datetime.now())
+                order._append_fill(fill)
+                result.results.append(fill)
+                if self.journal is not None:
+                    events.append(self._fill_added_event(order, fill))
+
     def get_order(self, order_number: int) -> Order:
         """Retrieves an order by its order number"""
-        for order in self.orders:
-            if order_number == self.orders.index(order) + 1:
-                return order
-        raise ValueError(f"Order #{order_number} not found")
-
-    def append_orders(self, filename: str = "orders.json") -> None:
-        """Appends current orders to existing JSON file"""
-        file_path = os.path.join(self.data_folder, filename)
-        existing_orders = []
+        self._ensure_loaded()
+        return self._get_order(order_number)
+
+    def _get_order(self, order_number: int) -> Order:
+        order = self._orders_by_number.get(order_number)
+        if order is None:
+            with self._lock:
+                order = self._orders_by_number.get(order_number)
+                if order is None and self._is_archived(order_number):
+                    # Not indexed, archived orders are read on each request rather than brought back into memory
+                    return Order.from_dict(self.archive.read(order_number))
+                if order is None:
+                    # Storage may hold orders that weren't loaded into memory
+                    order_data = self.storage.read_order(self._loaded_filename, order_number)
+                    if order_data is None:
+                        raise ValueError(f"Order #{order_number} not found")
+                    order = Order.from_dict(order_data)
+                    self._page_in(order)
+        return order
+
+    def get_orders_by_ticker(self, ticker_id: int) -> List[Order]:
+        """Returns all orders for a ticker, in order number order"""
+        self._ensure_loaded()
+        with self._lock:
+            return list(self._orders_by_ticker.get(ticker_id, {}).values())
+
+    def get_orders_by_exchange(self, exchange_id: int) -> List[Order]:
+        """Returns all orders placed on an exchange, in order number order"""
+        self._ensure_loaded()
+        with self._lock:
+            return list(self._orders_by_exchange.get(exchange_id, {}).values())
+
+    def get_orders_by_status(self, status: OrderStatus) -> List[Order]:
+        """Returns all orders with the given status, in order number order"""
+        self._ensure_loaded()
+        with self._lock:
+            orders = list(self._orders_by_status[status].values())
+        return sorted(orders, key=lambda order: order.order_number)
+
+    def append_orders(self, filename: str = "orders.json") -> int:
+        """
+        Writes the orders added or filled since the file was last saved, appended to or loaded, and nothing else
 
-        if os.path.exists(file_path):
-            with open(file_path, 'r') as file:
-                existing_orders = json.load(file)
+        Args:
+        filename: The saved orders to add to, written in full if it doesn't exist yet
 
-        orders_data = []
-        for order in self.orders:
-            order_data = {
-                "order_number": self.orders.index(order) + 1,
-                "ticker_id": order.ticker_id,
-                "exchange_id": order.exchange_id,
-                "original_quantity": order.quantity,
-                "order_price": order.order_price,
-                "created_at": str(order.created_at),
-                "status": order.status.value,
-                "needs_fills": order.needs_fills,
-                "filled_quantity": order.filled_quantity,
-                "remaining_quantity": order.remaining_quantity,
-                "average_fill_price": order.average_fill_price,
-                "transaction_fee": order.transaction_fee,
-                "fills": [
-                    {
-                        "fill_price": fill.fill_price,
-                        "fill_quantity": fill.fill_quantity,
-                        "filled_at": str(fill.filled_at)
-                    }
-                    for fill in order.fills
-                ]
-            }
-            orders_data.append(order_data)
-
-        existing_orders.extend(orders_data)
-
-        with open(file_path, 'w') as file:
-            json.dump(existing_orders, file, indent=4)
-            logger.info(f"Orders appended to {file_path}")
+        Returns:
+        int: The number of orders written
+        """
+        self._ensure_loaded()
+        with self._exclusive():
+            revision, changed = self._changed_orders_since(self._written_revisions.get(filename, 0))
+            orders_data = [order.to_dict() for order in changed]
+        self.storage.append_orders(orders_data, filename)
+        self._written_revisions[filename] = revision
+        log_event(logger, logging.INFO, "orders_appended", filename=filename, orders=len(orders_data))
+        return len(orders_data)
 
     def fill_order(self, order_number: int, fill_price: float, fill_quantity: float) -> None:
         """Adds a fill to an existing order"""
+        self._ensure_loaded()
         order = self.get_order(order_number)
-        if not order.needs_fills:
-            logger.warning(f"Order #{order_number} is already filled, ignoring fill request")
-            return
-        order.add_fill(fill_price, fill_quantity)
+        with self._fill_lock(order_number):
+            if not order.needs_fills:
+                logger.warning("Order #%s is already filled, ignoring fill request", order_number)
+                return
+            fill = order.add_fill(fill_price, fill_quantity)
+            self._write_journal([self._fill_added_event(order, fill)])
+        self._log_fill_added(order_number=order_number)
+        self._maybe_compact()
+        self._maybe_archive(1)
+
+    def add_fill_listener(self, listener: Callable[[Order, OrderFill], Any], replay: bool = True) -> None:
+        """
+        Calls listener(order, fill) with every fill added from now on, e.g. to keep positions up to date
+
+        Args:
+        listener: Called right after the fill is applied, while the order's fill lock is held
+        replay: First call it with every fill the manager already holds, in memory, in storage or archived,
+        oldest first, so it starts from the same history as the orders
+        """
+        self._ensure_loaded()
+        with self._exclusive():
+            if replay:
+                fills = [(fill.filled_at, order.order_number, index, order, fill)
+                         for order in self._all_orders() for index, fill in enumerate(order.fills)]
+                fills.sort(key=lambda entry: entry[:3])
+                for _, _, _, order, fill in fills:
+                    listener(order, fill)
+                log_event(logger, logging.INFO, "fill_listener_replayed", fills=len(fills))
+            # Replaced rather than appended to, so _order_filled can read the list without taking a lock
+            self._fill_listeners = self._fill_listeners + [listener]
+
+    def remove_fill_listener(self, listener: Callable[[Order, OrderFill], Any]) -> None:
+        """Stops calling a listener added with add_fill_listener"""
+        with self._lock:
+            self._fill_listeners = [existing for existing in self._fill_listeners if existing != listener]
+
+    def add_order_listener(self, listener: Callable[[Order], Any]) -> None:
+        """Calls listener(order) with every order added from now on, while the manager's lock is held"""
+        self._ensure_loaded()
+        with self._lock:
+            self._order_listeners = self._order_listeners + [listener]
+
+    def remove_order_listener(self, listener: Callable[[Order], Any]) -> None:
+        """Stops calling a listener added with add_order_listener"""
+        with self._lock:
+            self._order_listeners = [existing for existing in self._order_listeners if existing != listener]
+
+    def _all_orders(self) -> Iterator[Order]:
+        """Yields every order ever added, reading the ones that aren't in memory from storage and the archive"""
+        yield from self.orders
+        if self.archive is not None:
+            for order_data in self.archive.records():
+                yield Order.from_dict(order_data)
+        # Lazy storages keep filled orders on disk. When some orders aren't in memory or archived, the saved orders
+        # are streamed once and the ones held elsewhere skipped, rather than read one by one like get_order does.
+        if any(order_number not in self._orders_by_number and not self._is_archived(order_number)
+               for order_number in range(self.order_number_start, self.next_order_number, self.order_number_step)):
+            for order_data in self.storage.iter_orders(self._loaded_filename):
+                order_number = order_data["order_number"]
+                if order_number not in self._orders_by_number and not self._is_archived(order_number):
+                    yield Order.from_dict(order_data)
+
+    def changed_orders_since(self, revision: int) -> Tuple[int, List[Order]]:
+        """
+        Finds the orders added or filled after a revision, reading only the changes rather than every order
+
+        Args:
+        revision: A revision returned by an earlier call, or 0 for every order
+
+        Returns:
+        Tuple[int, List[Order]]: The current revision, and the changed orders from oldest change to newest
+        """
+        self._ensure_loaded()
+        return self._changed_orders_since(revision)
+
+    def _changed_orders_since(self, revision: int) -> Tuple[int, List[Order]]:
+        changed = []
+        with self._lock:
+            for order_number in reversed(self._order_revisions):
+                if self._order_revisions[order_number] <= revision:
+                    break
+                order = self._orders_by_number.get(order_number)
+                if order is not None:
+                    changed.append(order)
+            current_revision = self.revision
+        changed.reverse()
+        return current_revision, changed
 
     def get_open_orders(self) -> List[Order]:
         """Returns a list of orders that still need fills"""
-        return [order for order in self.orders if order.needs_fills]
+        self._ensure_loaded()
+        with self._lock:
+            open_orders = list(self._orders_by_status[OrderStatus.OPEN].values())
+            open_orders.extend(self._orders_by_status[OrderStatus.PARTIALLY_FILLED].values())
+        open_orders.sort(key=lambda order: order.order_number)
+        return open_orders
 
     def list_orders(self) -> None:
         """Prints all current orders"""
+        self._ensure_loaded()
         for order in self.orders:
-            order_number = self.orders.index(order) + 1
-            print(f"\nOrder #{order_number}:")
+            print(f"\nOrder #{order.order_number}:")
             print(f"  Ticker ID: {order.ticker_id}")
             print(f"  Exchange ID: {order.exchange_id}")
+            print(f"  Side: {order.side.value}")
             print(f"  Original Quantity: {order.quantity}")
             print(f"  Order Price: {order.order_price}")
             print(f"  Created At: {order.created_at}")
@@ -245,41 +913,94 @@ class OrderManager:
                 print(f"  Average Fill Price: {order.average_fill_price}")
 
     def save_orders(self, filename: str = "orders.json") -> None:
-        """Saves all orders to a JSON file in the data folder"""
-        file_path = os.path.join(self.data_folder, filename)
-        orders_data = []
+        """Saves all orders to storage, by default a JSON file in the data folder"""
+        self._ensure_loaded()
+        with self._exclusive():
+            orders_data = [order.to_dict() for order in self.orders]
+            revision = self.revision
+        self.storage.save_orders(orders_data, filename)
+        self._written_revisions[filename] = revision
+        logger.info("Orders saved to %s", filename)
+
+    def compact(self, filename: str = "orders.json") -> None:
+        """
+        Folds the journal into a new snapshot of all orders and empties the journal
 
-        for order in self.orders:
-            order_data = {
-                "order_number": self.orders.index(order) + 1,
-                "ticker_id": order.ticker_id,
-                "exchange_id": order.exchange_id,
-                "original_quantity": order.quantity,
-                "order_price": order.order_price,
-                "created_at": str(order.created_at),
-                "status": order.status.value,
-                "needs_fills": order.needs_fills,
-                "filled_quantity": order.filled_quantity,
-                "remaining_quantity": order.remaining_quantity,
-                "average_fill_price": order.average_fill_price,
-                "fills": [
-                    {
-                        "fill_price": fill.fill_price,
-                        "fill_quantity": fill.fill_quantity,
-                        "filled_at": str(fill.filled_at)
-                    }
-                    for fill in order.fills
-                ]
-            }
-            orders_data.append(order_data)
-
-        with open(file_path, 'w') as file:
-            json.dump(orders_data, file, indent=4)
-            logger.info(f"Orders saved to {file_path}")
+        Args:
+        filename: The snapshot file that load_orders reads before replaying the journal
+        """
+        # Nothing may change between taking the snapshot and emptying the journal
+        self._ensure_loaded()
+        with self._exclusive():
+            if self.journal is not None:
+                self.journal.sync()
+            self.storage.snapshot_orders([order.to_dict() for order in self.orders], filename)
+            self._written_revisions[filename] = self.revision
+            if self.journal is not None:
+                self.journal.truncate()
+        logger.info("Orders compacted to %s", filename)
+
+    def archive_orders(self, now: Optional[datetime] = None) -> int:
+        """
+        Moves filled orders out of memory into the archive, as the retention policy says
+
+        Args:
+        now: Time that fill ages are measured from, defaults to now
+
+        Returns:
+        int: The number of orders archived
+        """
+        if self.retention is None:
+            raise ValueError("archive_orders needs a retention policy")
+        self._ensure_loaded()
+        policy = self.retention
+
+        with self._exclusive():
+            # Only filled orders are considered, so the cost follows the filled orders still in memory
+            filled = list(self._orders_by_status[OrderStatus.FILLED].values())
+            filled.sort(key=lambda order: order.last_fill_at or order.created_at)
+            count = 0
+            if policy.max_filled_age_hours is not None:
+                cutoff = (now or datetime.now()) - timedelta(hours=policy.max_filled_age_hours)
+                while count < len(filled) and (filled[count].last_fill_at or filled[count].created_at) <= cutoff:
+                    count += 1
+            if policy.max_orders is not None:
+                count = max(count, min(len(self.orders) - policy.max_orders, len(filled)))
+            archived = filled[:count]
+            if not archived:
+                return 0
+
+            # Written before the orders leave memory, a crash in between only leaves them in both places
+            self.archive.add([order.to_dict() for order in archived])
+            self._remove_orders(archived)
+
+        log_event(logger, logging.INFO, "orders_archived", orders=len(archived), in_memory=len(self.orders),
+                  archived_total=len(self.archive))
+        return len(archived)
+
+    def _maybe_archive(self, fills: int) -> None:
+        """Runs the retention policy every check_every fills, called after the caller's locks are released"""
+        if self.retention is None or not self.retention.check_every:
+            return
+        with self._lock:
+            self._fills_since_archive += fills
+            due = self._fills_since_archive >= self.retention.check_every
+            if due:
+                self._fills_since_archive = 0
+        if due:
+            self.archive_orders()
+
+    def close(self) -> None:
+        """Flushes and closes the journal and storage"""
+        if self._loader is not None:
+            self._loader.join()
+        if self.journal is not None:
+            self.journal.close()
+        self.storage.close()
 
     def load_orders(self, filename: str = "orders.json") -> bool:
         """
-        Load orders from a JSON file in the data folder
+        Load orders from storage, by default a JSON file in the data folder
 
         Args:
         filename: The name of the JSON file containing saved orders
@@ -287,91 +1008,198 @@ class OrderManager:
         Returns:
         bool: True if orders were loaded, False otherwise
         """
-        file_path = os.path.join(self.data_folder, filename)
-
-        if not os.path.exists(file_path):
-            logger.info(f"No saved orders file found at {file_path}")
-            return False
+        has_journal = self.journal is not None and os.path.getsize(self.journal.file_path) > 0
+        start = time.perf_counter()
 
         try:
-            with open(file_path, 'r') as file:
-                orders_data = json.load(file)
-
-            logger.info(f"Loading {len(orders_data)} previously saved orders...")
+            orders_data = self.storage.load_orders(filename)
+            if orders_data is None and not has_journal:
+                return False
+            self._loaded_filename = filename
 
             # Find the highest order number in the saved orders
             highest_order_num = 0
+            loaded_count = 0
 
-            for order_data in orders_data:
-                details = OrderDetails(
-                    ticker_id=order_data["ticker_id"],
-                    order_quantity=order_data["original_quantity"],
-                    order_price=order_data["order_price"],
-                    exchange_id=order_data["exchange_id"],
-                    transaction_fee=order_data["transaction_fee"]
-                )
-
-                # Create a new order with the saved order number
-                new_order = Order(details)
+            # Orders are streamed from storage, so only one saved record is held at a time
+            for order_data in orders_data or []:
+                loaded_count += 1
 
-                # Add fills by directly adding to the fills list
-                for fill_data in order_data["fills"]:
-                    fill_price = fill_data["fill_price"]
-                    fill_quantity = fill_data["fill_quantity"]
-
-                    # Add fill directly to the list to bypass validation
-                    new_order.fills.append(OrderFill(fill_price, fill_quantity))
-
-                # Force status update
-                new_order._update_status()
+                # Orders already in memory keep their current state, archived ones stay in the archive
+                if order_data["order_number"] in self._orders_by_number or self._is_archived(order_data["order_number"]):
+                    continue
 
                 # Add the order to our manager
-                self.orders.append(new_order)
+                self._index_order(Order.from_dict(order_data))
 
                 # Keep track of the highest order number
                 highest_order_num = max(highest_order_num, order_data["order_number"])
 
+            # Storage and the archive may know of orders that weren't loaded
+            highest_order_num = max(highest_order_num, self.storage.last_order_number(filename))
+            if self.archive is not None:
+                highest_order_num = max(highest_order_num, self.archive.last_order_number)
+
             # Set the next order number
-            self.next_order_number = highest_order_num + 1
-            logger.info(f"Successfully loaded {len(orders_data)} orders.")
-            logger.info(f"Next order number will be {self.next_order_number}")
+            self.next_order_number = max(self.next_order_number, self._order_number_after(highest_order_num))
+
+            # The file holds what was just loaded, journal events replayed below are newer than it
+            if orders_data is not None:
+                self._written_revisions[filename] = self.revision
+
+            # Changes made since the snapshot are replayed from the journal
+            replayed = 0
+            if has_journal:
+                pending_fills = defaultdict(dict)
+                for event in self.journal.replay():
+                    self._apply_journal_event(event, pending_fills)
+                    replayed += 1
+                if pending_fills:
+                    logger.warning("Journal has fills for orders %s that could not be applied", sorted(pending_fills))
+
+            # One summary line for the whole load
+            log_event(logger, logging.INFO, "orders_loaded", filename=filename, orders=loaded_count,
+                      journal_events=replayed, next_order_number=self.next_order_number,
+                      elapsed_ms=round((time.perf_counter() - start) * 1000, 3))
             return True
 
         except Exception as e:
-            logger.error(f"Error loading orders: {e}")
+            logger.error("Error loading orders: %s", e)
             return False
 
-    def get_orders_as_dataframe(self, filename: str = "orders.json") -> pd.DataFrame:
+    def get_orders_as_dataframe(self, filename: str = "orders.json", ticker_id: Optional[int] = None,
+                                exchange_id: Optional[int] = None, status: Optional[OrderStatus] = None,
+                                include_archived: bool = False) -> "pd.DataFrame":
         """
         Args:
         filename: The name of the JSON file containing saved orders
+        ticker_id: Only include orders for this ticker
+        exchange_id: Only include orders placed on this exchange
+        status: Only include orders with this status
+        include_archived: Add the matching archived orders, read from their partitions
         
         Returns:
-        pd.DataFrame: pandas data frame of the orders by  reading from the JSON file
+        pd.DataFrame: pandas data frame of the saved orders, filtered by storage (in SQL for SQLite), with ticker
+        details added when the manager has reference data
         
         """
-        file_path = os.path.join(self.data_folder, filename)
-
-        if not os.path.exists(file_path):
-            logger.warning(f"No saved orders file found at {file_path}")
-            return pd.DataFrame()
+        import pandas as pd
 
         try:
-            with open(file_path, 'r') as file:
-                orders_data = json.load(file)
-
-            orders_df = pd.DataFrame(orders_data)
-            orders_df['created_at'] = pd.to_datetime(orders_df['created_at'])
-            for idx, row in orders_df.iterrows():
-                if row['fills']:
-                    orders_df.at[idx, 'fills'] = pd.DataFrame(row['fills'])
-
+            orders_df = self.storage.get_orders_as_dataframe(
+                filename, ticker_id=ticker_id, exchange_id=exchange_id,
+                status=status.value if status is not None else None
+            )
+            if include_archived and self.archive is not None:
+                archived_df = self.archive.get_orders_as_dataframe(
+                    ticker_id=ticker_id, exchange_id=exchange_id, status=status.value if status is not None else None
+                )
+                # The saved file can still hold orders archived since it was written
+                frames = [frame for frame in (orders_df, archived_df) if not frame.empty]
+                if frames:
+                    orders_df = pd.concat(frames, ignore_index=True).drop_duplicates("order_number", keep="last")
+                    orders_df = orders_df.sort_values("order_number", ignore_index=True)
+            # Ticker symbol, name, type and exchange name from the reference data
+            if self.reference_data is not None:
+                self.reference_data.enrich(orders_df)
             return orders_df
 
         except Exception as e:
-            logger.error(f"Error converting orders to DataFrame: {e}")
+            logger.error("Error converting orders to DataFrame: %s", e)
             return pd.DataFrame()
 
+    def get_order_frames(self, orders: Optional[Sequence[Order]] = None,
+                         include_archived: bool = False) -> Tuple["pd.DataFrame", "pd.DataFrame"]:
+        """
+        Builds data frames of the orders in memory, without reading the orders file
+
+        Args:
+        orders: Only build rows for these orders, e.g. from changed_orders_since, defaults to every order
+        include_archived: With the default orders, add rows for archived orders read from their partitions
+
+        Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: One row per order, and one row per fill keyed by order_number
+        """
+        # Only the row tuples are built under the locks
+        self._ensure_loaded()
+        archived = []
+        if orders is None and include_archived and self.archive is not None:
+            archived = [Order.from_dict(order_data) for order_data in self.archive.records()]
+        with self._exclusive():
+            if orders is None:
+                # Archived rows go at their place in order number order, as in get_orders_as_dataframe
+                orders = self.orders
+                if archived:
+                    orders = sorted(orders + archived, key=lambda order: order.order_number)
+            order_rows = [
+                (
+                    order.order_number, order.ticker_id, order.exchange_id, order.quantity, order.order_price,
+                    order.created_at, order.status.value, order.needs_fills, order.filled_quantity,
+                    order.remaining_quantity, order.average_fill_price, order.transaction_fee, order.fill_count,
+                    order.side.value
+                )
+                for order in orders
+            ]
+            fill_rows = [
+                (order.order_number, fill.fill_price, fill.fill_quantity, fill.filled_at)
+                for order in orders
+                for fill in order.fills
+            ]
+
+        import pandas as pd
+
+        orders_df = pd.DataFrame.from_records(order_rows, columns=ORDER_FRAME_COLUMNS)
+        orders_df = orders_df.astype({
+            "order_number": "int64", "ticker_id": "int64", "exchange_id": "int64", "original_quantity": "float64",
+            "order_price": "float64", "needs_fills": "bool", "filled_quantity": "float64",
+            "remaining_quantity": "float64", "average_fill_price": "float64", "transaction_fee": "float64",
+            "fill_count": "int64"
+        })
+        orders_df["created_at"] = pd.to_datetime(orders_df["created_at"])
+        orders_df["status"] = pd.Categorical(orders_df["status"], categories=[status.value for status in OrderStatus])
+        orders_df["side"] = pd.Categorical(orders_df["side"], categories=[side.value for side in OrderSide])
+
+        fills_df = pd.DataFrame.from_records(fill_rows, columns=FILL_FRAME_COLUMNS)
+        fills_df = fills_df.astype({"order_number": "int64", "fill_price": "float64", "fill_quantity": "float64"})
+        fills_df["filled_at"] = pd.to_datetime(fills_df["filled_at"])
+        return orders_df, fills_df
+
+    def export_orders(self, file_format: str = "parquet", folder: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Writes the orders and fills frames to disk for analytics, needs pyarrow
+
+        Args:
+        file_format: "parquet" or "arrow" (Arrow IPC / Feather)
+        folder: Where to write orders.<ext> and fills.<ext>, defaults to the data folder
+
+        Returns:
+        Tuple[str, str]: Paths of the orders file and the fills file
+        """
+        extensions = {"parquet": "parquet", "arrow": "arrow"}
+        if file_format not in extensions:
+            raise ValueError(f"Unsupported export format: {file_format}")
+        try:
+            import pyarrow # noqa: F401 - only needed for the writers below
+        except ImportError as e:
+            raise ImportError("Exporting orders needs pyarrow, install it with: pip install pyarrow") from e
+
+        folder = folder if folder is not None else self.data_folder
+        pathlib.Path(folder).mkdir(parents=True, exist_ok=True)
+        # status is categorical so it is written as a dictionary column, Parquet also dictionary encodes the ids
+        orders_df, fills_df = self.get_order_frames()
+
+        paths = []
+        for name, frame in (("orders", orders_df), ("fills", fills_df)):
+            path = os.path.join(folder, f"{name}.{extensions[file_format]}")
+            if file_format == "parquet":
+                frame.to_parquet(path, index=False)
+            else:
+                frame.to_feather(path)
+            paths.append(path)
+
+        logger.info("Orders exported to %s and %s", paths[0], paths[1])
+        return paths[0], paths[1]
+
 def run_order_manager(orders_to_process: List[OrderDetails]) -> OrderManager:
     """
     Wrapper function to run the order manager with a list of orders
@@ -383,7 +1211,6 @@ def run_order_manager(orders_to_process: List[OrderDetails]) -> OrderManager:
     OrderManager: The manager instance with processed orders
     """
     manager = OrderManager()
-
     for order_details in orders_to_process:
         manager.add_order(order_details)
 
@@ -0,0 +1,572 @@
+# order_storage.py
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import json
+import logging
+import os
+
+# pandas (and sqlite3) are imported where they are used, so processes that only place and fill orders start quickly
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Orders are handed to and from storage as the dictionaries written by Order.to_dict
+OrderRecord = Dict[str, Any]
+
+
+class OrderStorage(ABC):
+    """Where an OrderManager keeps its saved orders"""
+
+    @abstractmethod
+    def save_orders(self, orders_data: List[OrderRecord], filename: str) -> None:
+        """Saves the given orders, replacing any saved copy of them"""
+
+    def snapshot_orders(self, orders_data: List[OrderRecord], filename: str) -> None:
+        """Saves the given orders as the snapshot the journal is replayed on, by default the same as save_orders"""
+        self.save_orders(orders_data, filename)
+
+    @abstractmethod
+    def append_orders(self, orders_data: List[OrderRecord], filename: str) -> None:
+        """Adds the given orders to the saved orders, replacing any saved copy of them, in time proportional to the
+        number of orders given"""
+
+    def compact_appended(self, filename: str) -> None:
+        """Rewrites the saved orders without copies replaced by later appends, by default there are none"""
+
+    @abstractmethod
+    def load_orders(self, filename: str) -> Optional[Iterable[OrderRecord]]:
+        """
+        Args:
+        filename: The saved orders to read
+
+        Returns:
+        Iterable[OrderRecord]: The orders the manager should keep in memory, None if nothing has been saved
+        """
+
+    def read_order(self, filename: str, order_number: int) -> Optional[OrderRecord]:
+        """Reads a saved order that load_orders didn't return, None if there is no such order"""
+        return None
+
+    def iter_orders(self, filename: str) -> Iterator[OrderRecord]:
+        """Streams every saved order once, including the ones load_orders didn't return, by default what it returns"""
+        yield from self.load_orders(filename) or ()
+
+    def last_order_number(self, filename: str) -> int:
+        """Returns the highest saved order number, including orders load_orders didn't return"""
+        return 0
+
+    @abstractmethod
+    def get_orders_as_dataframe(self, filename: str, ticker_id: Optional[int] = None,
+                                exchange_id: Optional[int] = None, status: Optional[str] = None) -> "pd.DataFrame":
+        """Returns the saved orders as a data frame, optionally filtered by ticker, exchange and status value"""
+
+    def close(self) -> None:
+        """Releases any open files or connections"""
+
+
+def _iter_json_array(file, chunk_size: int = 1 << 16) -> Iterator[OrderRecord]:
+    """Parses the elements of a JSON array one at a time, holding at most one chunk plus one element in memory"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    pos = 0
+    started = False
+    eof = False
+    read_size = chunk_size
+
+    while True:
+        # Skip whitespace and the commas between elements
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+            pos += 1
+
+        if pos < len(buffer):
+            if not started:
+                if buffer[pos] != '[':
+                    raise ValueError("Expected a JSON array of orders")
+                started = True
+                pos += 1
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                record, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # The element continues in the next chunk, read more each time so large orders aren't reparsed often
+                if eof:
+                    raise
+                read_size *= 2
+            else:
+                yield record
+                read_size = chunk_size
+                continue
+        elif eof:
+            raise ValueError("Orders file ended before the closing bracket")
+
+        chunk = file.read(read_size)
+        eof = not chunk
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+
+def _iter_json_lines(file) -> Iterator[Tuple[int, OrderRecord]]:
+    """Parses a JSON Lines file opened in binary mode, yielding each record with its byte offset"""
+    offset = 0
+    for line in file:
+        if line.strip():
+            yield offset, json.loads(line)
+        offset += len(line)
+
+
+class JsonOrderStorage(OrderStorage):
+    """
+    Keeps all orders in one JSON file per filename in the data folder
+
+    Files are streamed one order at a time, so loading never holds the whole file in memory. Filenames ending in
+    .jsonl are written as JSON Lines, one order per line, anything else as a JSON array.
+
+    In lazy mode load_orders only returns orders that still need fills. Filled orders stay on disk and read_order
+    pages them in when asked for, by byte offset for .jsonl files and by scanning the file for .json files.
+    Saving in lazy mode merges the orders in memory into the saved file rather than replacing it.
+
+    append_orders adds the new state of each given order at the end of the file (as lines for .jsonl files, in place
+    of the closing bracket for .json arrays) and lists their order numbers in a <filename>.appended file. Readers
+    use that list to keep only the last copy of those orders. compact_appended, or any full save, folds the
+    appended copies back in and removes the list.
+    """
+
+    def __init__(self, data_folder: str, indent: Optional[int] = 4, lazy: bool = False):
+        self.data_folder = data_folder
+        self.indent = indent
+        self.lazy = lazy
+        self._last_order_numbers: Dict[str, int] = {} # Highest order number seen per file
+        self._offsets: Dict[str, Dict[int, int]] = {} # Byte offset of each order in .jsonl files, lazy mode only
+
+    def _file_path(self, filename: str) -> str:
+        return os.path.join(self.data_folder, filename)
+
+    @staticmethod
+    def _is_json_lines(filename: str) -> bool:
+        return filename.endswith(".jsonl")
+
+    def _appended_path(self, filename: str) -> str:
+        return self._file_path(filename) + ".appended"
+
+    def _appended_numbers(self, filename: str) -> set:
+        """Order numbers that append_orders wrote a newer copy of since the file was last fully written"""
+        try:
+            with open(self._appended_path(filename), 'r') as file:
+                return {int(line) for line in file if line.strip()}
+        except FileNotFoundError:
+            return set()
+
+    def _iter_saved(self, filename: str) -> Iterator[Tuple[Optional[int], OrderRecord]]:
+        """
+        Streams the saved orders with their byte offsets (None for JSON arrays), one copy per order in file order
+
+        If orders were appended to, a first pass over the file collects the last copy of each of them, which the
+        second pass yields where the order first appears, so the orders stay in order number order.
+        """
+        appended = self._appended_numbers(filename)
+        if not appended:
+            yield from self._iter_records(filename)
+            return
+
+        latest: Dict[int, Tuple[Optional[int], OrderRecord]] = {}
+        for offset, order_data in self._iter_records(filename):
+            if order_data["order_number"] in appended:
+                latest[order_data["order_number"]] = (offset, order_data)
+        for offset, order_data in self._iter_records(filename):
+            order_number = order_data["order_number"]
+            if order_number not in appended:
+                yield offset, order_data
+            elif order_number in latest:
+                yield latest.pop(order_number)
+
+    def _iter_records(self, filename: str) -> Iterator[Tuple[Optional[int], OrderRecord]]:
+        """Streams every record in the file, including copies replaced by later appends"""
+        file_path = self._file_path(filename)
+        if self._is_json_lines(filename):
+            with open(file_path, 'rb') as file:
+                yield from _iter_json_lines(file)
+        else:
+            with open(file_path, 'r') as file:
+                for order_data in _iter_json_array(file):
+                    yield None, order_data
+
+    def _write(self, orders_data: Iterable[OrderRecord], filename: str, indent: Optional[int]) -> None:
+        """Writes to a temporary file and moves it over the saved file, so readers never see half a file"""
+        file_path = self._file_path(filename)
+        temp_path = file_path + ".tmp"
+        offsets = {}
+        last_order_number = 0
+
+        with open(temp_path, 'w') as file:
+            if self._is_json_lines(filename):
+                offset = 0
+                for order_data in orders_data:
+                    line = json.dumps(order_data, separators=(',', ':')) + '\n'
+                    file.write(line)
+                    offsets[order_data["order_number"]] = offset
+                    offset += len(line.encode())
+                    last_order_number = max(last_order_number, order_data["order_number"])
+            else:
+                # Same layout as json.dump of the whole list, written one order at a time
+                count = 0
+                file.write('[')
+                for order_data in orders_data:
+                    separator = ',' if count else ''
+                    if indent is not None:
+                        separator += '\n'
+                    file.write(separator + self._format(order_data, filename, indent))
+                    count += 1
+                    last_order_number = max(last_order_number, order_data["order_number"])
+                file.write('\n]' if count and indent is not None else ']')
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, file_path)
+
+        # The new file holds one copy of each order, so nothing is left to dedupe
+        if os.path.exists(self._appended_path(filename)):
+            os.remove(self._appended_path(filename))
+        self._last_order_numbers[filename] = last_order_number
+        if self.lazy and self._is_json_lines(filename):
+            self._offsets[filename] = offsets
+
+    def _merge_with_saved(self, orders_data: List[OrderRecord], filename: str) -> Iterator[OrderRecord]:
+        """Streams the saved orders with the given ones swapped in, new orders go at the end"""
+        updated = {order_data["order_number"]: order_data for order_data in orders_data}
+        for _, saved_data in self._iter_saved(filename):
+            yield updated.pop(saved_data["order_number"], saved_data)
+        yield from updated.values()
+
+    def _format(self, order_data: OrderRecord, filename: str, indent: Optional[int]) -> str:
+        """Formats one order the way _write lays it out"""
+        if self._is_json_lines(filename) or indent is None:
+            return json.dumps(order_data, separators=(',', ':'))
+        prefix = ' ' * indent
+        return prefix + json.dumps(order_data, indent=indent).replace('\n', '\n' + prefix)
+
+    def _save(self, orders_data: List[OrderRecord], filename: str, indent: Optional[int]) -> None:
+        if self.lazy and os.path.exists(self._file_path(filename)):
+            # Filled orders that were never paged in only exist on disk, so keep them
+            self._write(self._merge_with_saved(orders_data, filename), filename, indent)
+        else:
+            self._write(orders_data, filename, indent)
+
+    def save_orders(self, orders_data: List[OrderRecord], filename: str) -> None:
+        self._save(orders_data, filename, self.indent)
+
+    def snapshot_orders(self, orders_data: List[OrderRecord], filename: str) -> None:
+        # Snapshots are only read back by the manager, so skip the pretty printing
+        self._save(orders_data, filename, None)
+
+    def append_orders(self, orders_data: List[OrderRecord], filename: str) -> None:
+        file_path = self._file_path(filename)
+        if not os.path.exists(file_path):
+            self._write(orders_data, filename, self.indent)
+            return
+        if not orders_data:
+            return
+
+        # The list goes first, so a crash between the two writes only leaves an order listed with a single copy
+        with open(self._appended_path(filename), 'a') as file:
+            file.writelines(f"{order_data['order_number']}\n" for order_data in orders_data)
+            file.flush()
+            os.fsync(file.fileno())
+
+        texts = [self._format(order_data, filename, self.indent) for order_data in orders_data]
+        with open(file_path, 'rb+') as file:
+            if self._is_json_lines(filename):
+                start = file.seek(0, os.SEEK_END)
+                lines = [(text + '\n').encode() for text in texts]
+                file.write(b''.join(lines))
+            else:
+                start = None
+                lines = []
+                file.write(self._array_tail(file, texts))
+                file.truncate()
+            file.flush()
+            os.fsync(file.fileno())
+
+        self._last_order_numbers[filename] = max(
+            self._last_order_numbers.get(filename, 0), max(order_data["order_number"] for order_data in orders_data)
+        )
+        if self.lazy and start is not None and filename in self._offsets:
+            offsets = self._offsets[filename]
+            for order_data, line in zip(orders_data, lines):
+                if order_data["needs_fills"]:
+                    offsets.pop(order_data["order_number"], None)
+                else:
+                    offsets[order_data["order_number"]] = start
+                start += len(line)
+
+    def _array_tail(self, file, texts: List[str]) -> bytes:
+        """Seeks to just past the last element of a saved JSON array and returns the bytes that add texts to it"""
+        end = file.seek(0, os.SEEK_END)
+        tail_start = max(end - 4096, 0)
+        file.seek(tail_start)
+        tail = file.read().rstrip()
+        if not tail.endswith(b']'):
+            raise ValueError(f"{file.name} doesn't end with a closing bracket, can't append to it")
+
+        body = tail[:-1].rstrip()
+        empty = body.endswith(b'[')
+        file.seek(tail_start + len(body))
+        if self.indent is None:
+            return (('' if empty else ',') + ','.join(texts) + ']').encode()
+        return (('\n' if empty else ',\n') + ',\n'.join(texts) + '\n]').encode()
+
+    def compact_appended(self, filename: str) -> None:
+        if os.path.exists(self._appended_path(filename)):
+            self._write((order_data for _, order_data in self._iter_saved(filename)), filename, self.indent)
+
+    def load_orders(self, filename: str) -> Optional[Iterable[OrderRecord]]:
+        file_path = self._file_path(filename)
+
+        if not os.path.exists(file_path):
+            logger.info("No saved orders file found at %s", file_path)
+            return None
+        return self._stream_orders(filename)
+
+    def _stream_orders(self, filename: str) -> Iterator[OrderRecord]:
+        """Yields saved orders as they are parsed, in lazy mode only the ones that still need fills"""
+        offsets = {}
+        last_order_number = 0
+        for offset, order_data in self._iter_saved(filename):
+            order_number = order_data["order_number"]
+            last_order_number = max(last_order_number, order_number)
+            if self.lazy and not order_data["needs_fills"]:
+                if offset is not None:
+                    offsets[order_number] = offset
+                continue
+            yield order_data
+
+        self._last_order_numbers[filename] = last_order_number
+        if self.lazy:
+            self._offsets[filename] = offsets
+
+    def read_order(self, filename: str, order_number: int) -> Optional[OrderRecord]:
+        if not self.lazy or not os.path.exists(self._file_path(filename)):
+            return None
+
+        offset = self._offsets.get(filename, {}).get(order_number)
+        if offset is not None:
+            with open(self._file_path(filename), 'rb') as file:
+                file.seek(offset)
+                return json.loads(file.readline())
+
+        if self._is_json_lines(filename):
+            return None
+        for _, order_data in self._iter_saved(filename):
+            if order_data["order_number"] == order_number:
+                return order_data
+        return None
+
+    def iter_orders(self, filename: str) -> Iterator[OrderRecord]:
+        if not os.path.exists(self._file_path(filename)):
+            return
+        for _, order_data in self._iter_saved(filename):
+            yield order_data
+
+    def last_order_number(self, filename: str) -> int:
+        return self._last_order_numbers.get(filename, 0)
+
+    def get_orders_as_dataframe(self, filename: str, ticker_id: Optional[int] = None,
+                                exchange_id: Optional[int] = None, status: Optional[str] = None) -> "pd.DataFrame":
+        import pandas as pd
+
+        file_path = self._file_path(filename)
+
+        if not os.path.exists(file_path):
+            logger.warning("No saved orders file found at %s", file_path)
+            return pd.DataFrame()
+
+        # Filters are applied while streaming so skipped orders are never held in memory
+        orders_data = [
+            order_data for _, order_data in self._iter_saved(filename)
+            if (ticker_id is None or order_data["ticker_id"] == ticker_id)
+            and (exchange_id is None or order_data["exchange_id"] == exchange_id)
+            and (status is None or order_data["status"] == status)
+        ]
+
+        orders_df = pd.DataFrame(orders_data)
+        if orders_df.empty:
+            return orders_df
+
+        orders_df['created_at'] = pd.to_datetime(orders_df['created_at'])
+        orders_df['fills'] = [pd.DataFrame(fills) if fills else fills for fills in orders_df['fills']]
+
+        return orders_df
+
+
+class SQLiteOrderStorage(OrderStorage):
+    """
+    Keeps orders in a SQLite database with one row per order and per fill
+
+    Saving upserts the given orders in a single transaction, so the manager only needs the orders it is working on
+    in memory. load_orders returns the orders that still need fills, filled orders are read on demand.
+    The filename arguments are ignored, everything lives in the one database file.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS orders (
+            order_number INTEGER PRIMARY KEY,
+            ticker_id INTEGER NOT NULL,
+            exchange_id INTEGER NOT NULL,
+            side TEXT NOT NULL DEFAULT 'buy',
+            original_quantity REAL NOT NULL,
+            order_price REAL NOT NULL,
+            transaction_fee REAL NOT NULL,
+            created_at TEXT NOT NULL,
+            status TEXT NOT NULL,
+            filled_quantity REAL NOT NULL,
+            average_fill_price REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS fills (
+            order_number INTEGER NOT NULL REFERENCES orders(order_number),
+            fill_index INTEGER NOT NULL,
+            fill_price REAL NOT NULL,
+            fill_quantity REAL NOT NULL,
+            filled_at TEXT NOT NULL,
+            PRIMARY KEY (order_number, fill_index)
+        );
+        CREATE INDEX IF NOT EXISTS orders_ticker_id ON orders(ticker_id);
+        CREATE INDEX IF NOT EXISTS orders_exchange_id ON orders(exchange_id);
+        CREATE INDEX IF NOT EXISTS orders_status ON orders(status);
+        CREATE INDEX IF NOT EXISTS orders_created_at ON orders(created_at);
+    """
+
+    ORDER_COLUMNS = (
+        "order_number, ticker_id, exchange_id, side, original_quantity, order_price, created_at, status, "
+        "status != 'Filled' AS needs_fills, filled_quantity, original_quantity - filled_quantity AS remaining_quantity, "
+        "average_fill_price, transaction_fee"
+    )
+
+    def __init__(self, data_folder: str, db_filename: str = "orders.db"):
+        self.db_path = os.path.join(data_folder, db_filename)
+        import sqlite3
+
+        self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(self.SCHEMA)
+
+        # Databases created before orders had a side get the column, existing orders are buys
+        order_columns = {row["name"] for row in self.connection.execute("PRAGMA table_info(orders)")}
+        if "side" not in order_columns:
+            with self.connection:
+                self.connection.execute("ALTER TABLE orders ADD COLUMN side TEXT NOT NULL DEFAULT 'buy'")
+
+    def save_orders(self, orders_data: List[OrderRecord], filename: str) -> None:
+        order_rows = [
+            (
+                order_data["order_number"], order_data["ticker_id"], order_data["exchange_id"],
+                order_data.get("side", "buy"), order_data["original_quantity"], order_data["order_price"], order_data["transaction_fee"],
+                order_data["created_at"], order_data["status"], order_data["filled_quantity"],
+                order_data["average_fill_price"]
+            )
+            for order_data in orders_data
+        ]
+        # Fills never change once added, so only new fill indexes are written
+        fill_rows = [
+            (order_data["order_number"], fill_index, fill["fill_price"], fill["fill_quantity"], fill["filled_at"])
+            for order_data in orders_data
+            for fill_index, fill in enumerate(order_data["fills"])
+        ]
+
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO orders (order_number, ticker_id, exchange_id, side, original_quantity, "
+                "order_price, transaction_fee, created_at, status, filled_quantity, average_fill_price) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                order_rows
+            )
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO fills (order_number, fill_index, fill_price, fill_quantity, filled_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                fill_rows
+            )
+
+    def append_orders(self, orders_data: List[OrderRecord], filename: str) -> None:
+        # Rows are keyed by order number, so appending and saving are the same upsert
+        self.save_orders(orders_data, filename)
+
+    def _records(self, where: str, params: tuple) -> List[OrderRecord]:
+        """Reads the orders matching a WHERE clause together with their fills"""
+        orders = [dict(row) for row in self.connection.execute(
+            f"SELECT {self.ORDER_COLUMNS} FROM orders WHERE {where} ORDER BY order_number", params
+        )]
+        fills_by_order = defaultdict(list)
+        for row in self.connection.execute(
+            "SELECT order_number, fill_price, fill_quantity, filled_at FROM fills "
+            f"WHERE order_number IN (SELECT order_number FROM orders WHERE {where}) "
+            "ORDER BY order_number, fill_index", params
+        ):
+            fills_by_order[row["order_number"]].append(
+                {"fill_price": row["fill_price"], "fill_quantity": row["fill_quantity"], "filled_at": row["filled_at"]}
+            )
+
+        for order_data in orders:
+            order_data["needs_fills"] = bool(order_data["needs_fills"])
+            order_data["fills"] = fills_by_order.get(order_data["order_number"], [])
+        return orders
+
+    def load_orders(self, filename: str) -> Optional[Iterable[OrderRecord]]:
+        if self.last_order_number(filename) == 0:
+            logger.info("No saved orders found in %s", self.db_path)
+            return None
+        return self._records("status != 'Filled'", ())
+
+    def read_order(self, filename: str, order_number: int) -> Optional[OrderRecord]:
+        records = self._records("order_number = ?", (order_number,))
+        return records[0] if records else None
+
+    def iter_orders(self, filename: str, chunk_size: int = 10000) -> Iterator[OrderRecord]:
+        # Read a range of order numbers per query, so memory holds one chunk rather than the whole table
+        last_order_number = self.last_order_number(filename)
+        for first in range(1, last_order_number + 1, chunk_size):
+            yield from self._records("order_number BETWEEN ? AND ?", (first, first + chunk_size - 1))
+
+    def last_order_number(self, filename: str) -> int:
+        row = self.connection.execute("SELECT MAX(order_number) FROM orders").fetchone()
+        return row[0] or 0
+
+    def get_orders_as_dataframe(self, filename: str, ticker_id: Optional[int] = None,
+                                exchange_id: Optional[int] = None, status: Optional[str] = None) -> "pd.DataFrame":
+        import pandas as pd
+
+        conditions = []
+        params = []
+        for column, value in (("ticker_id", ticker_id), ("exchange_id", exchange_id), ("status", status)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        where = " AND ".join(conditions) or "1"
+
+        orders_df = pd.read_sql_query(
+            f"SELECT {self.ORDER_COLUMNS} FROM orders WHERE {where} ORDER BY order_number",
+            self.connection, params=params
+        )
+        if orders_df.empty:
+            return orders_df
+
+        fills_df = pd.read_sql_query(
+            "SELECT order_number, fill_price, fill_quantity, filled_at FROM fills "
+            f"WHERE order_number IN (SELECT order_number FROM orders WHERE {where}) "
+            "ORDER BY order_number, fill_index",
+            self.connection, params=params
+        )
+        fills_by_order = {
+            order_number: group.drop(columns="order_number").reset_index(drop=True)
+            for order_number, group in fills_df.groupby("order_number")
+        }
+
+        orders_df['needs_fills'] = orders_df['needs_fills'].astype(bool)
+        orders_df['created_at'] = pd.to_datetime(orders_df['created_at'])
+        orders_df['fills'] = [fills_by_order.get(order_number, []) for order_number in orders_df['order_number']]
+        return orders_df
+
+    def close(self) -> None:
+        self.connection.close()
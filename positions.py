@@ -0,0 +1,230 @@
+# positions.py
+import heapq
+import logging
+import threading
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple
+
+from order_manager import Order, OrderFill, OrderSide
+
+if TYPE_CHECKING:
+    from order_manager import OrderManager
+
+logger = logging.getLogger(__name__)
+
+LOT_METHODS = ("fifo", "lifo", "hifo") # Which open lot a closing fill relieves first
+
+
+class Lot(NamedTuple):
+    """An open tax lot, quantity is negative for short lots"""
+    quantity: float
+    price: float
+    opened_at: Optional[datetime]
+
+
+class PositionSummary(NamedTuple):
+    """A position at the time it was asked for"""
+    ticker_id: int
+    exchange_id: int
+    quantity: float # Net quantity, negative when short
+    average_cost: float # Cost basis per unit of the open lots
+    cost_basis: float # Total price paid for long lots, or received for short lots, still open
+    realized_pnl: float # Gains on closed lots, before fees
+    fees: float # Transaction fees of every order that filled into the position
+    fill_count: int
+    lot_count: int
+
+    @property # Getter
+    def net_realized_pnl(self) -> float:
+        """Returns the realized P&L after fees"""
+        return self.realized_pnl - self.fees
+
+
+class Position:
+    """
+    Net quantity, cost and P&L for one (ticker_id, exchange_id), updated fill by fill
+
+    Open lots sit in a heap ordered by the book's lot method, so a fill that closes lots pops them in O(log n) each
+    and the totals below are kept running rather than summed over the lots.
+    """
+
+    __slots__ = ("ticker_id", "exchange_id", "quantity", "cost_basis", "realized_pnl", "fees", "fill_count",
+                 "_method", "_lots", "_sequence")
+
+    def __init__(self, ticker_id: int, exchange_id: int, method: str):
+        self.ticker_id = ticker_id
+        self.exchange_id = exchange_id
+        self.quantity = 0.0
+        self.cost_basis = 0.0
+        self.realized_pnl = 0.0
+        self.fees = 0.0
+        self.fill_count = 0
+        self._method = method
+        # Heap entries are [key, sequence, price, remaining quantity, opened_at], lists so partial relief is in place
+        self._lots: List[list] = []
+        self._sequence = 0
+
+    @property # Getter
+    def average_cost(self) -> float:
+        """Returns the cost basis per unit of the open lots"""
+        if not self.quantity:
+            return 0.0
+        return self.cost_basis / abs(self.quantity)
+
+    def _lot_key(self, price: float) -> float:
+        if self._method == "fifo":
+            return self._sequence
+        if self._method == "lifo":
+            return -self._sequence
+        return -price # hifo, the sequence breaks ties between lots at one price
+
+    def _open_lot(self, price: float, quantity: float, opened_at: Optional[datetime]) -> None:
+        self._sequence += 1
+        heapq.heappush(self._lots, [self._lot_key(price), self._sequence, price, quantity, opened_at])
+        self.cost_basis += price * quantity
+
+    def apply(self, side: OrderSide, price: float, quantity: float, filled_at: Optional[datetime] = None) -> float:
+        """
+        Applies one fill, closing open lots on the other side before opening a new one
+
+        Args:
+        side: Side of the order that filled
+        price: Fill price
+        quantity: Fill quantity, positive
+        filled_at: When the fill happened, kept on the lot it opens
+
+        Returns:
+        float: The P&L this fill realized
+        """
+        self.fill_count += 1
+        buying = side is OrderSide.BUY
+        realized = 0.0
+        remaining = quantity
+
+        # A buy closes short lots and a sell closes long lots
+        if self.quantity and (self.quantity < 0) == buying:
+            lots = self._lots
+            while remaining > 0 and lots:
+                lot = lots[0]
+                relieved = min(lot[3], remaining)
+                realized += (lot[2] - price) * relieved if buying else (price - lot[2]) * relieved
+                self.cost_basis -= lot[2] * relieved
+                remaining -= relieved
+                if relieved == lot[3]:
+                    heapq.heappop(lots)
+                else:
+                    lot[3] -= relieved
+            closed = quantity - remaining
+            self.quantity += closed if buying else -closed
+            if not lots:
+                self.cost_basis = 0.0 # Drops the rounding left over from subtracting lot by lot
+
+        # Whatever wasn't closing opens a lot, flipping the position when it closed every lot first
+        if remaining > 0:
+            self._open_lot(price, remaining, filled_at)
+            self.quantity += remaining if buying else -remaining
+
+        self.realized_pnl += realized
+        return realized
+
+    def lots(self) -> List[Lot]:
+        """Returns the open lots in the order they would be relieved"""
+        sign = -1 if self.quantity < 0 else 1
+        return [Lot(sign * lot[3], lot[2], lot[4]) for lot in sorted(self._lots)]
+
+    def summary(self) -> PositionSummary:
+        return PositionSummary(self.ticker_id, self.exchange_id, self.quantity, self.average_cost, self.cost_basis,
+                               self.realized_pnl, self.fees, self.fill_count, len(self._lots))
+
+
+class PositionBook:
+    """
+    Positions per (ticker_id, exchange_id), kept up to date from an OrderManager's fills
+
+    Attaching replays every fill the manager already holds, oldest first, and then applies each new fill as it is
+    added, so queries read running totals and never go back over the fill history.
+    """
+
+    def __init__(self, method: str = "fifo"):
+        """
+        Args:
+        method: Which open lot a closing fill relieves first, "fifo" (oldest), "lifo" (newest) or "hifo"
+        (highest priced)
+        """
+        if method not in LOT_METHODS:
+            raise ValueError(f"method must be one of {LOT_METHODS}, got {method!r}")
+        self.method = method
+        self.manager: Optional["OrderManager"] = None
+        self.realized_pnl = 0.0
+        self.fees = 0.0
+        self._positions: Dict[Tuple[int, int], Position] = {}
+        # Fills on different orders arrive from several threads in thread safe mode
+        self._lock = threading.Lock()
+
+    @classmethod
+    def for_manager(cls, manager: "OrderManager", method: str = "fifo") -> "PositionBook":
+        """Creates a book and attaches it to manager"""
+        book = cls(method)
+        book.attach(manager)
+        return book
+
+    def attach(self, manager: "OrderManager") -> None:
+        """Builds positions from the fills manager already holds and follows its new fills"""
+        if self.manager is not None:
+            raise ValueError("PositionBook is already attached to an OrderManager")
+        manager.add_fill_listener(self.apply_fill)
+        self.manager = manager
+        logger.info("Position book (%s) attached with %s positions", self.method, len(self._positions))
+
+    def detach(self) -> None:
+        """Stops following the manager's fills, positions keep their last values"""
+        if self.manager is not None:
+            self.manager.remove_fill_listener(self.apply_fill)
+            self.manager = None
+
+    def apply_fill(self, order: Order, fill: OrderFill) -> float:
+        """Applies a fill on order, the order's transaction fee is charged with its first fill"""
+        fee = order.transaction_fee if order.fills and order.fills[0] is fill else 0.0
+        return self.apply(order.ticker_id, order.exchange_id, order.side, fill.fill_price, fill.fill_quantity,
+                          fee, fill.filled_at)
+
+    def apply(self, ticker_id: int, exchange_id: int, side: OrderSide, price: float, quantity: float,
+              fee: float = 0.0, filled_at: Optional[datetime] = None) -> float:
+        """
+        Applies a fill that didn't come through the manager, e.g. a position carried over from a broker
+
+        Returns:
+        float: The P&L the fill realized
+        """
+        key = (ticker_id, exchange_id)
+        with self._lock:
+            position = self._positions.get(key)
+            if position is None:
+                position = self._positions[key] = Position(ticker_id, exchange_id, self.method)
+            realized = position.apply(side, price, quantity, filled_at)
+            position.fees += fee
+            self.realized_pnl += realized
+            self.fees += fee
+        return realized
+
+    def get(self, ticker_id: int, exchange_id: int = 0) -> Optional[PositionSummary]:
+        """Returns the position in a ticker on an exchange, None if it never had a fill"""
+        position = self._positions.get((ticker_id, exchange_id))
+        if position is None:
+            return None
+        with self._lock:
+            return position.summary()
+
+    def positions(self, open_only: bool = False) -> List[PositionSummary]:
+        """Returns every position (or only those with a non zero quantity), by ticker and exchange"""
+        with self._lock:
+            return [position.summary() for key, position in sorted(self._positions.items())
+                    if not open_only or position.quantity]
+
+    def lots(self, ticker_id: int, exchange_id: int = 0) -> List[Lot]:
+        """Returns the open lots of a position in the order they would be relieved"""
+        position = self._positions.get((ticker_id, exchange_id))
+        if position is None:
+            return []
+        with self._lock:
+            return position.lots()
@@ -0,0 +1,390 @@
+# reconcile.py
+"""Compares a broker's order history with an OrderManager and applies the fills the manager missed"""
+import http.client
+import json
+import logging
+import math
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from order_logging import log_timing
+from order_manager import Order
+
+if TYPE_CHECKING:
+    from order_manager import OrderManager
+
+logger = logging.getLogger(__name__)
+
+# Broker statuses that get no more fills
+CLOSED_STATUSES = ("canceled", "expired", "rejected", "replaced", "done_for_day")
+QUANTITY_TOLERANCE = 1e-9 # Relative and absolute, so sums of partial fills such as 0.1 + 0.2 match the broker's 0.3
+_TICK = timedelta(microseconds=1)
+
+
+class BrokerError(OSError):
+    """The broker answered a request with an error, or couldn't be reached after retrying"""
+
+
+class RemoteOrder(NamedTuple):
+    """An order as the broker reports it"""
+    broker_id: str
+    client_order_id: str # Set from our order number when the order was sent, see Reconciler.client_order_id
+    symbol: str
+    side: str
+    quantity: float
+    filled_quantity: float
+    average_fill_price: Optional[float] # None until the order has a fill
+    status: str # The broker's status word, e.g. "filled" or "canceled"
+    submitted_at: datetime # Timezone aware
+
+
+def _timestamp(moment: datetime) -> str:
+    """Formats a time as RFC 3339 in UTC, naive times are taken as local time like Order.created_at"""
+    return moment.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _same_quantity(local: float, remote: float) -> bool:
+    return math.isclose(local, remote, rel_tol=QUANTITY_TOLERANCE, abs_tol=QUANTITY_TOLERANCE)
+
+
+def _parse_timestamp(text: str) -> datetime:
+    return datetime.fromisoformat(text.replace("Z", "+00:00"))
+
+
+class BrokerAdapter(ABC):
+    """Where a Reconciler reads the broker's orders from"""
+
+    @abstractmethod
+    def fetch_orders(self, start: datetime, end: datetime) -> Iterator[List[RemoteOrder]]:
+        """
+        Yields the orders submitted from start up to end a page at a time, oldest first, with one (possibly empty)
+        list per request. The Reconciler calls this for several windows at once from its worker threads.
+        """
+
+    def close(self) -> None:
+        """Releases any open connections"""
+
+
+class HttpBrokerAdapter(BrokerAdapter):
+    """
+    Reads orders from a REST API that pages them the way Alpaca's GET /v2/orders does
+
+    Each page is a JSON array of at most page_size orders submitted after the `after` timestamp and before `until`,
+    in submission order. Requests go over a pool of keep-alive connections, so the windows fetched in parallel reuse
+    their connections instead of paying for a new TCP (and TLS) handshake per page.
+    """
+
+    def __init__(self, base_url: str, headers: Optional[Dict[str, str]] = None, path: str = "/v2/orders",
+                 page_size: int = 500, timeout: float = 30.0, retries: int = 3,
+                 params: Optional[Dict[str, str]] = None):
+        """
+        Args:
+        base_url: Scheme and host of the API, e.g. "https://paper-api.alpaca.markets"
+        headers: Sent with every request, e.g. the API keys
+        path: The orders endpoint
+        page_size: Orders asked for per request, Alpaca returns at most 500
+        timeout: Seconds to wait on a connection before retrying
+        retries: Times a failed request, a 429 or a 5xx answer is retried, with a growing pause in between
+        params: Extra query parameters, by default every status
+        """
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"base_url must start with http:// or https://, got {base_url!r}")
+        self._connection_class = (http.client.HTTPSConnection if parts.scheme == "https"
+                                  else http.client.HTTPConnection)
+        self._host = parts.netloc
+        self.path = parts.path.rstrip("/") + path
+        self.headers = {"Accept": "application/json", **(headers or {})}
+        self.page_size = page_size
+        self.timeout = timeout
+        self.retries = retries
+        self.params = {"status": "all", "direction": "asc", "nested": "false", **(params or {})}
+        self._idle: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._connections: List[http.client.HTTPConnection] = []
+        self._connections_lock = threading.Lock()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        """Takes an idle connection from the pool, or opens one when every connection is busy"""
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            connection = self._connection_class(self._host, timeout=self.timeout)
+            with self._connections_lock:
+                self._connections.append(connection)
+            return connection
+
+    def _get_json(self, params: Dict[str, Any]) -> Any:
+        url = f"{self.path}?{urlencode(params)}"
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(min(0.1 * 2 ** attempt, 5.0))
+            connection = self._connection()
+            try:
+                connection.request("GET", url, headers=self.headers)
+                response = connection.getresponse()
+                body = response.read()
+            except (OSError, http.client.HTTPException) as e:
+                # The server may have closed a kept-alive connection, the next request reconnects
+                connection.close()
+                self._idle.put(connection)
+                error = f"GET {url} failed: {e}"
+                logger.warning("%s (attempt %s of %s)", error, attempt + 1, self.retries + 1)
+                continue
+            self._idle.put(connection)
+            if response.status == 429 or response.status >= 500:
+                error = f"GET {url} answered {response.status}"
+                logger.warning("%s (attempt %s of %s)", error, attempt + 1, self.retries + 1)
+                continue
+            if response.status != 200:
+                raise BrokerError(f"GET {url} answered {response.status}: {body[:200]!r}")
+            return json.loads(body)
+        raise BrokerError(error)
+
+    def parse_order(self, record: Dict[str, Any]) -> RemoteOrder:
+        """Converts an order from the API, Alpaca's field names by default"""
+        average_fill_price = record.get("filled_avg_price")
+        return RemoteOrder(
+            str(record["id"]), record.get("client_order_id") or "", record.get("symbol") or "",
+            record.get("side") or "", float(record.get("qty") or 0), float(record.get("filled_qty") or 0),
+            float(average_fill_price) if average_fill_price is not None else None, record.get("status") or "",
+            _parse_timestamp(record["submitted_at"])
+        )
+
+    def fetch_orders(self, start: datetime, end: datetime) -> Iterator[List[RemoteOrder]]:
+        # after and until are both exclusive, so the window starts a tick before start
+        after = start - _TICK
+        seen = set()
+        while True:
+            records = self._get_json({**self.params, "after": _timestamp(after), "until": _timestamp(end),
+                                      "limit": self.page_size})
+            page = [self.parse_order(record) for record in records]
+            new = [order for order in page if order.broker_id not in seen]
+            yield new
+            if len(records) < self.page_size:
+                return
+            # Orders submitted in the same tick as the last one may carry on past this page, so the next page starts
+            # just before it and repeats are dropped. A full page all from one tick can only be stepped over.
+            last = page[-1].submitted_at
+            if new:
+                after = last - _TICK
+                seen = {order.broker_id for order in page if order.submitted_at == last}
+            else:
+                logger.warning("More than %s orders submitted at %s, some may be missed", self.page_size, last)
+                after = last
+
+    def close(self) -> None:
+        with self._connections_lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+
+
+@dataclass
+class ReconcileReport:
+    """What a reconcile run found and did"""
+    remote_orders: int = 0
+    in_sync: int = 0 # Orders that matched the broker, after any fills applied
+    fills_applied: List[Tuple[int, float, float]] = field(default_factory=list) # (order_number, price, quantity)
+    missing_locally: List[RemoteOrder] = field(default_factory=list) # At the broker with no matching local order
+    missing_remotely: List[int] = field(default_factory=list) # Local orders in the range the broker doesn't have
+    mismatched: Dict[int, str] = field(default_factory=dict) # Order number -> what differs, left for a person to fix
+    closed_remotely: List[int] = field(default_factory=list) # Still need fills locally, but the broker closed them
+    pages: int = 0
+    fetch_seconds: float = 0.0
+    elapsed: float = 0.0
+
+    @property # Getter
+    def is_clean(self) -> bool:
+        """Returns True if nothing needs a person to look at it"""
+        return not (self.missing_locally or self.missing_remotely or self.mismatched or self.closed_remotely)
+
+
+class Reconciler:
+    """
+    Brings an OrderManager in line with the broker's record of its orders
+
+    The time range is cut into windows that are fetched in parallel, each paged by the adapter, so the broker's
+    latency is paid once per window rather than once per page of the whole history. The remote orders are then
+    joined with the manager by order number through a dict, and the fill quantity the manager is missing is applied
+    in a single fill_orders call. Orders are matched on their client order id, which is the order number (after
+    client_order_prefix) the order was sent to the broker with.
+    """
+
+    def __init__(self, manager: "OrderManager", adapter: BrokerAdapter, window: timedelta = timedelta(hours=1),
+                 workers: int = 8, client_order_prefix: str = ""):
+        """
+        Args:
+        manager: The orders to reconcile
+        adapter: Where the broker's orders are read from
+        window: Span of submission time fetched by one request chain, smaller windows spread a range over more workers
+        workers: Windows fetched at once
+        client_order_prefix: Put before the order number in client order ids
+        """
+        if window <= timedelta(0):
+            raise ValueError(f"window must be positive, got {window}")
+        if workers < 1:
+            raise ValueError(f"workers must be at least 1, got {workers}")
+        self.manager = manager
+        self.adapter = adapter
+        self.window = window
+        self.workers = workers
+        self.client_order_prefix = client_order_prefix
+
+    def client_order_id(self, order: Order) -> str:
+        """Returns the client order id to send an order to the broker with, so it can be reconciled later"""
+        return f"{self.client_order_prefix}{order.order_number}"
+
+    def _order_number(self, client_order_id: str) -> Optional[int]:
+        if not client_order_id.startswith(self.client_order_prefix):
+            return None
+        number = client_order_id[len(self.client_order_prefix):]
+        return int(number) if number.isdigit() else None
+
+    def _windows(self, start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+        count = max(1, math.ceil((end - start) / self.window))
+        return [(start + self.window * index, min(start + self.window * (index + 1), end)) for index in range(count)]
+
+    def _fetch_window(self, window: Tuple[datetime, datetime]) -> Tuple[List[RemoteOrder], int]:
+        orders = []
+        pages = 0
+        for page in self.adapter.fetch_orders(*window):
+            orders.extend(page)
+            pages += 1
+        return orders, pages
+
+    def fetch(self, start: datetime, end: datetime) -> Tuple[List[RemoteOrder], int]:
+        """
+        Reads the broker's orders submitted from start up to end
+
+        Returns:
+        Tuple[List[RemoteOrder], int]: The orders oldest first, and the number of pages read
+        """
+        windows = self._windows(start, end)
+        orders = []
+        pages = 0
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(windows))) as executor:
+            for window_orders, window_pages in executor.map(self._fetch_window, windows):
+                orders.extend(window_orders)
+                pages += window_pages
+        return orders, pages
+
+    def reconcile(self, start: datetime, end: Optional[datetime] = None, apply_fills: bool = True) -> ReconcileReport:
+        """
+        Compares the orders submitted from start up to end with the manager
+
+        A local order that has less fill quantity than the broker reports gets one fill for the difference, priced
+        so its average fill price matches the broker's. Anything else that differs is only reported.
+
+        Args:
+        start: Start of the range, naive times are local time like Order.created_at
+        end: End of the range, now by default
+        apply_fills: Apply the missing fill quantity, False to only report it in fills_applied
+
+        Returns:
+        ReconcileReport: What was found, and the fills that were applied
+        """
+        end = end if end is not None else datetime.now(timezone.utc)
+        start, end = start.astimezone(timezone.utc), end.astimezone(timezone.utc)
+        report = ReconcileReport()
+        began = time.perf_counter()
+
+        with log_timing(logger, "orders_reconciled") as summary:
+            remote_orders, report.pages = self.fetch(start, end)
+            report.fetch_seconds = time.perf_counter() - began
+            report.remote_orders = len(remote_orders)
+
+            remote_by_number: Dict[int, RemoteOrder] = {}
+            for remote in remote_orders:
+                order_number = self._order_number(remote.client_order_id)
+                if order_number is None:
+                    report.missing_locally.append(remote)
+                elif order_number in remote_by_number:
+                    report.mismatched[order_number] = (f"Broker has orders {remote_by_number[order_number].broker_id} "
+                                                       f"and {remote.broker_id} for it")
+                else:
+                    remote_by_number[order_number] = remote
+
+            fills = []
+            for order_number, remote in remote_by_number.items():
+                if order_number in report.mismatched:
+                    continue
+                try:
+                    order = self.manager.get_order(order_number)
+                except ValueError:
+                    report.missing_locally.append(remote)
+                    continue
+                error, fill = self._compare(order, remote)
+                if error is not None:
+                    report.mismatched[order_number] = error
+                    continue
+                if fill is not None:
+                    fills.append(fill)
+                elif remote.status in CLOSED_STATUSES and order.needs_fills:
+                    report.closed_remotely.append(order_number)
+                else:
+                    report.in_sync += 1
+
+            self._apply(fills, remote_by_number, report, apply_fills)
+
+            # Order.created_at is naive local time, so the range is converted once rather than every order
+            local_start = start.astimezone().replace(tzinfo=None)
+            local_end = end.astimezone().replace(tzinfo=None)
+            report.missing_remotely = [order.order_number for order in list(self.manager.orders)
+                                       if local_start <= order.created_at < local_end
+                                       and order.order_number not in remote_by_number]
+
+            report.elapsed = time.perf_counter() - began
+            summary.update(remote_orders=report.remote_orders, pages=report.pages, in_sync=report.in_sync,
+                           fills_applied=len(report.fills_applied), missing_locally=len(report.missing_locally),
+                           missing_remotely=len(report.missing_remotely), mismatched=len(report.mismatched),
+                           closed_remotely=len(report.closed_remotely))
+        return report
+
+    def _compare(self, order: Order, remote: RemoteOrder) -> Tuple[Optional[str], Optional[Tuple[int, float, float]]]:
+        """Returns what differs between an order and the broker's copy, or the fill that brings it up to date"""
+        if order.side.value != remote.side:
+            return f"Side is {order.side.value} locally, {remote.side} at the broker", None
+        if not _same_quantity(order.quantity, remote.quantity):
+            return f"Quantity is {order.quantity} locally, {remote.quantity} at the broker", None
+        reference_data = self.manager.reference_data
+        if reference_data is not None:
+            info = reference_data.get(order.ticker_id)
+            if info is not None and info.ticker != remote.symbol:
+                return f"Ticker is {info.ticker} locally, {remote.symbol} at the broker", None
+
+        if _same_quantity(order.filled_quantity, remote.filled_quantity):
+            return None, None
+        missing = remote.filled_quantity - order.filled_quantity
+        if missing < 0:
+            return f"Filled {order.filled_quantity} locally, {remote.filled_quantity} at the broker", None
+        price = remote.average_fill_price
+        if price is None:
+            return f"Broker reports {remote.filled_quantity} filled without a fill price", None
+        # The broker only reports the average, so the missing quantity is priced to make the local average match it
+        fill_price = (price * remote.filled_quantity - order.fill_notional) / missing
+        return None, (order.order_number, fill_price if fill_price > 0 else price, missing)
+
+    def _apply(self, fills: List[Tuple[int, float, float]], remote_by_number: Dict[int, RemoteOrder],
+               report: ReconcileReport, apply_fills: bool) -> None:
+        if not apply_fills or not fills:
+            report.fills_applied = fills
+            return
+        result = self.manager.fill_orders(fills)
+        for index, fill in enumerate(fills):
+            order_number = fill[0]
+            if index in result.errors:
+                report.mismatched[order_number] = result.errors[index]
+                continue
+            report.fills_applied.append(fill)
+            order = self.manager.get_order(order_number)
+            if remote_by_number[order_number].status in CLOSED_STATUSES and order.needs_fills:
+                report.closed_remotely.append(order_number)
+            else:
+                report.in_sync += 1
@@ -0,0 +1,197 @@
+# reference_data.py
+import csv
+import logging
+import os
+import threading
+import time
+from array import array
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Tuple
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+TICKER_TABLE_FILENAME = "ticker_table.csv"
+TICKER_COLUMNS = ("ticker_id", "ticker", "name", "ticker_type", "exchange", "exchange_id")
+
+
+class TickerInfo(NamedTuple):
+    ticker_id: int
+    ticker: str
+    name: str
+    ticker_type: str
+    exchange: str
+    exchange_id: int
+
+
+class _TickerColumns(NamedTuple):
+    """One loaded version of the table, swapped in whole so readers never see a half loaded table"""
+    ticker_ids: array
+    exchange_ids: array
+    symbols: List[str]
+    names: List[str]
+    ticker_types: List[str]
+    exchanges: List[str]
+    rows_by_ticker_id: Dict[int, int]
+    rows_by_symbol: Dict[str, int]
+    exchange_ids_known: frozenset
+
+
+class TickerTable:
+    """
+    The ticker reference table, held as columns with hash indexes by ticker_id and symbol
+
+    The file is read once, and read again only when its modification time or size changes. That is checked at most
+    every check_interval seconds, so lookups stay O(1) dictionary reads.
+    """
+
+    def __init__(self, file_path: str = os.path.join("Data", TICKER_TABLE_FILENAME), check_interval: float = 1.0):
+        """
+        Args:
+        file_path: CSV file with the columns ticker_id, ticker, name, ticker_type, exchange, exchange_id
+        check_interval: Seconds between checks for a changed file, 0 checks on every lookup
+        """
+        self.file_path = file_path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._file_version: Optional[Tuple[int, int]] = None
+        self._next_check = 0.0
+        self._columns = self._read()
+
+    def _version(self) -> Tuple[int, int]:
+        stat = os.stat(self.file_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read(self) -> _TickerColumns:
+        """Reads the CSV into columns, symbols, types and exchange names are interned as they repeat"""
+        version = self._version()
+        ticker_ids = array('q')
+        exchange_ids = array('q')
+        symbols, names, ticker_types, exchanges = [], [], [], []
+        rows_by_ticker_id: Dict[int, int] = {}
+        rows_by_symbol: Dict[str, int] = {}
+        interned: Dict[str, str] = {}
+
+        with open(self.file_path, 'r', newline='', encoding='utf-8') as file:
+            reader = csv.DictReader(file)
+            missing = [column for column in TICKER_COLUMNS if column not in (reader.fieldnames or ())]
+            if missing:
+                raise ValueError(f"{self.file_path} is missing the columns {missing}")
+
+            for line_number, record in enumerate(reader, 2):
+                try:
+                    ticker_id = int(record["ticker_id"])
+                    exchange_id = int(record["exchange_id"])
+                except ValueError as e:
+                    raise ValueError(f"Bad ticker id or exchange id on line {line_number} of {self.file_path}") from e
+                if ticker_id in rows_by_ticker_id:
+                    raise ValueError(f"Ticker #{ticker_id} is listed twice in {self.file_path}")
+
+                symbol = record["ticker"].strip()
+                rows_by_ticker_id[ticker_id] = len(ticker_ids)
+                rows_by_symbol.setdefault(symbol, len(ticker_ids))
+                ticker_ids.append(ticker_id)
+                exchange_ids.append(exchange_id)
+                symbols.append(symbol)
+                names.append(record["name"].strip())
+                ticker_types.append(interned.setdefault(record["ticker_type"].strip(), record["ticker_type"].strip()))
+                exchanges.append(interned.setdefault(record["exchange"].strip(), record["exchange"].strip()))
+
+        self._file_version = version
+        logger.info("Loaded %s tickers from %s", len(ticker_ids), self.file_path)
+        return _TickerColumns(ticker_ids, exchange_ids, symbols, names, ticker_types, exchanges,
+                              rows_by_ticker_id, rows_by_symbol, frozenset(exchange_ids))
+
+    def reload_if_changed(self) -> bool:
+        """
+        Reads the file again if it changed since it was loaded
+
+        Returns:
+        bool: True if the table was reloaded
+        """
+        with self._lock:
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                changed = self._version() != self._file_version
+            except FileNotFoundError:
+                logger.warning("Ticker table %s is gone, keeping the loaded copy", self.file_path)
+                return False
+            if changed:
+                self._columns = self._read()
+            return changed
+
+    def _current(self) -> _TickerColumns:
+        if time.monotonic() >= self._next_check:
+            self.reload_if_changed()
+        return self._columns
+
+    def __len__(self) -> int:
+        return len(self._current().ticker_ids)
+
+    def __contains__(self, ticker_id: int) -> bool:
+        return ticker_id in self._current().rows_by_ticker_id
+
+    def _info(self, columns: _TickerColumns, row: int) -> TickerInfo:
+        return TickerInfo(columns.ticker_ids[row], columns.symbols[row], columns.names[row],
+                          columns.ticker_types[row], columns.exchanges[row], columns.exchange_ids[row])
+
+    def get(self, ticker_id: int) -> Optional[TickerInfo]:
+        """Returns the ticker with this id, None if there is none"""
+        columns = self._current()
+        row = columns.rows_by_ticker_id.get(ticker_id)
+        return self._info(columns, row) if row is not None else None
+
+    def get_by_symbol(self, symbol: str) -> Optional[TickerInfo]:
+        """Returns the first ticker listed with this symbol, None if there is none"""
+        columns = self._current()
+        row = columns.rows_by_symbol.get(symbol)
+        return self._info(columns, row) if row is not None else None
+
+    def has_exchange(self, exchange_id: int) -> bool:
+        """Returns True if any ticker trades on this exchange"""
+        return exchange_id in self._current().exchange_ids_known
+
+    def listings(self) -> Tuple[array, array]:
+        """Returns every ticker id and the exchange id it trades on, as two arrays in file order"""
+        columns = self._current()
+        return columns.ticker_ids, columns.exchange_ids
+
+    def check_order(self, ticker_id: int, exchange_id: int) -> Optional[str]:
+        """Returns why an order for this ticker and exchange can't be placed, None if it can"""
+        columns = self._current()
+        row = columns.rows_by_ticker_id.get(ticker_id)
+        if row is None:
+            return f"Unknown ticker id {ticker_id}"
+        if exchange_id not in columns.exchange_ids_known:
+            return f"Unknown exchange id {exchange_id}"
+        if columns.exchange_ids[row] != exchange_id:
+            return (f"Ticker id {ticker_id} ({columns.symbols[row]}) trades on exchange id "
+                    f"{columns.exchange_ids[row]}, not {exchange_id}")
+        return None
+
+    def enrich(self, orders_df: "pd.DataFrame", column: str = "ticker_id") -> "pd.DataFrame":
+        """
+        Adds the ticker, name, ticker_type and exchange of each row's ticker to a data frame
+
+        Args:
+        orders_df: Data frame with a ticker id column, it is changed in place
+        column: Name of the ticker id column
+
+        Returns:
+        pd.DataFrame: The same data frame, rows with unknown tickers get empty values
+        """
+        import numpy as np
+
+        if orders_df.empty or column not in orders_df:
+            return orders_df
+
+        # Each distinct ticker is looked up once, then spread over the rows
+        columns = self._current()
+        unique_ids, positions = np.unique(orders_df[column].to_numpy(), return_inverse=True)
+        rows = [columns.rows_by_ticker_id.get(int(ticker_id)) for ticker_id in unique_ids]
+        for name, values in (("ticker", columns.symbols), ("name", columns.names),
+                             ("ticker_type", columns.ticker_types), ("exchange", columns.exchanges)):
+            looked_up = np.array([values[row] if row is not None else None for row in rows], dtype=object)
+            orders_df[name] = looked_up[positions]
+        return orders_df
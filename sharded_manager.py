@@ -0,0 +1,323 @@
+# sharded_manager.py
+import json
+import logging
+import multiprocessing
+import os
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+from order_manager import BatchResult, Order, OrderDetails, OrderManager, OrderStatus
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+SHARDS_FILENAME = "shards.json"
+SHARD_KEYS = ("ticker_id", "exchange_id")
+
+
+def _shard_folder(data_folder: str, shard: int) -> str:
+    return os.path.join(data_folder, f"shard_{shard:02d}")
+
+
+def _order_records(orders: Sequence[Optional[Order]]) -> List[Optional[Dict[str, Any]]]:
+    """Orders are sent between processes as saved records, an Order holds a reference to its manager"""
+    return [order.to_dict() if order is not None else None for order in orders]
+
+
+# Commands a shard process understands, each takes the shard's manager and the arguments sent with the command
+def _add_orders(manager: OrderManager, orders_to_add: List[OrderDetails]):
+    result = manager.add_orders(orders_to_add)
+    return _order_records(result.results), result.errors
+
+
+def _fill_orders(manager: OrderManager, fills_to_add: List[Tuple[int, float, float]]):
+    result = manager.fill_orders(fills_to_add)
+    return result.results, result.errors
+
+
+def _get_order(manager: OrderManager, order_number: int):
+    return manager.get_order(order_number).to_dict()
+
+
+def _get_open_orders(manager: OrderManager):
+    return _order_records(manager.get_open_orders())
+
+
+def _get_orders_as_dataframe(manager: OrderManager, *args):
+    return manager.get_orders_as_dataframe(*args)
+
+
+def _get_order_frames(manager: OrderManager):
+    return manager.get_order_frames()
+
+
+def _save_orders(manager: OrderManager, filename: str):
+    manager.save_orders(filename)
+
+
+def _compact(manager: OrderManager, filename: str):
+    manager.compact(filename)
+
+
+def _order_count(manager: OrderManager):
+    return len(manager.orders)
+
+
+_COMMANDS = {
+    "add_orders": _add_orders,
+    "fill_orders": _fill_orders,
+    "get_order": _get_order,
+    "get_open_orders": _get_open_orders,
+    "get_orders_as_dataframe": _get_orders_as_dataframe,
+    "get_order_frames": _get_order_frames,
+    "save_orders": _save_orders,
+    "compact": _compact,
+    "order_count": _order_count,
+}
+
+
+def _run_shard(connection, shard: int, shard_count: int, data_folder: str, manager_options: Dict[str, Any]) -> None:
+    """Body of a shard process, it owns one OrderManager and answers commands until told to close"""
+    manager = OrderManager(data_folder=_shard_folder(data_folder, shard), order_number_start=shard + 1,
+                           order_number_step=shard_count, **manager_options)
+    while True:
+        try:
+            command, args = connection.recv()
+        except EOFError:
+            command, args = "close", ()
+
+        if command == "close":
+            manager.close()
+            connection.send(("ok", None))
+            connection.close()
+            return
+
+        try:
+            connection.send(("ok", _COMMANDS[command](manager, *args)))
+        except Exception as e:
+            connection.send(("error", e))
+
+
+class ShardedOrderManager:
+    """
+    Spreads orders over OrderManagers in worker processes, so fills on different shards run on different cores
+
+    Orders are placed on a shard by ticker_id (or exchange_id). Shard i gives out order numbers i + 1, i + 1 + N,
+    i + 1 + 2N, ... for N shards, so order numbers are unique across shards and a fill is routed to its shard by
+    order number alone. Every shard saves to its own folder under data_folder.
+
+    Each call is a round trip to the worker processes, so use add_orders and fill_orders for throughput. They split
+    the batch by shard and run the parts on all shards at once.
+    """
+
+    def __init__(self, data_folder: str = "data", shards: Optional[int] = None, shard_by: str = "ticker_id",
+                 mp_context: Optional[str] = None, **manager_options: Any):
+        """
+        Args:
+        data_folder: Folder holding one sub folder per shard
+        shards: Number of worker processes, defaults to the number of cores. Must match the number used when the
+            folder was first written
+        shard_by: "ticker_id" or "exchange_id", the order field that picks the shard
+        mp_context: multiprocessing start method, e.g. "spawn", defaults to the platform default
+        manager_options: Passed on to each shard's OrderManager, e.g. journal=True
+        """
+        if shard_by not in SHARD_KEYS:
+            raise ValueError(f"shard_by must be one of {SHARD_KEYS}, got {shard_by!r}")
+
+        self.data_folder = data_folder
+        self.shard_by = shard_by
+        self.shard_count = self._check_layout(shards if shards is not None else os.cpu_count() or 1)
+
+        context = multiprocessing.get_context(mp_context)
+        self._connections = []
+        self._processes = []
+        for shard in range(self.shard_count):
+            parent_connection, child_connection = context.Pipe()
+            process = context.Process(
+                target=_run_shard, name=f"order-shard-{shard}", daemon=True,
+                args=(child_connection, shard, self.shard_count, data_folder, manager_options)
+            )
+            process.start()
+            child_connection.close()
+            self._connections.append(parent_connection)
+            self._processes.append(process)
+        logger.info("Started %s order shards by %s in %s", self.shard_count, shard_by, data_folder)
+
+    def _check_layout(self, shards: int) -> int:
+        """Records the shard layout on first use and checks it on later runs, order numbers depend on it"""
+        if shards < 1:
+            raise ValueError("shards must be at least 1")
+
+        os.makedirs(self.data_folder, exist_ok=True)
+        layout_path = os.path.join(self.data_folder, SHARDS_FILENAME)
+        layout = {"shards": shards, "shard_by": self.shard_by}
+
+        if os.path.exists(layout_path):
+            with open(layout_path, 'r') as file:
+                saved_layout = json.load(file)
+            if saved_layout != layout:
+                raise ValueError(f"{self.data_folder} was written with {saved_layout}, not {layout}")
+        else:
+            with open(layout_path, 'w') as file:
+                json.dump(layout, file)
+        return shards
+
+    def shard_for_details(self, details: OrderDetails) -> int:
+        """Returns the shard a new order goes to"""
+        return getattr(details, self.shard_by) % self.shard_count
+
+    def shard_for_order(self, order_number: int) -> int:
+        """Returns the shard that owns an order number"""
+        return (order_number - 1) % self.shard_count
+
+    def _call(self, shard: int, command: str, *args) -> Any:
+        return self._scatter({shard: args}, command)[shard]
+
+    def _scatter(self, shard_args: Dict[int, tuple], command: str) -> Dict[int, Any]:
+        """Sends a command to several shards before waiting on any, so they work at the same time"""
+        for shard, args in shard_args.items():
+            self._connections[shard].send((command, args))
+
+        replies = {shard: self._connections[shard].recv() for shard in shard_args}
+        for status, value in replies.values():
+            if status == "error":
+                raise value
+        return {shard: value for shard, (_, value) in replies.items()}
+
+    def _broadcast(self, command: str, *args) -> List[Any]:
+        replies = self._scatter({shard: args for shard in range(self.shard_count)}, command)
+        return [replies[shard] for shard in range(self.shard_count)]
+
+    def add_order(self, details: OrderDetails) -> Order:
+        """Adds an order on the shard that owns its ticker (or exchange)"""
+        records, errors = self._call(self.shard_for_details(details), "add_orders", [details])
+        if errors:
+            raise ValueError(errors[0])
+        return Order.from_dict(records[0])
+
+    def add_orders(self, orders_to_add: Sequence[OrderDetails]) -> BatchResult:
+        """
+        Adds a batch of orders, each shard adding its part at the same time
+
+        Returns:
+        BatchResult: The new Order per item in the order given, or why it was rejected
+        """
+        positions_by_shard: Dict[int, List[int]] = {}
+        for index, details in enumerate(orders_to_add):
+            shard = self.shard_for_details(details) if isinstance(details, OrderDetails) else 0
+            positions_by_shard.setdefault(shard, []).append(index)
+
+        replies = self._scatter(
+            {shard: ([orders_to_add[index] for index in positions],) for shard, positions in positions_by_shard.items()},
+            "add_orders"
+        )
+        return self._gather(positions_by_shard, replies, Order.from_dict)
+
+    def fill_order(self, order_number: int, fill_price: float, fill_quantity: float) -> None:
+        """Adds a fill on the shard that owns the order, raising ValueError like OrderManager.fill_order"""
+        _, errors = self._call(self.shard_for_order(order_number), "fill_orders",
+                               [(order_number, fill_price, fill_quantity)])
+        if errors:
+            raise ValueError(errors[0])
+
+    def fill_orders(self, fills_to_add: Sequence[Tuple[int, float, float]]) -> BatchResult:
+        """
+        Applies a batch of fills, each shard applying its part at the same time
+
+        Args:
+        fills_to_add: (order_number, fill_price, fill_quantity) per fill, fills on one order keep their order
+
+        Returns:
+        BatchResult: The new OrderFill per item in the order given, or why it was rejected
+        """
+        positions_by_shard: Dict[int, List[int]] = {}
+        for index, (order_number, _, _) in enumerate(fills_to_add):
+            positions_by_shard.setdefault(self.shard_for_order(int(order_number)), []).append(index)
+
+        replies = self._scatter(
+            {shard: ([tuple(fills_to_add[index]) for index in positions],)
+             for shard, positions in positions_by_shard.items()},
+            "fill_orders"
+        )
+        return self._gather(positions_by_shard, replies)
+
+    @staticmethod
+    def _gather(positions_by_shard: Dict[int, List[int]], replies: Dict[int, Any], convert=None) -> BatchResult:
+        """Merges the shards' batch results back into the order of the original batch"""
+        result = BatchResult(results=[None] * sum(len(positions) for positions in positions_by_shard.values()))
+        for shard, positions in positions_by_shard.items():
+            results, errors = replies[shard]
+            for shard_index, (index, value) in enumerate(zip(positions, results)):
+                if shard_index in errors:
+                    result.errors[index] = errors[shard_index]
+                elif value is not None:
+                    result.results[index] = convert(value) if convert is not None else value
+        result.errors = dict(sorted(result.errors.items()))
+        return result
+
+    def get_order(self, order_number: int) -> Order:
+        """Retrieves an order from the shard that owns it"""
+        return Order.from_dict(self._call(self.shard_for_order(order_number), "get_order", order_number))
+
+    def get_open_orders(self) -> List[Order]:
+        """Returns the orders that still need fills on every shard, by order number"""
+        records = [record for shard_records in self._broadcast("get_open_orders") for record in shard_records]
+        records.sort(key=lambda record: record["order_number"])
+        return [Order.from_dict(record) for record in records]
+
+    def get_order_frames(self) -> Tuple["pd.DataFrame", "pd.DataFrame"]:
+        """
+        Builds the order and fill frames of every shard and joins them
+
+        Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: One row per order and one row per fill, both sorted by order_number
+        """
+        import pandas as pd
+
+        frames = self._broadcast("get_order_frames")
+        orders_df = pd.concat([orders for orders, _ in frames], ignore_index=True)
+        fills_df = pd.concat([fills for _, fills in frames], ignore_index=True)
+        orders_df = orders_df.sort_values("order_number", kind="stable", ignore_index=True)
+        fills_df = fills_df.sort_values("order_number", kind="stable", ignore_index=True)
+        return orders_df, fills_df
+
+    def get_orders_as_dataframe(self, filename: str = "orders.json", ticker_id: Optional[int] = None,
+                                exchange_id: Optional[int] = None,
+                                status: Optional[OrderStatus] = None) -> "pd.DataFrame":
+        """Returns the saved orders of every shard as one data frame, with the same filters as OrderManager"""
+        import pandas as pd
+
+        # A status value such as "Open" is accepted too, the shards need the enum
+        status = OrderStatus(status) if status is not None else None
+        frames = [frame for frame in self._broadcast("get_orders_as_dataframe", filename, ticker_id, exchange_id, status)
+                  if not frame.empty]
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames, ignore_index=True).sort_values("order_number", kind="stable", ignore_index=True)
+
+    def order_count(self) -> int:
+        """Returns the number of orders held in memory across all shards"""
+        return sum(self._broadcast("order_count"))
+
+    def save_orders(self, filename: str = "orders.json") -> None:
+        """Saves every shard's orders to the orders file in its own folder"""
+        self._broadcast("save_orders", filename)
+
+    def compact(self, filename: str = "orders.json") -> None:
+        """Compacts every shard's journal into its orders file"""
+        self._broadcast("compact", filename)
+
+    def close(self) -> None:
+        """Closes every shard's manager and waits for the worker processes to exit"""
+        for connection, process in zip(self._connections, self._processes):
+            if process.is_alive():
+                try:
+                    connection.send(("close", ()))
+                    connection.recv()
+                except (EOFError, OSError):
+                    pass
+            connection.close()
+        for process in self._processes:
+            process.join()
+        self._connections = []
+        self._processes = []
@@ -0,0 +1,36 @@
+import unittest
+from benchmarks.run_benchmarks import compare_results, run_benchmark
+
+def results(*entries):
+    return {"results": [
+        {"operation": operation, "scale": scale, "items": scale, "seconds": scale / rate,
+         "items_per_second": rate, "peak_memory_bytes": memory}
+        for operation, scale, rate, memory in entries
+    ]}
+
+class TestBenchmarks(unittest.TestCase):
+    def test_compare_flags_regressions(self):
+        """Test that slower or larger operations are flagged and small changes are not"""
+        baseline = results(("add_order", 1000, 10000.0, 1000), ("get_order", 1000, 50000.0, 100),
+                           ("save_orders", 1000, 2000.0, 5000))
+        current = results(("add_order", 1000, 9000.0, 1100), ("get_order", 1000, 20000.0, 100),
+                          ("save_orders", 1000, 2000.0, 9000), ("load_orders", 1000, 1.0, 1))
+
+        regressions = compare_results(baseline, current, threshold=0.2)
+        flagged = {(regression["operation"], regression["metric"]) for regression in regressions}
+        self.assertEqual(flagged, {("get_order", "items_per_second"), ("save_orders", "peak_memory_bytes")})
+
+        get_order = next(regression for regression in regressions if regression["operation"] == "get_order")
+        self.assertEqual(get_order["baseline"], 50000.0)
+        self.assertEqual(get_order["change"], -0.6)
+
+    def test_run_benchmark(self):
+        """Test that a benchmark reports how many items it handled and its peak memory"""
+        result = run_benchmark("fill_order", 50)
+        self.assertEqual(result.operation, "fill_order")
+        self.assertEqual(result.items, 50)
+        self.assertGreater(result.items_per_second, 0)
+        self.assertGreater(result.peak_memory_bytes, 0)
+
+if __name__ == '__main__':
+    unittest.main()
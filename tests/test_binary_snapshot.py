@@ -0,0 +1,91 @@
+import unittest
+import json
+import os
+import shutil
+from binary_snapshot import BinaryOrderStorage, OrderSnapshot, json_to_snapshot, snapshot_to_json
+from order_manager import OrderManager, OrderDetails, OrderSide, OrderStatus
+
+class TestBinarySnapshot(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.test_data_folder = "TestData"
+        self.manager = OrderManager(data_folder=self.test_data_folder)
+        self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00, exchange_id=1))
+        self.manager.add_order(OrderDetails(ticker_id=1002, order_quantity=200, order_price=75.00, exchange_id=2,
+                                            transaction_fee=1.5, side=OrderSide.SELL))
+        self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=300, order_price=51.00, exchange_id=2))
+        self.manager.fill_order(1, 49.95, 60)
+        self.manager.fill_order(1, 50.05, 40)
+        self.manager.fill_order(2, 75.00, 50)
+        self.manager.save_orders()
+        self.json_path = os.path.join(self.test_data_folder, "orders.json")
+        self.snapshot_path = os.path.join(self.test_data_folder, "orders.snap")
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        if os.path.exists(self.test_data_folder):
+            shutil.rmtree(self.test_data_folder)
+
+    def test_json_round_trip(self):
+        """Test converting orders.json to a snapshot and back"""
+        self.assertEqual(json_to_snapshot(self.json_path, self.snapshot_path), 3)
+        back_path = os.path.join(self.test_data_folder, "back.json")
+        snapshot_to_json(self.snapshot_path, back_path)
+
+        with open(self.json_path) as original, open(back_path) as converted:
+            self.assertEqual(json.load(converted), json.load(original))
+
+    def test_queries_read_in_place(self):
+        """Test finding and filtering records on the mapped file"""
+        json_to_snapshot(self.json_path, self.snapshot_path)
+        with OrderSnapshot(self.snapshot_path) as snapshot:
+            self.assertEqual(len(snapshot), 3)
+            self.assertEqual(snapshot.last_order_number, 3)
+            self.assertEqual(snapshot.find(2), 1)
+            self.assertIsNone(snapshot.find(9))
+            self.assertEqual(snapshot.rows(ticker_id=1001).tolist(), [0, 2])
+            self.assertEqual(snapshot.rows(status=OrderStatus.FILLED).tolist(), [0])
+            self.assertEqual(snapshot.rows(needs_fills=True, exchange_id=2).tolist(), [1, 2])
+            self.assertEqual(snapshot.fills["fill_price"][:2].tolist(), [49.95, 50.05])
+
+            record = snapshot.record(1)
+            self.assertEqual(record["side"], "sell")
+            self.assertEqual(record["transaction_fee"], 1.5)
+            self.assertEqual(record["filled_quantity"], 50)
+
+    def test_damaged_file_rejected(self):
+        """Test that the checksum catches a damaged record"""
+        json_to_snapshot(self.json_path, self.snapshot_path)
+        with open(self.snapshot_path, 'r+b') as file:
+            file.seek(200)
+            byte = file.read(1)
+            file.seek(200)
+            file.write(bytes([byte[0] ^ 0xFF]))
+
+        with self.assertRaises(ValueError):
+            OrderSnapshot(self.snapshot_path)
+        OrderSnapshot(self.snapshot_path, verify=False).close()
+
+    def test_manager_storage(self):
+        """Test saving to and restarting from a snapshot, with filled orders read on demand"""
+        json_to_snapshot(self.json_path, self.snapshot_path)
+        manager = OrderManager(data_folder=self.test_data_folder, storage=BinaryOrderStorage(self.test_data_folder))
+        self.assertEqual([order.order_number for order in manager.orders], [2, 3])
+        self.assertEqual(manager.next_order_number, 4)
+        self.assertAlmostEqual(manager.get_order(1).average_fill_price, 49.99)
+
+        manager.fill_order(3, 51.00, 300)
+        manager.add_order(OrderDetails(ticker_id=1003, order_quantity=10, order_price=5.00, exchange_id=1))
+        manager.save_orders()
+        orders_df = manager.get_orders_as_dataframe(status=OrderStatus.FILLED)
+        self.assertEqual(orders_df["order_number"].tolist(), [1, 3])
+        self.assertEqual(len(orders_df["fills"][0]), 2)
+        manager.close()
+
+        manager = OrderManager(data_folder=self.test_data_folder, storage=BinaryOrderStorage(self.test_data_folder))
+        self.assertEqual([order.order_number for order in manager.orders], [2, 4])
+        self.assertEqual(manager.get_order(3).status, OrderStatus.FILLED)
+        manager.close()
+
+if __name__ == '__main__':
+    unittest.main()
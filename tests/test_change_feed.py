@@ -0,0 +1,94 @@
+import unittest
+import os
+import shutil
+import threading
+from change_feed import ChangeFeed, CursorExpired
+from order_manager import OrderManager, OrderDetails
+
+
+class TestChangeFeed(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.test_data_folder = "TestData"
+        self.manager = OrderManager(data_folder=self.test_data_folder)
+        self.spill_path = os.path.join(self.test_data_folder, "changes.jsonl")
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        if os.path.exists(self.test_data_folder):
+            shutil.rmtree(self.test_data_folder)
+
+    def add_and_fill(self, count: int) -> None:
+        for _ in range(count):
+            order = self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00))
+            self.manager.fill_orders([(order.order_number, 50.00, 40), (order.order_number, 50.00, 60)])
+
+    def test_changes_since_cursor(self):
+        """Test that every change gets the next sequence and consumers read only what came after their cursor"""
+        feed = ChangeFeed.for_manager(self.manager)
+        self.add_and_fill(1)
+
+        cursor, events = feed.changes_since(0)
+        self.assertEqual(cursor, 5)
+        self.assertEqual([event.sequence for event in events], [1, 2, 3, 4, 5])
+        self.assertEqual([event.kind for event in events],
+                         ["order_added", "fill_added", "status_changed", "fill_added", "status_changed"])
+        self.assertEqual([event.status for event in events if event.kind == "status_changed"],
+                         ["Partially Filled", "Filled"])
+        self.assertEqual(events[1].fill_quantity, 40)
+
+        self.assertEqual(feed.changes_since(cursor), (5, []))
+        self.add_and_fill(1)
+        cursor, events = feed.changes_since(cursor, limit=2)
+        self.assertEqual((cursor, [event.order_number for event in events]), (7, [2, 2]))
+        with self.assertRaises(CursorExpired):
+            feed.changes_since(99)
+
+    def test_ring_eviction_and_spill(self):
+        """Test that cursors older than the ring expire in memory and are read back from the spill file"""
+        feed = ChangeFeed.for_manager(self.manager, capacity=4)
+        self.add_and_fill(2)
+        self.assertEqual(feed.oldest_sequence, 7)
+        with self.assertRaises(CursorExpired):
+            feed.changes_since(0)
+        feed.close()
+
+        feed = ChangeFeed.for_manager(self.manager, capacity=4, spill_path=self.spill_path)
+        self.add_and_fill(3)
+        cursor, events = feed.changes_since(0)
+        self.assertEqual([event.sequence for event in events], list(range(1, 16)))
+        self.assertEqual([event.order_number for event in events[:5]], [3] * 5)
+        feed.close()
+
+        # A restart carries on numbering after the last spilled event, and drops a torn last line
+        with open(self.spill_path, 'a') as file:
+            file.write('[16,"order_add')
+        feed = ChangeFeed.for_manager(self.manager, capacity=4, spill_path=self.spill_path)
+        self.assertEqual(feed.sequence, 15)
+        self.add_and_fill(1)
+        cursor, events = feed.changes_since(10)
+        self.assertEqual([event.sequence for event in events], list(range(11, 21)))
+        self.assertEqual(events[-1].order_number, 6)
+        feed.close()
+
+    def test_subscribe_and_wait(self):
+        """Test that subscribers get the backlog after their cursor then each new event, and readers can wait"""
+        feed = ChangeFeed.for_manager(self.manager)
+        self.add_and_fill(1)
+        received = []
+        feed.subscribe(received.append, cursor=3)
+        self.add_and_fill(1)
+        self.assertEqual([event.sequence for event in received], list(range(4, 11)))
+
+        feed.unsubscribe(received.append)
+        timer = threading.Timer(0.05, self.add_and_fill, args=(1,))
+        timer.start()
+        cursor, events = feed.changes_since(feed.sequence, timeout=5)
+        timer.join()
+        self.assertGreaterEqual(cursor, 11)
+        self.assertEqual(events[0].kind, "order_added")
+        self.assertEqual(feed.changes_since(15, timeout=0.01), (15, []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+import asyncio
+import os
+import shutil
+import threading
+from async_order_manager import AsyncOrderManager
+from order_manager import OrderManager, OrderDetails, OrderStatus
+
+class TestThreadSafeOrderManager(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.test_data_folder = "TestData"
+        self.manager = OrderManager(data_folder=self.test_data_folder, journal=True, thread_safe=True)
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        self.manager.close()
+        if os.path.exists(self.test_data_folder):
+            shutil.rmtree(self.test_data_folder)
+
+    def run_threads(self, target, count: int) -> None:
+        threads = [threading.Thread(target=target, args=(idx,)) for idx in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_concurrent_adds_get_unique_numbers(self):
+        """Test that orders added from several threads get distinct numbers"""
+        def add(thread_idx):
+            for _ in range(200):
+                self.manager.add_order(OrderDetails(ticker_id=thread_idx, order_quantity=10, order_price=1.0))
+
+        self.run_threads(add, 8)
+        numbers = [order.order_number for order in self.manager.orders]
+        self.assertEqual(sorted(numbers), list(range(1, 1601)))
+        self.assertEqual(self.manager.next_order_number, 1601)
+        self.assertEqual(len(self.manager.get_open_orders()), 1600)
+
+    def test_concurrent_fills_on_shared_orders(self):
+        """Test that fills from several threads on the same orders are all applied, and replay afterwards"""
+        self.manager.add_orders([OrderDetails(ticker_id=1001, order_quantity=800, order_price=1.0)] * 10)
+
+        def fill(thread_idx):
+            for idx in range(100):
+                if idx % 2:
+                    self.manager.fill_order(idx % 10 + 1, 1.0, 1)
+                else:
+                    self.manager.fill_orders([(idx % 10 + 1, 1.0, 1)])
+
+        self.run_threads(fill, 8)
+        for order in self.manager.orders:
+            self.assertEqual(order.filled_quantity, 80)
+            self.assertEqual(order.fill_count, 80)
+        self.assertEqual(len(self.manager.get_orders_by_status(OrderStatus.PARTIALLY_FILLED)), 10)
+
+        self.manager.close()
+        self.manager = OrderManager(data_folder=self.test_data_folder, journal=True, thread_safe=True)
+        self.assertEqual([order.filled_quantity for order in self.manager.orders], [80] * 10)
+
+    def test_out_of_order_journal_replay(self):
+        """Test that fills journaled ahead of an earlier fill are still replayed"""
+        self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=100, order_price=1.0))
+        self.manager.journal.append_many([
+            {"event": "fill_added", "order_number": 1, "fill_index": 1, "fill_price": 2.0, "fill_quantity": 20, "filled_at": "2025-06-15 12:00:01"},
+            {"event": "fill_added", "order_number": 1, "fill_index": 0, "fill_price": 1.0, "fill_quantity": 10, "filled_at": "2025-06-15 12:00:00"},
+        ])
+        self.manager.close()
+
+        self.manager = OrderManager(data_folder=self.test_data_folder, journal=True, thread_safe=True)
+        order = self.manager.get_order(1)
+        self.assertEqual([fill.fill_quantity for fill in order.fills], [10, 20])
+
+
+class TestAsyncOrderManager(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.test_data_folder = "TestData"
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        if os.path.exists(self.test_data_folder):
+            shutil.rmtree(self.test_data_folder)
+
+    def test_requires_thread_safe_manager(self):
+        """Test that the async front end refuses an unlocked manager"""
+        with self.assertRaises(ValueError):
+            AsyncOrderManager(OrderManager(data_folder=self.test_data_folder))
+
+    def test_queued_fills(self):
+        """Test adding orders and draining queued fills from several producers"""
+        async def scenario():
+            manager = AsyncOrderManager(
+                OrderManager(data_folder=self.test_data_folder, journal=True, thread_safe=True),
+                queue_size=50, batch_size=20
+            )
+            await manager.start()
+            orders = [await manager.add_order(OrderDetails(ticker_id=idx, order_quantity=100, order_price=1.0)) for idx in range(5)]
+
+            async def producer(order_number):
+                for _ in range(100):
+                    await manager.submit_fill(order_number, 1.0, 1)
+
+            await asyncio.gather(*(producer(order.order_number) for order in orders))
+            await manager.submit_fill(1, 1.0, 1)  # Order 1 is already filled
+            await manager.join()
+            await manager.save_orders()
+            await manager.close()
+            return orders, manager.batch_results
+
+        orders, batch_results = asyncio.run(scenario())
+        self.assertTrue(all(order.status == OrderStatus.FILLED for order in orders))
+        self.assertEqual(sum(len(result.errors) for result in batch_results), 1)
+        self.assertTrue(os.path.exists(os.path.join(self.test_data_folder, "orders.json")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import unittest
+import os
+import shutil
+import numpy as np
+from fill_generator import FillGenerator, GeneratorConfig, replay
+from order_manager import OrderDetails, OrderManager, OrderStatus
+from reference_data import TickerTable
+
+LISTINGS = [(1, 1), (2, 2), (3, 1)]
+
+class TestFillGenerator(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.test_data_folder = "TestData"
+        os.makedirs(self.test_data_folder, exist_ok=True)
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        if os.path.exists(self.test_data_folder):
+            shutil.rmtree(self.test_data_folder)
+
+    def test_same_seed_same_orders(self):
+        """Test that a seed makes the output repeatable"""
+        first = FillGenerator(GeneratorConfig(seed=7), listings=LISTINGS)
+        second = FillGenerator(GeneratorConfig(seed=7), listings=LISTINGS)
+        orders = first.orders(500)
+        np.testing.assert_array_equal(orders.prices, second.orders(500).prices)
+        np.testing.assert_array_equal(first.fills(orders).quantities, second.fills(orders).quantities)
+
+    def test_fills_stay_within_order_quantity(self):
+        """Test fill totals, fill order and the listings used"""
+        generator = FillGenerator(GeneratorConfig(seed=1, fill_probability=0.5, complete_probability=0.5),
+                                  listings=LISTINGS)
+        orders = generator.orders(2000)
+        fills = generator.fills(orders)
+
+        filled = np.bincount(fills.order_indexes, weights=fills.quantities, minlength=2000)
+        self.assertTrue((filled <= orders.quantities).all())
+        self.assertTrue((fills.quantities > 0).all())
+        self.assertTrue((filled == 0).any())
+        self.assertTrue((filled == orders.quantities).any())
+        self.assertTrue(((filled > 0) & (filled < orders.quantities)).any())
+        self.assertTrue((np.diff(fills.times) >= 0).all())
+        self.assertTrue((fills.times > orders.arrivals[fills.order_indexes]).all())
+        self.assertEqual(set(zip(orders.ticker_ids.tolist(), orders.exchange_ids.tolist())), set(LISTINGS))
+
+    def test_stream_into_manager(self):
+        """Test that streamed orders and fills are accepted by a manager checking the ticker table"""
+        table_path = os.path.join(self.test_data_folder, "ticker_table.csv")
+        with open(table_path, 'w') as file:
+            file.write("ticker_id,ticker,name,ticker_type,exchange,exchange_id\n"
+                       "1,AAPL,Apple,stocks,Alpacha,1\n2,BTC,Bitcoin,crypto,Binance,2\n")
+        table = TickerTable(table_path)
+        manager = OrderManager(data_folder=self.test_data_folder, reference_data=table)
+
+        summary = FillGenerator(GeneratorConfig(seed=3), ticker_table=table).stream_into(manager, 1000,
+                                                                                         chunk_size=300)
+        self.assertEqual(summary.orders, 1000)
+        self.assertEqual(summary.rejected_orders, 0)
+        self.assertEqual(summary.rejected_fills, 0)
+        self.assertEqual(sum(order.fill_count for order in manager.orders), summary.fills)
+        self.assertTrue(manager.get_orders_by_status(OrderStatus.FILLED))
+
+    def test_replay_file(self):
+        """Test writing a replay file and replaying it into a manager with orders already in it"""
+        replay_path = os.path.join(self.test_data_folder, "replay.jsonl")
+        generator = FillGenerator(GeneratorConfig(seed=5), listings=LISTINGS)
+        events = generator.write_replay(replay_path, 400, chunk_size=150)
+
+        manager = OrderManager(data_folder=self.test_data_folder)
+        manager.add_order(OrderDetails(ticker_id=1, order_quantity=10, order_price=5.0, exchange_id=1))
+        summary = replay(manager, replay_path, chunk_size=100)
+        self.assertEqual(summary.orders, 400)
+        self.assertEqual(summary.orders + summary.fills, events)
+        self.assertEqual(summary.rejected_fills, 0)
+        self.assertEqual(len(manager.orders), 401)
+        self.assertEqual(manager.get_order(1).fill_count, 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+import os
+import shutil
+from datetime import datetime, timedelta
+from fill_store import FillStore, ROLLUP_FILENAME
+from order_manager import OrderManager, OrderDetails
+
+
+class TestFillStore(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.test_data_folder = "TestData"
+        self.store_folder = os.path.join(self.test_data_folder, "fills")
+        self.start = datetime(2024, 5, 1, 23, 0, 0)
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        if os.path.exists(self.test_data_folder):
+            shutil.rmtree(self.test_data_folder)
+
+    def add_sample_fills(self, store: FillStore) -> list:
+        """Adds a fill every 7.5 seconds for two hours, crossing midnight, and returns them"""
+        fills = []
+        for index in range(960):
+            filled_at = self.start + timedelta(seconds=7.5 * index)
+            price, quantity = 100 + index % 13, 1 + index % 5
+            store.add(index + 1, 0, 1001, 1, "buy", price, quantity, filled_at)
+            fills.append((filled_at, price, quantity))
+        return fills
+
+    def expected(self, fills: list, start: datetime, end: datetime) -> tuple:
+        selected = [(price, quantity) for filled_at, price, quantity in fills if start <= filled_at < end]
+        volume = sum(quantity for _, quantity in selected)
+        return len(selected), volume, sum(price * quantity for price, quantity in selected) / volume
+
+    def test_rollup_queries_match_raw_fills(self):
+        """Test that counts, volumes and VWAPs added up from rollups match the raw fills, across days"""
+        store = FillStore(self.store_folder)
+        fills = self.add_sample_fills(store)
+
+        for start, end in ((self.start, self.start + timedelta(hours=2)),
+                           (self.start + timedelta(minutes=17, seconds=3), self.start + timedelta(hours=1, minutes=2)),
+                           (datetime(2024, 5, 1, 23, 59, 30), datetime(2024, 5, 2, 0, 0, 31))):
+            count, volume, vwap = self.expected(fills, start, end)
+            summary = store.summary(1001, start, end)
+            self.assertEqual((summary.count, summary.volume), (count, volume))
+            self.assertAlmostEqual(store.vwap(1001, start, end), vwap)
+
+        bars = store.bars(1001, self.start, self.start + timedelta(hours=2), interval=3600)
+        self.assertEqual([bar.start for bar in bars], [self.start, self.start + timedelta(hours=1)])
+        self.assertEqual(sum(bar.count for bar in bars), 960)
+        self.assertEqual(len(store.fills(1001, self.start, self.start + timedelta(minutes=1))), 8)
+        self.assertEqual(store.summary(1002, self.start, self.start + timedelta(hours=2)).count, 0)
+
+    def test_reopen_reads_rollups_and_rebuilds_stale_days(self):
+        """Test that rollups are read back, and rebuilt from raw fills when a flush didn't finish"""
+        store = FillStore(self.store_folder)
+        fills = self.add_sample_fills(store)
+        store.close()
+
+        end = self.start + timedelta(hours=2)
+        self.assertEqual(FillStore(self.store_folder).summary(1001, self.start, end).count, 960)
+
+        # Rollups written before the last raw fills, as if the process died in between
+        os.remove(os.path.join(self.store_folder, "2024-05-02", ROLLUP_FILENAME))
+        with self.assertLogs("fill_store", level="WARNING"):
+            summary = FillStore(self.store_folder).summary(1001, self.start, end)
+        self.assertEqual(summary.count, 960)
+        self.assertAlmostEqual(summary.vwap, self.expected(fills, self.start, end)[2])
+
+    def test_follows_manager_without_storing_fills_twice(self):
+        """Test that attaching stores the manager's earlier fills once and then each new fill"""
+        manager = OrderManager(data_folder=self.test_data_folder)
+        manager.add_order(OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00))
+        manager.fill_order(1, 49.95, 60)
+        store = FillStore.for_manager(manager)
+        manager.fill_order(1, 50.05, 40)
+        store.close()
+
+        manager.add_order(OrderDetails(ticker_id=1001, order_quantity=10, order_price=50.00))
+        manager.fill_order(2, 50.00, 10)
+        store = FillStore.for_manager(manager)
+        records = store.fills(1001, datetime(2000, 1, 1), datetime.now() + timedelta(days=1))
+        self.assertEqual([(record.order_number, record.fill_index) for record in records], [(1, 0), (1, 1), (2, 0)])
+        self.assertEqual([record.filled_at for record in records],
+                         [fill.filled_at for order in manager.orders for fill in order.fills])
+
+        now = datetime.now()
+        summary = store.summary(1001, now - timedelta(hours=1), now + timedelta(hours=1))
+        self.assertEqual(summary.volume, 110)
+        self.assertAlmostEqual(summary.vwap, (49.95 * 60 + 50.05 * 40 + 50.00 * 10) / 110)
+
+    def test_replay_keeps_fill_indexes(self):
+        """Test that replayed fills interleaved across orders are stored with their index on their order"""
+        manager = OrderManager(data_folder=self.test_data_folder)
+        manager.add_orders([OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00)] * 2)
+        manager.fill_orders([(1 + index % 2, 50.00, 1) for index in range(50)])
+        store = FillStore.for_manager(manager)
+        records = store.fills(1001, datetime(2000, 1, 1), datetime.now() + timedelta(days=1))
+        self.assertEqual(sorted((record.order_number, record.fill_index) for record in records),
+                         [(order_number, index) for order_number in (1, 2) for index in range(25)])
+        self.assertEqual(store._replay_positions, {})
+        store.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
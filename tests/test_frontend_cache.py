@@ -0,0 +1,73 @@
+import unittest
+import os
+import shutil
+import time
+from frontend_cache import CachedOrderBook
+from order_manager import OrderManager, OrderDetails, OrderStatus
+
+class TestCachedOrderBook(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.test_data_folder = "TestData"
+        self.book = CachedOrderBook(data_folder=self.test_data_folder)
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        self.book.close()
+        if os.path.exists(self.test_data_folder):
+            shutil.rmtree(self.test_data_folder)
+
+    def test_changed_orders_since(self):
+        """Test that the manager reports only orders changed after a revision"""
+        manager = self.book.manager
+        for idx in range(3):
+            manager.add_order(OrderDetails(ticker_id=1001 + idx, order_quantity=100, order_price=50.00))
+        revision, changed = manager.changed_orders_since(0)
+        self.assertEqual([order.order_number for order in changed], [1, 2, 3])
+
+        manager.fill_order(1, 49.95, 40)
+        new_revision, changed = manager.changed_orders_since(revision)
+        self.assertEqual([order.order_number for order in changed], [1])
+        self.assertGreater(new_revision, revision)
+        self.assertEqual(manager.changed_orders_since(new_revision), (new_revision, []))
+
+    def test_refresh_updates_changed_rows(self):
+        """Test that refresh adds new orders and updates filled ones in place"""
+        self.book.add_order(OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00))
+        self.book.add_order(OrderDetails(ticker_id=1002, order_quantity=10, order_price=75.00))
+        self.assertTrue(self.book.refresh())
+        self.assertEqual(self.book.orders_df["order_number"].tolist(), [1, 2])
+
+        self.book.fill_order(1, 49.95, 60)
+        self.book.fill_order(1, 50.05, 40)
+        self.assertTrue(self.book.refresh())
+        self.assertFalse(self.book.refresh())
+
+        row = self.book.orders_df.loc[1]
+        self.assertEqual(row["status"], OrderStatus.FILLED.value)
+        self.assertEqual(row["filled_quantity"], 100)
+        self.assertEqual(self.book.orders_df.loc[2, "status"], OrderStatus.OPEN.value)
+        self.assertEqual(self.book.fills_df["fill_quantity"].tolist(), [60, 40])
+
+        # The incremental frames match frames built from scratch
+        orders_df, fills_df = self.book.manager.get_order_frames()
+        self.assertEqual(self.book.orders_df.reset_index(drop=True).to_dict(), orders_df.to_dict())
+        self.assertEqual(self.book.fills_df.to_dict(), fills_df.to_dict())
+
+    def test_reload_on_external_change(self):
+        """Test that orders written by another process are picked up on refresh"""
+        self.book.add_order(OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00))
+        self.book.refresh()
+        manager = self.book.manager
+
+        time.sleep(0.01) # Make sure the modification time moves
+        other = OrderManager(data_folder=self.test_data_folder, journal=True)
+        other.add_order(OrderDetails(ticker_id=1002, order_quantity=10, order_price=75.00))
+        other.close()
+
+        self.assertTrue(self.book.refresh())
+        self.assertIsNot(self.book.manager, manager)
+        self.assertEqual(self.book.orders_df["order_number"].tolist(), [1, 2])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+import unittest
+import json
+import os
+import shutil
+from ingest import CommandIngestor
+from order_manager import OrderManager, OrderStatus
+
+
+class TestCommandIngestor(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.test_data_folder = "TestData"
+        os.makedirs(self.test_data_folder, exist_ok=True)
+        self.commands_path = os.path.join(self.test_data_folder, "commands.jsonl")
+        self.checkpoint_path = os.path.join(self.test_data_folder, "ingest.checkpoint")
+        self.errors_path = os.path.join(self.test_data_folder, "errors.jsonl")
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        if os.path.exists(self.test_data_folder):
+            shutil.rmtree(self.test_data_folder)
+
+    def write_commands(self, lines: list, mode: str = 'w') -> None:
+        with open(self.commands_path, mode) as file:
+            file.writelines((line if isinstance(line, str) else json.dumps(line)) + '\n' for line in lines)
+
+    def sample_commands(self, first_id: int, count: int) -> list:
+        """An order per id, each filled in two halves"""
+        commands = [{"op": "add_order", "id": order_id, "ticker_id": 1000 + order_id % 7, "exchange_id": 1,
+                     "order_quantity": 10, "order_price": 5.0} for order_id in range(first_id, first_id + count)]
+        commands.extend({"op": "fill_order", "id": order_id, "fill_price": 5.0, "fill_quantity": 5}
+                        for order_id in range(first_id, first_id + count) for _ in range(2))
+        return commands
+
+    def ingest(self, manager: OrderManager, **kwargs) -> CommandIngestor:
+        kwargs.setdefault("workers", 0)
+        return CommandIngestor(manager, checkpoint_path=self.checkpoint_path, errors_path=self.errors_path, **kwargs)
+
+    def test_applies_commands_and_reports_bad_lines(self):
+        """Test that good lines are applied and committed while each bad line is reported with its line number"""
+        self.write_commands([
+            {"op": "add_order", "id": "a", "ticker_id": 1001, "exchange_id": 1, "order_quantity": 100,
+             "order_price": 50.0, "side": "sell"},
+            '{"op": "add_order", "id": ',
+            {"op": "fill_order", "id": "a", "fill_price": 50.0, "fill_quantity": 60},
+            {"op": "cancel_order", "id": "a"},
+            {"op": "add_order", "ticker_id": 1002, "order_quantity": -5, "order_price": 1.0},
+            "",
+            {"op": "fill_order", "order_number": 1, "fill_price": 50.5, "fill_quantity": 40},
+            {"op": "fill_order", "id": "b", "fill_price": 1.0, "fill_quantity": 1},
+            {"op": "fill_order", "id": "a", "fill_price": 50.0, "fill_quantity": 1},
+        ])
+        manager = OrderManager(data_folder=self.test_data_folder)
+        summary = self.ingest(manager, batch_size=4, chunk_bytes=64).run(self.commands_path)
+
+        self.assertEqual((summary.lines, summary.orders, summary.fills, summary.errors), (9, 1, 2, 5))
+        with open(self.errors_path) as file:
+            errors = [json.loads(line) for line in file]
+        self.assertEqual([error["line"] for error in errors], [2, 4, 5, 8, 9])
+        self.assertIn("No add_order line", errors[3]["error"])
+        self.assertIn("already completely filled", errors[4]["error"])
+
+        reloaded = OrderManager(data_folder=self.test_data_folder)
+        order = reloaded.get_order(1)
+        self.assertEqual((order.status, order.average_fill_price, order.side.value), (OrderStatus.FILLED, 50.2, "sell"))
+
+    def test_resumes_after_checkpoint(self):
+        """Test that a second run starts after the last committed batch and fills can name earlier ids"""
+        self.write_commands(self.sample_commands(1, 20))
+        manager = OrderManager(data_folder=self.test_data_folder)
+        first = self.ingest(manager, batch_size=15, chunk_bytes=200).run(self.commands_path)
+        self.assertEqual((first.orders, first.fills, first.errors), (20, 40, 0))
+
+        self.write_commands([{"op": "add_order", "id": 21, "ticker_id": 1001, "order_quantity": 1, "order_price": 1.0},
+                             {"op": "fill_order", "id": 3, "fill_price": 1.0, "fill_quantity": 1}], mode='a')
+        manager = OrderManager(data_folder=self.test_data_folder)
+        second = self.ingest(manager).run(self.commands_path)
+        self.assertEqual((second.lines, second.orders, second.fills, second.errors), (2, 1, 0, 1))
+        self.assertEqual(second.resumed_from, os.path.getsize(self.commands_path) - len(
+            '{"op": "add_order", "id": 21, "ticker_id": 1001, "order_quantity": 1, "order_price": 1.0}\n'
+            '{"op": "fill_order", "id": 3, "fill_price": 1.0, "fill_quantity": 1}\n'))
+        self.assertEqual(len(manager.orders), 21)
+
+    def test_unfinished_batch_is_not_applied_twice(self):
+        """Test resuming after the process stopped between applying a batch and moving the checkpoint"""
+        self.write_commands(self.sample_commands(1, 10))
+        manager = OrderManager(data_folder=self.test_data_folder, journal=True)
+
+        # Orders reach the journal, then the process dies before the batch's fills are applied
+        def fail(*args, **kwargs):
+            raise RuntimeError("stopped")
+        manager.fill_orders = fail
+        with self.assertRaises(RuntimeError):
+            self.ingest(manager).run(self.commands_path)
+        manager.close()
+
+        manager = OrderManager(data_folder=self.test_data_folder, journal=True)
+        self.assertEqual(len(manager.orders), 10)
+        summary = self.ingest(manager).run(self.commands_path)
+        self.assertEqual((summary.orders, summary.fills, summary.errors), (0, 20, 0))
+        self.assertEqual(len(manager.orders), 10)
+        self.assertTrue(all(order.status == OrderStatus.FILLED and order.fill_count == 2 for order in manager.orders))
+        manager.close()
+
+        # Everything committed but the checkpoint: nothing is applied again
+        with open(self.checkpoint_path) as file:
+            state = json.load(file)
+        state.update(offset=0, line=0, pending={"end_offset": os.path.getsize(self.commands_path), "end_line": 30,
+                                                "next_order_number": 1, "fill_counts": {}})
+        with open(self.checkpoint_path, 'w') as file:
+            json.dump(state, file)
+        manager = OrderManager(data_folder=self.test_data_folder, journal=True)
+        summary = self.ingest(manager).run(self.commands_path)
+        self.assertEqual((summary.orders, summary.fills, summary.errors), (0, 0, 0))
+        self.assertEqual(sum(order.fill_count for order in manager.orders), 20)
+        manager.close()
+
+    def test_file_order_and_byte_offsets(self):
+        """Test that commands apply in file order and offsets count bytes past non-ASCII and invalid UTF-8 lines"""
+        lines = [
+            json.dumps({"op": "fill_order", "id": "x", "fill_price": 1.0, "fill_quantity": 1}).encode(),
+            json.dumps({"op": "add_order", "id": "x", "ticker_id": 1001, "order_quantity": 2,
+                        "order_price": 1.0}).encode(),
+            b'{"op": "add_order", "id": "\xff\xfe", "ticker_id": 1001, "order_quantity": 1, "order_price": 1.0}',
+            json.dumps({"op": "add_order", "id": "caf\u00e9", "ticker_id": 1001, "order_quantity": 1,
+                        "order_price": 1.0}, ensure_ascii=False).encode(),
+            json.dumps({"op": "fill_order", "id": "x", "fill_price": 1.0, "fill_quantity": 2}).encode(),
+            b'{"op": "fill_order"',
+        ]
+        with open(self.commands_path, 'wb') as file:
+            file.write(b'\n'.join(lines) + b'\n')
+        offsets = [sum(len(line) + 1 for line in lines[:index]) for index in range(len(lines))]
+
+        manager = OrderManager(data_folder=self.test_data_folder)
+        summary = self.ingest(manager).run(self.commands_path)
+        self.assertEqual((summary.orders, summary.fills, summary.errors), (2, 1, 3))
+        with open(self.errors_path) as file:
+            errors = [json.loads(line) for line in file]
+        self.assertEqual([(error["line"], error["offset"]) for error in errors],
+                         [(3, offsets[2]), (6, offsets[5]), (1, offsets[0])])
+        self.assertIn("UnicodeDecodeError", errors[0]["error"])
+        self.assertIn("No add_order line with id 'x'", errors[2]["error"])
+        self.assertEqual(manager.get_order(1).status, OrderStatus.FILLED)
+        with open(self.checkpoint_path) as file:
+            self.assertEqual(json.load(file)["offset"], os.path.getsize(self.commands_path))
+
+    def test_worker_pool_matches_inline_parsing(self):
+        """Test that parsing on worker processes with a small read-ahead gives the same result"""
+        self.write_commands(self.sample_commands(1, 200))
+        manager = OrderManager(data_folder=self.test_data_folder)
+        summary = self.ingest(manager, workers=2, max_pending=2, chunk_bytes=1024, batch_size=100).run(
+            self.commands_path)
+        self.assertEqual((summary.lines, summary.orders, summary.fills, summary.errors), (600, 200, 400, 0))
+        self.assertEqual(len(manager.get_open_orders()), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
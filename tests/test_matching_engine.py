@@ -0,0 +1,131 @@
+import unittest
+import os
+import shutil
+from matching_engine import MatchingEngine
+from order_manager import OrderManager, OrderDetails, OrderSide, OrderStatus
+
+class TestMatchingEngine(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.test_data_folder = "TestData"
+        self.manager = OrderManager(data_folder=self.test_data_folder)
+        self.engine = MatchingEngine(self.manager, batch_size=1)
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        self.manager.close()
+        if os.path.exists(self.test_data_folder):
+            shutil.rmtree(self.test_data_folder)
+
+    def place(self, side, quantity, price, ticker_id=1001):
+        order = self.manager.add_order(OrderDetails(ticker_id=ticker_id, order_quantity=quantity, order_price=price,
+                                                    side=side))
+        return order, self.engine.submit(order)
+
+    def test_price_time_priority(self):
+        """Test that better prices match first, and earlier orders first at the same price"""
+        first, _ = self.place(OrderSide.SELL, 50, 10.10)
+        second, _ = self.place(OrderSide.SELL, 50, 10.00)
+        third, _ = self.place(OrderSide.SELL, 50, 10.00)
+        self.assertEqual(self.engine.best_ask(1001), 10.00)
+
+        buy, matches = self.place(OrderSide.BUY, 120, 10.10)
+        self.assertEqual([(match.sell_order_number, match.price, match.quantity) for match in matches],
+                         [(second.order_number, 10.00, 50), (third.order_number, 10.00, 50),
+                          (first.order_number, 10.10, 20)])
+        self.assertTrue(all(match.buy_order_number == buy.order_number for match in matches))
+
+        # Fills went through the manager
+        self.assertEqual(buy.status, OrderStatus.FILLED)
+        self.assertAlmostEqual(buy.average_fill_price, (10.00 * 100 + 10.10 * 20) / 120)
+        self.assertEqual(second.status, OrderStatus.FILLED)
+        self.assertEqual(first.filled_quantity, 20)
+        self.assertEqual(self.engine.depth(1001), {"bids": [], "asks": [(10.10, 30)]})
+
+    def test_depth_skips_emptied_levels(self):
+        """Test that depth fills its count from deeper levels when better ones were emptied but not yet dropped"""
+        best, _ = self.place(OrderSide.BUY, 10, 10.00)
+        self.place(OrderSide.BUY, 20, 9.90)
+        self.place(OrderSide.BUY, 30, 9.80)
+        self.engine.cancel(best.order_number)
+        self.assertEqual(self.engine.depth(1001, levels=2)["bids"], [(9.90, 20), (9.80, 30)])
+
+    def test_limit_and_resting(self):
+        """Test that orders that don't cross rest in the book"""
+        self.place(OrderSide.BUY, 10, 9.90)
+        _, matches = self.place(OrderSide.SELL, 10, 10.00)
+        self.assertEqual(matches, [])
+        self.assertEqual(self.engine.best_bid(1001), 9.90)
+        self.assertEqual(self.engine.best_ask(1001), 10.00)
+
+        # Books are per ticker
+        _, matches = self.place(OrderSide.SELL, 10, 9.00, ticker_id=1002)
+        self.assertEqual(matches, [])
+
+    def test_market_order_and_cancel(self):
+        """Test that market orders don't rest and cancelled orders are skipped"""
+        cancelled, _ = self.place(OrderSide.BUY, 10, 10.00)
+        kept, _ = self.place(OrderSide.BUY, 10, 9.50)
+        self.assertTrue(self.engine.cancel(cancelled.order_number))
+        self.assertFalse(self.engine.cancel(cancelled.order_number))
+
+        sell = self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=15, order_price=0.0,
+                                                   side=OrderSide.SELL))
+        matches = self.engine.submit(sell, market=True)
+        self.assertEqual([(match.buy_order_number, match.quantity) for match in matches], [(kept.order_number, 10)])
+        self.assertEqual(sell.remaining_quantity, 5)
+        self.assertIsNone(self.engine.best_ask(1001))
+        self.assertEqual(cancelled.filled_quantity, 0)
+
+    def test_market_tick(self):
+        """Test that a market tick fills resting orders up to its quantity"""
+        buy, _ = self.place(OrderSide.BUY, 100, 10.00)
+        matches = self.engine.market_tick(1001, OrderSide.SELL, 9.95, 40)
+        self.assertEqual(matches[0].sell_order_number, None)
+        self.assertEqual(buy.filled_quantity, 40)
+        self.assertEqual(self.engine.market_tick(1001, OrderSide.SELL, 10.05, 40), [])
+
+    def test_batched_fills(self):
+        """Test that fills are held until the batch is full or flushed"""
+        engine = MatchingEngine(self.manager, batch_size=100)
+        sell = self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=10, order_price=10.0,
+                                                   side=OrderSide.SELL))
+        buy = self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=10, order_price=10.0))
+        engine.submit(sell)
+        engine.submit(buy)
+        self.assertEqual(buy.filled_quantity, 0)
+
+        result = engine.flush()
+        self.assertEqual(result.succeeded, 2)
+        self.assertEqual(buy.status, OrderStatus.FILLED)
+        self.assertIsNone(engine.flush())
+
+    def test_resubmit_before_flush(self):
+        """Test that a cancelled order submitted again before a flush only rests what its matches left over"""
+        engine = MatchingEngine(self.manager, batch_size=100)
+        buy = self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=10, order_price=10.0))
+        engine.submit(buy)
+        engine.market_tick(1001, OrderSide.SELL, 10.0, 6)
+        self.assertTrue(engine.cancel(buy.order_number))
+
+        engine.submit(buy)
+        self.assertEqual(engine.depth(1001)["bids"], [(10.0, 4)])
+        matches = engine.market_tick(1001, OrderSide.SELL, 10.0, 10)
+        self.assertEqual([match.quantity for match in matches], [4])
+        with self.assertRaises(ValueError):
+            engine.submit(buy)
+
+        result = engine.flush()
+        self.assertEqual((result.succeeded, len(result.errors)), (2, 0))
+        self.assertEqual((buy.status, buy.filled_quantity), (OrderStatus.FILLED, 10))
+
+    def test_side_round_trip(self):
+        """Test that the side survives saving and loading"""
+        self.place(OrderSide.SELL, 10, 10.0)
+        self.manager.save_orders()
+        manager = OrderManager(data_folder=self.test_data_folder)
+        self.assertEqual(manager.get_order(1).side, OrderSide.SELL)
+        manager.close()
+
+if __name__ == '__main__':
+    unittest.main()
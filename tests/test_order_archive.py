@@ -0,0 +1,87 @@
+import unittest
+import os
+import shutil
+from datetime import datetime, timedelta
+from order_archive import RetentionPolicy
+from order_manager import OrderManager, OrderDetails, OrderStatus
+
+class TestOrderArchive(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.test_data_folder = "TestData"
+        self.policy = RetentionPolicy(max_filled_age_hours=1, check_every=0)
+        self.manager = self.open_manager(journal=True)
+        for ticker_id in (1001, 1002, 1001, 1003):
+            self.manager.add_order(OrderDetails(ticker_id=ticker_id, order_quantity=100, order_price=50.00,
+                                                exchange_id=1))
+        self.manager.fill_order(1, 49.95, 100)
+        self.manager.fill_order(2, 50.05, 40)
+        self.manager.fill_order(3, 50.00, 60)
+        self.manager.fill_order(3, 50.10, 40)
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        self.manager.close()
+        if os.path.exists(self.test_data_folder):
+            shutil.rmtree(self.test_data_folder)
+
+    def open_manager(self, **options) -> OrderManager:
+        options.setdefault("retention", self.policy)
+        return OrderManager(data_folder=self.test_data_folder, **options)
+
+    def later(self) -> datetime:
+        return datetime.now() + timedelta(hours=2)
+
+    def test_filled_orders_archived_by_age(self):
+        """Test that old filled orders leave memory but can still be read"""
+        self.assertEqual(self.manager.archive_orders(), 0)
+        self.assertEqual(self.manager.archive_orders(now=self.later()), 2)
+
+        self.assertEqual([order.order_number for order in self.manager.orders], [2, 4])
+        self.assertEqual([order.order_number for order in self.manager.get_open_orders()], [2, 4])
+        self.assertEqual(self.manager.get_orders_by_status(OrderStatus.FILLED), [])
+        self.assertEqual(self.manager.get_orders_by_ticker(1001), [])
+
+        archived = self.manager.get_order(3)
+        self.assertEqual(archived.status, OrderStatus.FILLED)
+        self.assertEqual(archived.fill_count, 2)
+        summary = self.manager.archive.get_summary(3)
+        self.assertEqual(summary.ticker_id, 1001)
+        self.assertEqual(summary.filled_quantity, 100)
+        self.assertAlmostEqual(summary.average_fill_price, 50.04)
+
+    def test_archived_orders_after_restart(self):
+        """Test that a restart (replaying the journal) leaves archived orders in the archive"""
+        self.manager.archive_orders(now=self.later())
+        self.manager.close()
+
+        self.manager = self.open_manager(journal=True, retention=None)
+        self.assertEqual([order.order_number for order in self.manager.orders], [2, 4])
+        self.assertEqual(self.manager.next_order_number, 5)
+        self.assertEqual(self.manager.get_order(1).filled_quantity, 100)
+
+        self.manager.save_orders()
+        orders_df = self.manager.get_orders_as_dataframe(include_archived=True)
+        self.assertEqual(orders_df["order_number"].tolist(), [1, 2, 3, 4])
+        self.assertEqual(len(self.manager.get_orders_as_dataframe()), 2)
+        self.assertEqual(len(self.manager.get_orders_as_dataframe(ticker_id=1001, include_archived=True)), 2)
+
+        orders_df, fills_df = self.manager.get_order_frames(include_archived=True)
+        self.assertEqual(orders_df["order_number"].tolist(), [1, 2, 3, 4])
+        self.assertEqual(fills_df["order_number"].tolist(), sorted(fills_df["order_number"]))
+        self.assertEqual(len(fills_df), 4)
+
+    def test_max_orders_checked_after_fills(self):
+        """Test that the longest filled orders are archived once too many orders are in memory"""
+        self.manager.close()
+        self.policy = RetentionPolicy(max_filled_age_hours=None, max_orders=2, check_every=1)
+        self.manager = self.open_manager(journal=True)
+        self.assertEqual([order.order_number for order in self.manager.orders], [2, 4])
+
+        self.manager.add_order(OrderDetails(ticker_id=1004, order_quantity=10, order_price=5.00, exchange_id=1))
+        self.manager.fill_orders([(2, 50.00, 60)])
+        self.assertEqual([order.order_number for order in self.manager.orders], [4, 5])
+        self.assertEqual(len(self.manager.archive), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import unittest
+from datetime import datetime
+from order_columns import ColumnarOrderBook
+from order_manager import Order, OrderDetails, OrderStatus
+import numpy as np
+
+class TestColumnarOrderBook(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.book = ColumnarOrderBook(capacity=2, fill_capacity=2)
+
+    def test_add_and_fill(self):
+        """Test that views behave like Order through fills"""
+        view = self.book.add_order(OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00, exchange_id=1, transaction_fee=2.5))
+        self.assertEqual(view.order_number, 1)
+        self.assertEqual(view.status, OrderStatus.OPEN)
+
+        self.book.fill_order(1, 49.00, 60)
+        view.add_fill(51.00, 40)
+        self.assertEqual(view.status, OrderStatus.FILLED)
+        self.assertEqual(view.filled_quantity, 100)
+        self.assertEqual(view.average_fill_price, 49.80)
+        self.assertEqual([fill.fill_quantity for fill in view.fills], [60, 40])
+        self.assertEqual(view.transaction_fee, 2.5)
+        self.assertFalse(view.needs_fills)
+
+        with self.assertRaises(ValueError):
+            self.book.fill_order(1, 50.00, 1)
+
+    def test_overfill_prevention(self):
+        """Test that orders cannot be overfilled"""
+        self.book.add_order(OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00))
+        with self.assertRaises(ValueError):
+            self.book.fill_order(1, 50.00, 101)
+        with self.assertRaises(ValueError):
+            self.book.fill_order(2, 50.00, 1)
+
+    def test_growth_and_interleaved_fills(self):
+        """Test that columns grow and fills stay attached to their orders"""
+        order_numbers = self.book.add_orders(
+            ticker_ids=np.arange(10) % 3, quantities=np.full(10, 10.0), prices=np.full(10, 5.0)
+        )
+        self.assertEqual(list(order_numbers), list(range(1, 11)))
+        for _ in range(5):
+            for order_number in (2, 7, 9):
+                self.book.fill_order(order_number, 5.0, 1)
+
+        self.assertEqual(len(self.book.get_order(7).fills), 5)
+        self.assertEqual(self.book.get_order(7).filled_quantity, 5)
+        self.assertEqual(self.book.get_order(1).fills, [])
+
+    def test_vectorized_queries(self):
+        """Test open order and aggregate queries over the columns"""
+        self.book.add_orders(ticker_ids=[1, 2, 1, 2], quantities=[10, 20, 30, 40], prices=[1, 2, 3, 4], exchange_ids=[1, 1, 2, 2])
+        self.book.fill_order(1, 1.0, 10)
+        self.book.fill_order(4, 4.0, 15)
+
+        self.assertEqual(list(self.book.open_order_numbers()), [2, 3, 4])
+        self.assertEqual([view.order_number for view in self.book.get_open_orders()], [2, 3, 4])
+
+        totals = self.book.aggregate(by="ticker_id")
+        self.assertEqual(list(totals["ticker_id"]), [1, 2])
+        self.assertEqual(list(totals["order_count"]), [2, 2])
+        self.assertEqual(list(totals["filled_quantity"]), [10, 15])
+        self.assertEqual(list(totals["remaining_quantity"]), [30, 45])
+        self.assertEqual(list(totals["fill_notional"]), [10, 60])
+
+        open_totals = self.book.aggregate(by="exchange_id", open_only=True)
+        self.assertEqual(list(open_totals["exchange_id"]), [1, 2])
+        self.assertEqual(list(open_totals["order_count"]), [1, 2])
+
+    def test_records_round_trip(self):
+        """Test converting to and from Order.to_dict records"""
+        order = Order(OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00, transaction_fee=1.0), order_number=1)
+        order.add_fill(49.95, 60, datetime(2025, 6, 15, 12, 1, 36, 669870))
+        records = [order.to_dict()]
+
+        book = ColumnarOrderBook.from_records(records)
+        self.assertEqual(book.to_records(), records)
+
+    def test_records_build_the_same_columns_as_fills(self):
+        """Test that columns built from records match the ones built by adding orders and fills one at a time"""
+        records = []
+        incremental = ColumnarOrderBook()
+        for order_number, fill_quantities in enumerate(([10, 20, 70], [], [5], [40, 60], []), start=1):
+            details = OrderDetails(ticker_id=order_number % 2, order_quantity=100, order_price=5.00)
+            created_at = datetime(2025, 6, 15, 12, order_number)
+            order = Order(details, order_number)
+            order.created_at = created_at
+            incremental.add_order(details, created_at=created_at)
+            for minute, fill_quantity in enumerate(fill_quantities):
+                filled_at = datetime(2025, 6, 15, 13, minute)
+                order.add_fill(4.00 + minute, fill_quantity, filled_at)
+                incremental.fill_order(order_number, 4.00 + minute, fill_quantity, filled_at)
+            records.append(order.to_dict())
+
+        book = ColumnarOrderBook.from_records(records[::-1])
+        self.assertEqual(book.to_records(), records)
+        self.assertEqual(list(book.open_order_numbers()), [2, 3, 5])
+        for name in ColumnarOrderBook.ORDER_COLUMNS:
+            self.assertEqual(list(getattr(book, name)[:5]), list(getattr(incremental, name)[:5]), name)
+        for name in ColumnarOrderBook.FILL_COLUMNS:
+            self.assertEqual(list(getattr(book, name)[:6]), list(getattr(incremental, name)[:6]), name)
+
+        book.fill_order(3, 5.00, 95)
+        self.assertEqual([fill.fill_quantity for fill in book.get_order(3).fills], [5, 95])
+        self.assertEqual(len(ColumnarOrderBook.from_records([])), 0)
+
+
+    def test_gapped_order_numbers(self):
+        """Test that records numbered with gaps, as a stepped or archived manager leaves them, load and round trip"""
+        records = []
+        for order_number in (7, 2, 4):
+            order = Order(OrderDetails(ticker_id=order_number, order_quantity=10, order_price=5.00), order_number)
+            if order_number != 4:
+                order.add_fill(5.00, 10, datetime(2025, 6, 15, 12, 0))
+            records.append(order.to_dict())
+
+        book = ColumnarOrderBook.from_records(records)
+        self.assertEqual([record["order_number"] for record in book.to_records()], [2, 4, 7])
+        self.assertEqual(book.get_order(7).ticker_id, 7)
+        self.assertEqual(list(book.open_order_numbers()), [4])
+        self.assertEqual([order.order_number for order in book.get_open_orders()], [4])
+        with self.assertRaises(ValueError):
+            book.get_order(3)
+
+        book.fill_order(4, 5.00, 10)
+        self.assertEqual(book.get_order(4).status, OrderStatus.FILLED)
+        self.assertEqual(book.next_order_number, 8)
+        with self.assertRaises(ValueError):
+            ColumnarOrderBook.from_records(records + [records[0]])
+
+        stepped = ColumnarOrderBook(order_number_start=3, order_number_step=4)
+        numbers = stepped.add_orders(ticker_ids=[1, 1, 1], quantities=[1, 1, 1], prices=[1, 1, 1])
+        self.assertEqual(list(numbers), [3, 7, 11])
+        self.assertEqual(stepped.get_order(11).order_number, 11)
+        with self.assertRaises(ValueError):
+            stepped.add_orders(ticker_ids=[1], quantities=[1], prices=[1], order_numbers=[11])
+
+
+if __name__ == '__main__':
+    unittest.main()
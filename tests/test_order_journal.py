@@ -0,0 +1,102 @@
+import unittest
+from order_manager import OrderManager, OrderDetails, OrderStatus, JOURNAL_FILENAME
+import os
+import shutil
+
+class TestOrderJournal(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.test_data_folder = "TestData"
+        self.manager = OrderManager(data_folder=self.test_data_folder, journal=True)
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        self.manager.close()
+        if os.path.exists(self.test_data_folder):
+            shutil.rmtree(self.test_data_folder)
+
+    def reopen(self, **kwargs) -> OrderManager:
+        """Closes the current manager and starts a new one on the same folder"""
+        self.manager.close()
+        self.manager = OrderManager(data_folder=self.test_data_folder, journal=True, **kwargs)
+        return self.manager
+
+    def test_replay_without_save(self):
+        """Test that orders and fills survive a restart without calling save_orders"""
+        order = self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00, transaction_fee=2.5))
+        self.manager.add_order(OrderDetails(ticker_id=1002, order_quantity=10, order_price=75.00))
+        self.manager.fill_order(1, 49.95, 60)
+
+        manager = self.reopen()
+        restored = manager.get_order(1)
+        self.assertEqual(restored.created_at, order.created_at)
+        self.assertEqual(restored.filled_quantity, 60)
+        self.assertEqual(restored.fills[0].filled_at, order.fills[0].filled_at)
+        self.assertEqual(restored.transaction_fee, 2.5)
+        self.assertEqual(restored.status, OrderStatus.PARTIALLY_FILLED)
+        self.assertEqual(manager.next_order_number, 3)
+
+    def test_compaction(self):
+        """Test that compaction empties the journal and keeps the state"""
+        self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00))
+        self.manager.fill_order(1, 49.95, 60)
+        self.manager.compact()
+
+        journal_path = os.path.join(self.test_data_folder, JOURNAL_FILENAME)
+        self.assertEqual(os.path.getsize(journal_path), 0)
+
+        # Events after the snapshot are replayed on top of it
+        self.manager.fill_order(1, 50.05, 40)
+        manager = self.reopen()
+        self.assertEqual(manager.get_order(1).status, OrderStatus.FILLED)
+        self.assertEqual(manager.get_order(1).fill_count, 2)
+
+    def test_replay_over_newer_snapshot(self):
+        """Test that events already in the snapshot are not applied twice"""
+        self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00))
+        self.manager.fill_order(1, 49.95, 60)
+        self.manager.save_orders()
+
+        manager = self.reopen()
+        self.assertEqual(len(manager.orders), 1)
+        self.assertEqual(manager.get_order(1).fill_count, 1)
+
+    def test_periodic_snapshot(self):
+        """Test that snapshot_every compacts the journal automatically"""
+        manager = self.reopen(snapshot_every=3, fsync_every=2)
+        manager.add_order(OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00))
+        manager.fill_order(1, 49.95, 10)
+        self.assertEqual(manager.journal.events_since_snapshot, 2)
+        manager.fill_order(1, 49.95, 10)
+        self.assertEqual(manager.journal.events_since_snapshot, 0)
+        self.assertTrue(os.path.exists(os.path.join(self.test_data_folder, "orders.json")))
+
+    def test_batches_are_journaled(self):
+        """Test that batch calls journal their changes in one write"""
+        self.manager.add_orders([OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00)] * 3)
+        self.manager.fill_orders([(1, 50.00, 100), (2, 50.00, 10), (9, 50.00, 10)])
+        self.assertEqual(self.manager.journal.events_since_snapshot, 5)
+
+        manager = self.reopen()
+        self.assertEqual(len(manager.orders), 3)
+        self.assertEqual(manager.get_order(1).status, OrderStatus.FILLED)
+        self.assertEqual(manager.get_order(2).filled_quantity, 10)
+
+    def test_torn_last_line_is_ignored(self):
+        """Test that a partially written last event doesn't stop the load"""
+        self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00))
+        self.manager.close()
+        with open(os.path.join(self.test_data_folder, JOURNAL_FILENAME), 'a') as file:
+            file.write('{"event":"fill_added","order_nu')
+
+        manager = self.reopen()
+        self.assertEqual(manager.get_order(1).fill_count, 0)
+
+        # Events written after the torn line are still replayed
+        manager.fill_order(1, 50.00, 10)
+        manager = self.reopen()
+        self.assertEqual(manager.get_order(1).fill_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import io
+import json
+import logging
+import os
+import shutil
+from order_logging import LogSampler, configure_logging, log_event, log_timing
+from order_manager import OrderManager, OrderDetails
+
+class CountingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+class TestOrderLogging(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.test_data_folder = "TestData"
+        self.logger = logging.getLogger("test_order_logging")
+        self.handler = CountingHandler()
+        self.logger.addHandler(self.handler)
+        self.logger.setLevel(logging.INFO)
+        self.root_handlers = logging.getLogger().handlers[:]
+        self.root_level = logging.getLogger().level
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        self.logger.removeHandler(self.handler)
+        logging.getLogger().handlers = self.root_handlers
+        logging.getLogger().setLevel(self.root_level)
+        if os.path.exists(self.test_data_folder):
+            shutil.rmtree(self.test_data_folder)
+
+    def test_structured_formatter(self):
+        """Test that events are written as JSON with their fields"""
+        stream = io.StringIO()
+        configure_logging(logging.INFO, structured=True, stream=stream)
+        log_event(logging.getLogger("orders"), logging.INFO, "orders_loaded", count=3, elapsed_ms=1.5)
+
+        entry = json.loads(stream.getvalue())
+        self.assertEqual(entry["event"], "orders_loaded")
+        self.assertEqual(entry["count"], 3)
+        self.assertEqual(entry["elapsed_ms"], 1.5)
+        self.assertEqual(entry["level"], "INFO")
+
+    def test_log_event_skips_disabled_levels(self):
+        """Test that nothing is formatted when the level is disabled"""
+        class Unformattable:
+            def __str__(self):
+                raise AssertionError("field was formatted")
+
+        log_event(self.logger, logging.DEBUG, "fill_added", value=Unformattable())
+        self.assertEqual(self.handler.records, [])
+
+        log_event(self.logger, logging.INFO, "fill_added", order_number=7)
+        self.assertEqual(self.handler.records[0].getMessage(), "fill_added order_number=7")
+
+    def test_log_sampler(self):
+        """Test that a sampler logs the first and every Nth event"""
+        sample = LogSampler(self.logger, "order_added", every=10)
+        for _ in range(25):
+            sample()
+
+        self.assertEqual([record.fields["count"] for record in self.handler.records], [1, 10, 20])
+
+    def test_log_timing(self):
+        """Test that a timed block logs a single summary with its fields"""
+        with log_timing(self.logger, "orders_added_in_batch") as fields:
+            fields["count"] = 5
+
+        self.assertEqual(len(self.handler.records), 1)
+        self.assertEqual(self.handler.records[0].fields["count"], 5)
+        self.assertIn("elapsed_ms", self.handler.records[0].fields)
+
+    def test_load_logs_one_summary(self):
+        """Test that loading many orders logs a summary rather than a line per order"""
+        manager = OrderManager(data_folder=self.test_data_folder)
+        manager.add_orders([OrderDetails(ticker_id=1001, order_quantity=10, order_price=5.0) for _ in range(200)],
+                           save=True)
+        manager.close()
+
+        handler = CountingHandler()
+        manager_logger = logging.getLogger("order_manager")
+        manager_logger.addHandler(handler)
+        previous_level = manager_logger.level
+        manager_logger.setLevel(logging.INFO)
+        try:
+            OrderManager(data_folder=self.test_data_folder).close()
+        finally:
+            manager_logger.removeHandler(handler)
+            manager_logger.setLevel(previous_level)
+
+        events = [getattr(record, "event", None) for record in handler.records]
+        self.assertEqual(events.count("orders_loaded"), 1)
+        self.assertLessEqual(len(handler.records), 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,7 @@
 # tests/test_order_manager.py
 import unittest
 from order_manager import OrderManager, OrderDetails, OrderStatus
+import importlib.util
 import os
 import shutil
 
@@ -63,6 +64,29 @@ class TestOrderManager(unittest.TestCase):
 
         self.assertEqual(order.average_fill_price, 49.80)
 
+    def test_running_fill_totals_match_recomputation(self):
+        """Test that the running fill totals agree with re-summing the fills"""
+        details = OrderDetails(ticker_id=1001, order_quantity=1000, order_price=50.00)
+        order = self.manager.add_order(details)
+
+        for idx in range(1, 40):
+            self.manager.fill_order(1, 50.00 + idx * 0.013, 25)
+
+        expected_quantity = sum(fill.fill_quantity for fill in order.fills)
+        expected_notional = sum(fill.fill_price * fill.fill_quantity for fill in order.fills)
+        self.assertEqual(order.filled_quantity, expected_quantity)
+        self.assertEqual(order.fill_notional, expected_notional)
+        self.assertEqual(order.average_fill_price, expected_notional / expected_quantity)
+        self.assertEqual(order.remaining_quantity, 1000 - expected_quantity)
+        self.assertEqual(order.fill_count, len(order.fills))
+        self.assertEqual(order.first_fill_at, order.fills[0].filled_at)
+        self.assertEqual(order.last_fill_at, order.fills[-1].filled_at)
+
+        # Rebuilding from the fills list gives the same totals
+        order._rebuild_fill_totals()
+        self.assertEqual(order.filled_quantity, expected_quantity)
+        self.assertEqual(order.fill_notional, expected_notional)
+
     def test_overfill_prevention(self):
         """Test that orders cannot be overfilled"""
         details = OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00)
@@ -115,7 +139,150 @@ class TestOrderManager(unittest.TestCase):
         file_path = os.path.join(self.test_data_folder, "test_orders.json")
         self.assertTrue(os.path.exists(file_path))
 
-        
+    def test_order_numbers_survive_reload(self):
+        """Test that loaded orders keep their order numbers"""
+        self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00, transaction_fee=1.5))
+        self.manager.add_order(OrderDetails(ticker_id=1002, order_quantity=200, order_price=75.00))
+        self.manager.fill_order(2, 75.00, 50)
+        self.manager.save_orders("test_orders.json")
+
+        reloaded = OrderManager(data_folder=self.test_data_folder)
+        reloaded.load_orders("test_orders.json")
+
+        order = reloaded.get_order(2)
+        self.assertEqual(order.order_number, 2)
+        self.assertEqual(order.ticker_id, 1002)
+        self.assertEqual(order.filled_quantity, 50)
+        self.assertEqual(reloaded.get_order(1).transaction_fee, 1.5)
+        self.assertEqual(reloaded.next_order_number, 3)
+
+    def test_fill_times_survive_reload(self):
+        """Test that loaded fills keep the time they were filled rather than the time they were loaded"""
+        self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00))
+        self.manager.fill_order(1, 49.95, 60)
+        self.manager.fill_order(1, 50.00, 40)
+        filled_at = [fill.filled_at for fill in self.manager.get_order(1).fills]
+        self.manager.save_orders("test_orders.json")
+
+        reloaded = OrderManager(data_folder=self.test_data_folder)
+        reloaded.load_orders("test_orders.json")
+        order = reloaded.get_order(1)
+        self.assertEqual([fill.filled_at for fill in order.fills], filled_at)
+        self.assertEqual(order.last_fill_at, filled_at[-1])
+
+    def test_secondary_indexes(self):
+        """Test lookups by ticker, exchange and status"""
+        order1 = self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00, exchange_id=1))
+        order2 = self.manager.add_order(OrderDetails(ticker_id=1002, order_quantity=100, order_price=50.00, exchange_id=1))
+        order3 = self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00, exchange_id=2))
+
+        self.assertEqual(self.manager.get_orders_by_ticker(1001), [order1, order3])
+        self.assertEqual(self.manager.get_orders_by_exchange(1), [order1, order2])
+        self.assertEqual(self.manager.get_orders_by_ticker(9999), [])
+
+        self.manager.fill_order(1, 50.00, 40)
+        self.manager.fill_order(3, 50.00, 100)
+        self.assertEqual(self.manager.get_orders_by_status(OrderStatus.OPEN), [order2])
+        self.assertEqual(self.manager.get_orders_by_status(OrderStatus.PARTIALLY_FILLED), [order1])
+        self.assertEqual(self.manager.get_orders_by_status(OrderStatus.FILLED), [order3])
+        self.assertEqual(self.manager.get_open_orders(), [order1, order2])
+
+    def test_dataframe_filters(self):
+        """Test filtering the saved orders data frame"""
+        self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00, exchange_id=1))
+        self.manager.add_order(OrderDetails(ticker_id=1002, order_quantity=100, order_price=50.00, exchange_id=1))
+        self.manager.fill_order(2, 50.00, 100)
+        self.manager.save_orders()
+
+        orders_df = self.manager.get_orders_as_dataframe(ticker_id=1002)
+        self.assertEqual(list(orders_df['order_number']), [2])
+        orders_df = self.manager.get_orders_as_dataframe(exchange_id=1, status=OrderStatus.OPEN)
+        self.assertEqual(list(orders_df['order_number']), [1])
+
+    def test_order_frames(self):
+        """Test building flat order and fill frames from memory"""
+        self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00, exchange_id=1))
+        self.manager.add_order(OrderDetails(ticker_id=1002, order_quantity=100, order_price=50.00, exchange_id=1))
+        self.manager.fill_order(1, 49.00, 60)
+        self.manager.fill_order(1, 51.00, 40)
+        self.manager.fill_order(2, 50.00, 10)
+
+        orders_df, fills_df = self.manager.get_order_frames()
+        self.assertEqual(list(orders_df['order_number']), [1, 2])
+        self.assertEqual(list(orders_df['status']), ["Filled", "Partially Filled"])
+        self.assertEqual(list(orders_df['average_fill_price']), [49.80, 50.00])
+        self.assertEqual(list(fills_df['order_number']), [1, 1, 2])
+
+        # Fills aggregate directly against the orders frame
+        filled = fills_df.groupby('order_number')['fill_quantity'].sum()
+        self.assertEqual(list(filled), list(orders_df['filled_quantity']))
+
+        orders_df, fills_df = OrderManager(data_folder=os.path.join(self.test_data_folder, "empty")).get_order_frames()
+        self.assertTrue(orders_df.empty)
+        self.assertTrue(fills_df.empty)
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "pyarrow is not installed")
+    def test_export_orders(self):
+        """Test exporting orders and fills to Parquet and Arrow"""
+        import pandas as pd
+        import pyarrow.parquet as pq
+
+        self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00, exchange_id=1))
+        self.manager.fill_order(1, 49.00, 60)
+
+        orders_path, fills_path = self.manager.export_orders("parquet")
+        self.assertTrue(str(pq.read_table(orders_path).schema.field('status').type).startswith("dictionary"))
+        self.assertEqual(pd.read_parquet(orders_path)['status'].dtype.name, "category")
+        self.assertEqual(len(pd.read_parquet(fills_path)), 1)
+
+        orders_path, fills_path = self.manager.export_orders("arrow")
+        self.assertEqual(list(pd.read_feather(orders_path)['order_number']), [1])
+
+    def test_add_orders_batch(self):
+        """Test adding a batch of orders with per item errors"""
+        result = self.manager.add_orders([
+            OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00),
+            OrderDetails(ticker_id=1002, order_quantity=0, order_price=50.00),
+            "not an order",
+            OrderDetails(ticker_id=1003, order_quantity=10, order_price=5.00),
+        ])
+
+        self.assertEqual(result.succeeded, 2)
+        self.assertEqual(sorted(result.errors), [1, 2])
+        self.assertIsNone(result.results[1])
+        self.assertEqual([order.order_number for order in self.manager.orders], [1, 2])
+        self.assertEqual(result.results[3].ticker_id, 1003)
+        self.assertEqual(self.manager.next_order_number, 3)
+
+    def test_fill_orders_batch(self):
+        """Test applying a batch of fills with per item errors"""
+        self.manager.add_orders([
+            OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00),
+            OrderDetails(ticker_id=1002, order_quantity=10, order_price=5.00),
+        ])
+
+        result = self.manager.fill_orders([
+            (1, 49.00, 60),
+            (1, 51.00, 50),  # More than the 40 left after the first fill
+            (1, 51.00, 40),
+            (1, 51.00, 1),   # Already filled
+            (3, 5.00, 1),    # No such order
+            (2, 5.00, -1),
+            (2, 5.00, 4),
+        ], save=True)
+
+        self.assertEqual(result.succeeded, 3)
+        self.assertEqual(sorted(result.errors), [1, 3, 4, 5])
+        self.assertEqual(self.manager.get_order(1).average_fill_price, 49.80)
+        self.assertEqual(self.manager.get_order(1).status, OrderStatus.FILLED)
+        self.assertEqual(self.manager.get_order(2).filled_quantity, 4)
+        self.assertTrue(os.path.exists(os.path.join(self.test_data_folder, "orders.json")))
+
+    def test_get_missing_order(self):
+        """Test that unknown order numbers raise"""
+        with self.assertRaises(ValueError):
+            self.manager.get_order(42)
+
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
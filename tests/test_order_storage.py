@@ -0,0 +1,258 @@
+import unittest
+import sqlite3
+from order_manager import OrderManager, OrderDetails, OrderSide, OrderStatus
+from order_storage import JsonOrderStorage, SQLiteOrderStorage, _iter_json_array
+import io
+import json
+import os
+import shutil
+
+class TestJsonOrderStorage(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.test_data_folder = "TestData"
+        self.manager = OrderManager(data_folder=self.test_data_folder)
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        if os.path.exists(self.test_data_folder):
+            shutil.rmtree(self.test_data_folder)
+
+    def add_sample_orders(self, filename: str) -> None:
+        self.manager = OrderManager(data_folder=self.test_data_folder)
+        self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00))
+        self.manager.add_order(OrderDetails(ticker_id=1002, order_quantity=200, order_price=75.00))
+        self.manager.add_order(OrderDetails(ticker_id=1003, order_quantity=300, order_price=51.00))
+        self.manager.fill_order(1, 49.95, 100)
+        self.manager.fill_order(2, 75.00, 50)
+        self.manager.save_orders(filename)
+
+    def open_lazy(self, filename: str) -> OrderManager:
+        manager = OrderManager(data_folder=self.test_data_folder, storage=JsonOrderStorage(self.test_data_folder, lazy=True))
+        manager.load_orders(filename)
+        return manager
+
+    def test_streaming_parser_across_chunks(self):
+        """Test that the array parser handles elements split across chunk boundaries"""
+        records = [{"order_number": idx, "fills": [{"fill_price": 1.5, "note": "a, ]"}] * idx} for idx in range(1, 30)]
+        for chunk_size in (1, 7, 64, 1 << 16):
+            for text in (json.dumps(records), json.dumps(records, indent=4)):
+                parsed = list(_iter_json_array(io.StringIO(text), chunk_size=chunk_size))
+                self.assertEqual(parsed, records)
+
+        self.assertEqual(list(_iter_json_array(io.StringIO("[]"))), [])
+        with self.assertRaises(ValueError):
+            list(_iter_json_array(io.StringIO('[{"order_number": 1}')))
+
+    def test_json_lines_round_trip(self):
+        """Test saving and loading a JSON Lines orders file"""
+        self.add_sample_orders("orders.jsonl")
+
+        with open(os.path.join(self.test_data_folder, "orders.jsonl")) as file:
+            self.assertEqual(len(file.readlines()), 3)
+
+        manager = OrderManager(data_folder=self.test_data_folder)
+        manager.load_orders("orders.jsonl")
+        self.assertEqual(len(manager.orders), 3)
+        self.assertEqual(manager.get_order(2).filled_quantity, 50)
+
+    def test_lazy_mode(self):
+        """Test that lazy mode keeps only open orders and pages filled ones in"""
+        for filename in ("orders.jsonl", "lazy_orders.json"):
+            self.add_sample_orders(filename)
+            manager = self.open_lazy(filename)
+
+            self.assertEqual([order.order_number for order in manager.orders], [2, 3])
+            self.assertEqual(manager.next_order_number, 4)
+            self.assertEqual(manager.get_order(1).status, OrderStatus.FILLED)
+            self.assertEqual(manager.get_order(1).average_fill_price, 49.95)
+
+    def test_lazy_page_in_is_not_a_change(self):
+        """Test that paging an order in keeps the indexes in order and doesn't mark the order as changed"""
+        self.add_sample_orders("orders.jsonl")
+        manager = self.open_lazy("orders.jsonl")
+        revision = manager.revision
+
+        self.assertEqual(manager.get_order(1).status, OrderStatus.FILLED)
+        self.assertEqual(manager.changed_orders_since(revision), (revision, []))
+        self.assertEqual(manager.append_orders("orders.jsonl"), 0)
+        self.assertEqual([order.order_number for order in manager.orders], [1, 2, 3])
+        exchange_id = manager.get_order(2).exchange_id
+        self.assertEqual([order.order_number for order in manager.get_orders_by_exchange(exchange_id)], [1, 2, 3])
+        self.assertEqual([order.order_number for order in manager.get_orders_by_status(OrderStatus.FILLED)], [1])
+
+    def test_lazy_save_keeps_orders_on_disk(self):
+        """Test that saving in lazy mode keeps filled orders that were never paged in"""
+        self.add_sample_orders("orders.jsonl")
+        manager = self.open_lazy("orders.jsonl")
+        manager.fill_order(3, 51.00, 300)
+        manager.add_order(OrderDetails(ticker_id=1004, order_quantity=10, order_price=5.00))
+        manager.save_orders("orders.jsonl")
+
+        manager = self.open_lazy("orders.jsonl")
+        self.assertEqual([order.order_number for order in manager.orders], [2, 4])
+        self.assertEqual(manager.get_order(1).filled_quantity, 100)
+        self.assertEqual(manager.get_order(3).status, OrderStatus.FILLED)
+
+    def test_append_writes_only_changes(self):
+        """Test that append_orders adds only changed orders and readers keep the last copy"""
+        for filename in ("orders.json", "orders.jsonl"):
+            shutil.rmtree(self.test_data_folder)
+            self.add_sample_orders(filename)
+            manager = OrderManager(data_folder=self.test_data_folder)
+            manager.load_orders(filename)
+            self.assertEqual(manager.append_orders(filename), 0)
+
+            manager.fill_order(2, 75.00, 150)
+            manager.add_order(OrderDetails(ticker_id=1004, order_quantity=10, order_price=5.00))
+            self.assertEqual(manager.append_orders(filename), 2)
+            self.assertEqual(len(list(manager.storage._iter_records(filename))), 5)
+
+            manager = OrderManager(data_folder=self.test_data_folder)
+            manager.load_orders(filename)
+            self.assertEqual(sorted(order.order_number for order in manager.orders), [1, 2, 3, 4])
+            self.assertEqual(manager.get_order(2).status, OrderStatus.FILLED)
+            self.assertEqual(manager.next_order_number, 5)
+            self.assertEqual(len(manager.get_orders_as_dataframe(filename)), 4)
+
+            manager.storage.compact_appended(filename)
+            self.assertEqual(len(list(manager.storage._iter_records(filename))), 4)
+            self.assertFalse(os.path.exists(os.path.join(self.test_data_folder, filename + ".appended")))
+            if filename.endswith(".json"):
+                with open(os.path.join(self.test_data_folder, filename)) as file:
+                    self.assertEqual(len(json.load(file)), 4)
+
+    def test_reload_after_append_keeps_order(self):
+        """Test that appended copies are read back at their order's place, not after the other orders"""
+        for filename in ("orders.json", "orders.jsonl"):
+            shutil.rmtree(self.test_data_folder)
+            self.add_sample_orders(filename)
+            self.manager.fill_order(2, 75.00, 150)
+            self.manager.add_order(OrderDetails(ticker_id=1004, order_quantity=10, order_price=5.00))
+            self.manager.append_orders(filename)
+
+            manager = OrderManager(data_folder=self.test_data_folder)
+            manager.load_orders(filename)
+            self.assertEqual([order.order_number for order in manager.orders], [1, 2, 3, 4])
+            self.assertEqual(manager.get_order(2).status, OrderStatus.FILLED)
+            self.assertEqual(manager.get_orders_as_dataframe(filename)["order_number"].tolist(), [1, 2, 3, 4])
+
+        manager = self.open_lazy("orders.jsonl")
+        manager.fill_order(3, 51.00, 300)
+        manager.save_orders("orders.jsonl")
+        self.assertEqual([order_data["order_number"] for _, order_data in manager.storage._iter_records("orders.jsonl")],
+                         [1, 2, 3, 4])
+        self.assertEqual(manager.storage.read_order("orders.jsonl", 2)["status"], OrderStatus.FILLED.value)
+
+    def test_lazy_append_pages_in_last_copy(self):
+        """Test that lazy mode finds filled orders by their appended copy"""
+        self.add_sample_orders("orders.jsonl")
+        manager = self.open_lazy("orders.jsonl")
+        manager.fill_order(2, 75.00, 150)
+        manager.append_orders("orders.jsonl")
+        self.assertEqual(manager.storage.read_order("orders.jsonl", 2)["status"], OrderStatus.FILLED.value)
+
+        manager = self.open_lazy("orders.jsonl")
+        self.assertEqual([order.order_number for order in manager.orders], [3])
+        self.assertEqual(manager.get_order(2).filled_quantity, 200)
+
+
+class TestSQLiteOrderStorage(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.test_data_folder = "TestData"
+        os.makedirs(self.test_data_folder, exist_ok=True)
+        self.manager = OrderManager(data_folder=self.test_data_folder, storage=SQLiteOrderStorage(self.test_data_folder))
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        self.manager.close()
+        if os.path.exists(self.test_data_folder):
+            shutil.rmtree(self.test_data_folder)
+
+    def reopen(self) -> OrderManager:
+        """Closes the current manager and starts a new one on the same database"""
+        self.manager.close()
+        self.manager = OrderManager(data_folder=self.test_data_folder, storage=SQLiteOrderStorage(self.test_data_folder))
+        return self.manager
+
+    def add_sample_orders(self) -> None:
+        self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00, exchange_id=1))
+        self.manager.add_order(OrderDetails(ticker_id=1002, order_quantity=200, order_price=75.00, exchange_id=2, transaction_fee=1.0))
+        self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=300, order_price=51.00, exchange_id=2))
+        self.manager.fill_order(1, 49.95, 100)
+        self.manager.fill_order(2, 75.00, 50)
+        self.manager.save_orders()
+
+    def test_wal_mode(self):
+        """Test that the database runs in WAL mode"""
+        mode = self.manager.storage.connection.execute("PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+
+    def test_only_open_orders_loaded(self):
+        """Test that startup only materializes orders that still need fills"""
+        self.add_sample_orders()
+        manager = self.reopen()
+
+        self.assertEqual([order.order_number for order in manager.orders], [2, 3])
+        self.assertEqual(manager.next_order_number, 4)
+        self.assertEqual(manager.get_order(2).filled_quantity, 50)
+        self.assertEqual(manager.get_order(2).transaction_fee, 1.0)
+
+        # Filled orders are read on demand
+        order = manager.get_order(1)
+        self.assertEqual(order.status, OrderStatus.FILLED)
+        self.assertEqual(order.average_fill_price, 49.95)
+        with self.assertRaises(ValueError):
+            manager.get_order(99)
+
+    def test_save_upserts_changes(self):
+        """Test that saving again updates orders and adds only new fills"""
+        self.add_sample_orders()
+        manager = self.reopen()
+        manager.fill_order(2, 76.00, 150)
+        manager.save_orders()
+
+        fill_count = manager.storage.connection.execute("SELECT COUNT(*) FROM fills WHERE order_number = 2").fetchone()[0]
+        self.assertEqual(fill_count, 2)
+        manager = self.reopen()
+        self.assertEqual([order.order_number for order in manager.orders], [3])
+        self.assertEqual(manager.get_order(2).status, OrderStatus.FILLED)
+
+    def test_side_column_added_to_old_databases(self):
+        """Test that databases from before orders had a side get the column, with existing orders as buys"""
+        self.manager.close()
+        connection = sqlite3.connect(os.path.join(self.test_data_folder, "orders.db"))
+        connection.execute("ALTER TABLE orders DROP COLUMN side")
+        connection.execute(
+            "INSERT INTO orders (order_number, ticker_id, exchange_id, original_quantity, order_price, transaction_fee, "
+            "created_at, status, filled_quantity, average_fill_price) "
+            "VALUES (1, 1001, 1, 10, 5.0, 0, '2024-01-02 03:04:05', 'Open', 0, 0)"
+        )
+        connection.commit()
+        connection.close()
+
+        manager = self.reopen()
+        self.assertEqual(manager.get_order(1).side, OrderSide.BUY)
+        manager.add_order(OrderDetails(ticker_id=1001, order_quantity=10, order_price=5.0, side=OrderSide.SELL))
+        manager.save_orders()
+        self.assertEqual(self.reopen().get_order(2).side, OrderSide.SELL)
+
+    def test_dataframe_filters(self):
+        """Test that the data frame export is filtered in SQL"""
+        self.add_sample_orders()
+
+        orders_df = self.manager.get_orders_as_dataframe()
+        self.assertEqual(list(orders_df['order_number']), [1, 2, 3])
+        self.assertEqual(len(orders_df.loc[0, 'fills']), 1)
+
+        orders_df = self.manager.get_orders_as_dataframe(ticker_id=1001, exchange_id=2)
+        self.assertEqual(list(orders_df['order_number']), [3])
+
+        orders_df = self.manager.get_orders_as_dataframe(status=OrderStatus.PARTIALLY_FILLED)
+        self.assertEqual(list(orders_df['order_number']), [2])
+        self.assertEqual(orders_df.loc[0, 'remaining_quantity'], 150)
+
+
+if __name__ == '__main__':
+    unittest.main()
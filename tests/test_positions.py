@@ -0,0 +1,123 @@
+import unittest
+import os
+import shutil
+from order_archive import RetentionPolicy
+from order_manager import OrderManager, OrderDetails, OrderSide
+from order_storage import JsonOrderStorage, SQLiteOrderStorage
+from positions import PositionBook
+
+
+class TestPositionBook(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.test_data_folder = "TestData"
+        self.manager = OrderManager(data_folder=self.test_data_folder)
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        if os.path.exists(self.test_data_folder):
+            shutil.rmtree(self.test_data_folder)
+
+    def trade(self, side: OrderSide, quantity: float, price: float, fee: float = 0.0) -> None:
+        order = self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=quantity, order_price=price,
+                                                    exchange_id=1, transaction_fee=fee, side=side))
+        self.manager.fill_order(order.order_number, price, quantity)
+
+    def test_lot_methods(self):
+        """Test that a sell relieves lots oldest first, newest first or highest priced first"""
+        expected = {"fifo": 100 * 5.0 + 50 * -5.0, "lifo": 100 * 10.0 + 50 * -5.0, "hifo": 100 * -5.0 + 50 * 5.0}
+        for method, realized in expected.items():
+            book = PositionBook(method)
+            book.apply(1001, 1, OrderSide.BUY, 50.0, 100)
+            book.apply(1001, 1, OrderSide.BUY, 60.0, 100)
+            book.apply(1001, 1, OrderSide.BUY, 45.0, 100)
+            self.assertEqual(book.apply(1001, 1, OrderSide.SELL, 55.0, 150), realized)
+
+            position = book.get(1001, 1)
+            self.assertEqual(position.quantity, 150)
+            self.assertAlmostEqual(position.cost_basis, 15500.0 - (150 * 55.0 - realized))
+            self.assertEqual(sum(lot.quantity for lot in book.lots(1001, 1)), 150)
+
+    def test_short_and_flip(self):
+        """Test that selling through a long position opens a short one that buys close"""
+        book = PositionBook()
+        book.apply(1001, 1, OrderSide.BUY, 10.0, 100)
+        self.assertEqual(book.apply(1001, 1, OrderSide.SELL, 12.0, 150), 200.0)
+
+        position = book.get(1001, 1)
+        self.assertEqual(position.quantity, -50)
+        self.assertEqual(position.average_cost, 12.0)
+        self.assertEqual(book.lots(1001, 1)[0].quantity, -50)
+
+        self.assertEqual(book.apply(1001, 1, OrderSide.BUY, 11.0, 50), 50.0)
+        position = book.get(1001, 1)
+        self.assertEqual((position.quantity, position.cost_basis, position.lot_count), (0, 0.0, 0))
+        self.assertEqual(position.realized_pnl, 250.0)
+        self.assertIsNone(book.get(1002, 1))
+
+    def test_follows_manager_fills(self):
+        """Test that attaching replays earlier fills, follows new ones, and charges each fee once"""
+        self.trade(OrderSide.BUY, 100, 50.0, fee=1.0)
+        book = PositionBook.for_manager(self.manager)
+        self.assertEqual(book.get(1001, 1).quantity, 100)
+
+        order = self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=60, order_price=55.0,
+                                                    exchange_id=1, transaction_fee=2.0, side=OrderSide.SELL))
+        self.manager.fill_orders([(order.order_number, 55.0, 30), (order.order_number, 56.0, 30)])
+
+        position = book.get(1001, 1)
+        self.assertEqual(position.quantity, 40)
+        self.assertEqual(position.average_cost, 50.0)
+        self.assertEqual(position.realized_pnl, 30 * 5.0 + 30 * 6.0)
+        self.assertEqual(position.fees, 3.0)
+        self.assertEqual(position.net_realized_pnl, 327.0)
+        self.assertEqual(position.fill_count, 3)
+
+        book.detach()
+        self.trade(OrderSide.SELL, 40, 60.0)
+        self.assertEqual(book.get(1001, 1).quantity, 40)
+
+    def test_replay_includes_archived_orders(self):
+        """Test that fills of orders moved to the archive are part of the replayed history"""
+        self.manager = OrderManager(data_folder=self.test_data_folder,
+                                    retention=RetentionPolicy(max_filled_age_hours=None, max_orders=1))
+        self.trade(OrderSide.BUY, 100, 10.0)
+        self.trade(OrderSide.BUY, 100, 20.0)
+        self.manager.archive_orders()
+        self.assertEqual(len(self.manager.archive), 1)
+
+        position = PositionBook.for_manager(self.manager).get(1001, 1)
+        self.assertEqual(position.quantity, 200)
+        self.assertEqual(position.average_cost, 15.0)
+
+
+    def test_replay_streams_lazy_storage_once(self):
+        """Test that filled orders left on disk by lazy storage are replayed from one pass over the saved orders"""
+        for storage_class, kwargs, filename in ((JsonOrderStorage, {"lazy": True}, "orders.json"),
+                                                (SQLiteOrderStorage, {}, "orders.json")):
+            os.makedirs(self.test_data_folder, exist_ok=True)
+            self.manager = OrderManager(data_folder=self.test_data_folder,
+                                        storage=storage_class(self.test_data_folder, **kwargs))
+            for _ in range(3):
+                self.trade(OrderSide.BUY, 100, 10.0)
+            self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=100, order_price=10.0, exchange_id=1))
+            self.manager.save_orders(filename)
+            self.manager.close()
+
+            storage = storage_class(self.test_data_folder, **kwargs)
+            self.manager = OrderManager(data_folder=self.test_data_folder, storage=storage)
+            self.assertEqual(len(self.manager.orders), 1)
+            passes = []
+            iter_orders = storage.iter_orders
+            storage.iter_orders = lambda filename: passes.append(filename) or iter_orders(filename)
+            storage.read_order = None # Fails if an order is read one by one
+
+            position = PositionBook.for_manager(self.manager).get(1001, 1)
+            self.assertEqual((position.quantity, position.fill_count), (300, 3))
+            self.assertEqual(passes, [filename])
+            self.manager.close()
+            shutil.rmtree(self.test_data_folder)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import unittest
+import os
+import shutil
+from datetime import datetime, timedelta
+from fake_broker import FakeBroker, broker_record
+from order_manager import OrderManager, OrderDetails, OrderStatus
+from reconcile import BrokerError, HttpBrokerAdapter, Reconciler
+
+
+class TestReconciler(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.test_data_folder = "TestData"
+        self.manager = OrderManager(data_folder=self.test_data_folder)
+        self.start = datetime(2024, 5, 1, 9, 30)
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        if os.path.exists(self.test_data_folder):
+            shutil.rmtree(self.test_data_folder)
+
+    def add_orders(self, count: int, step: timedelta = timedelta(minutes=1)) -> list:
+        orders = self.manager.add_orders([OrderDetails(ticker_id=1001, order_quantity=100, order_price=50.00)
+                                          for _ in range(count)]).results
+        for index, order in enumerate(orders):
+            order.created_at = self.start + step * index
+        return orders
+
+    def test_applies_missing_fills_and_reports_differences(self):
+        """Test that missing fill quantity is applied at the broker's average and other differences are reported"""
+        orders = self.add_orders(6)
+        self.manager.fill_orders([(1, 50.00, 100), (2, 50.00, 40), (5, 50.00, 10)])
+        unknown = self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=5, order_price=1.00))
+        unknown.created_at = self.start
+        records = [
+            broker_record(orders[0]),
+            broker_record(orders[1], filled_quantity=100, average_fill_price=51.0),
+            broker_record(orders[3], status="canceled"),
+            broker_record(orders[4], filled_quantity=5),
+            broker_record(orders[5], client_order_id="6", broker_id="broker-6b"),
+            broker_record(orders[5], client_order_id="6"),
+            broker_record(unknown, client_order_id="manual-1", broker_id="manual-1"),
+            broker_record(unknown, client_order_id="999", broker_id="broker-999"),
+        ]
+
+        with FakeBroker(records) as broker:
+            adapter = HttpBrokerAdapter(broker.url)
+            reconciler = Reconciler(self.manager, adapter, window=timedelta(minutes=2), workers=2)
+            dry_run = reconciler.reconcile(self.start, self.start + timedelta(hours=1), apply_fills=False)
+            self.assertEqual(self.manager.get_order(2).filled_quantity, 40)
+            report = reconciler.reconcile(self.start, self.start + timedelta(hours=1))
+            adapter.close()
+
+        self.assertEqual(dry_run.fills_applied, report.fills_applied)
+        self.assertEqual(report.remote_orders, 8)
+        [(order_number, fill_price, fill_quantity)] = report.fills_applied
+        self.assertEqual((order_number, fill_quantity), (2, 60))
+        self.assertAlmostEqual(fill_price, (51 * 100 - 50 * 40) / 60)
+        order = self.manager.get_order(2)
+        self.assertEqual((order.status, round(order.average_fill_price, 9)), (OrderStatus.FILLED, 51.0))
+        self.assertEqual(report.in_sync, 2)
+        self.assertEqual(report.closed_remotely, [4])
+        self.assertEqual(sorted(report.mismatched), [5, 6])
+        self.assertIn("Filled 10 locally, 5.0 at the broker", report.mismatched[5])
+        self.assertEqual([remote.broker_id for remote in report.missing_locally], ["manual-1", "broker-999"])
+        self.assertEqual(report.missing_remotely, [3, unknown.order_number])
+        self.assertFalse(report.is_clean)
+
+    def test_fractional_fills_match_within_tolerance(self):
+        """Test that partial fills summing to the broker's quantity up to float rounding count as in sync"""
+        small, = self.add_orders(1)
+        large = self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=2e12, order_price=50.00))
+        large.created_at = self.start
+        self.manager.fill_orders([(1, 50.00, 0.1), (1, 50.00, 0.2), (2, 50.00, 1e12), (2, 50.00, 0.1),
+                                  (2, 50.00, 0.2)])
+        self.assertNotEqual(small.filled_quantity, 0.3)
+        self.assertNotEqual(large.filled_quantity, 1e12 + 0.3)
+        records = [broker_record(small, filled_quantity=0.3), broker_record(large, filled_quantity=1e12 + 0.3)]
+
+        with FakeBroker(records) as broker:
+            adapter = HttpBrokerAdapter(broker.url)
+            report = Reconciler(self.manager, adapter).reconcile(self.start, self.start + timedelta(hours=1))
+            adapter.close()
+        self.assertTrue(report.is_clean)
+        self.assertEqual((report.in_sync, report.fills_applied), (2, []))
+
+    def test_pages_every_window_without_gaps_or_repeats(self):
+        """Test that windows fetched in parallel page through orders sharing timestamps across page boundaries"""
+        orders = self.add_orders(300, step=timedelta(seconds=10))
+        for index, order in enumerate(orders):
+            order.created_at = self.start + timedelta(seconds=10 * (index // 4)) # Four orders per timestamp
+        with FakeBroker([broker_record(order) for order in orders]) as broker:
+            adapter = HttpBrokerAdapter(broker.url, page_size=10)
+            reconciler = Reconciler(self.manager, adapter, window=timedelta(minutes=1), workers=4)
+            remote_orders, pages = reconciler.fetch(self.start, self.start + timedelta(hours=1))
+            self.assertEqual(sorted(int(remote.client_order_id) for remote in remote_orders), list(range(1, 301)))
+            self.assertEqual(pages, broker.requests)
+            self.assertGreater(pages, 30)
+
+            report = reconciler.reconcile(self.start, self.start + timedelta(hours=1))
+            self.assertTrue(report.is_clean)
+            self.assertEqual((report.remote_orders, report.in_sync), (300, 300))
+            adapter.close()
+
+    def test_broker_errors(self):
+        """Test that an error answer raises BrokerError and an unreachable broker is retried before raising"""
+        with FakeBroker() as broker:
+            adapter = HttpBrokerAdapter(broker.url, path="/v2/missing")
+            with self.assertRaises(BrokerError):
+                list(adapter.fetch_orders(self.start, self.start + timedelta(hours=1)))
+            adapter.close()
+            url = broker.url
+
+        adapter = HttpBrokerAdapter(url, retries=1, timeout=1.0)
+        with self.assertLogs("reconcile", "WARNING") as logs, self.assertRaises(BrokerError):
+            Reconciler(self.manager, adapter).reconcile(self.start, self.start + timedelta(hours=1))
+        self.assertEqual(len(logs.output), 2)
+        with self.assertRaises(ValueError):
+            HttpBrokerAdapter("ftp://localhost")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import unittest
+import os
+import shutil
+from order_manager import OrderManager, OrderDetails
+from reference_data import TickerTable
+
+TICKER_ROWS = [
+    "ticker_id,ticker,name,ticker_type,exchange,exchange_id",
+    "1,AAPL,Apple,stocks,Alpacha,1",
+    "2,BTC,Bitcoin,crypto,Binance,2",
+]
+
+class TestTickerTable(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.test_data_folder = "TestData"
+        os.makedirs(self.test_data_folder, exist_ok=True)
+        self.table_path = os.path.join(self.test_data_folder, "ticker_table.csv")
+        self.write_table(TICKER_ROWS)
+        self.table = TickerTable(self.table_path, check_interval=0)
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        if os.path.exists(self.test_data_folder):
+            shutil.rmtree(self.test_data_folder)
+
+    def write_table(self, rows):
+        with open(self.table_path, 'w') as file:
+            file.write("\n".join(rows) + "\n")
+
+    def test_lookups(self):
+        """Test lookups by ticker id and by symbol"""
+        self.assertEqual(len(self.table), 2)
+        self.assertIn(1, self.table)
+        self.assertNotIn(3, self.table)
+        self.assertEqual(self.table.get(2).ticker, "BTC")
+        self.assertEqual(self.table.get(2).exchange, "Binance")
+        self.assertEqual(self.table.get_by_symbol("AAPL").ticker_id, 1)
+        self.assertIsNone(self.table.get(99))
+        self.assertIsNone(self.table.get_by_symbol("MSFT"))
+
+    def test_reload_when_file_changes(self):
+        """Test that the table is read again only after the file changes"""
+        self.assertFalse(self.table.reload_if_changed())
+
+        self.write_table(TICKER_ROWS + ["3,ETH,Ethereum,crypto,Binance,2"])
+        self.assertEqual(self.table.get(3).name, "Ethereum")
+        self.assertFalse(self.table.reload_if_changed())
+
+    def test_duplicate_ticker_id(self):
+        """Test that a ticker id listed twice is reported"""
+        self.write_table(TICKER_ROWS + ["2,ETH,Ethereum,crypto,Binance,2"])
+        with self.assertRaises(ValueError):
+            TickerTable(self.table_path)
+
+    def test_manager_checks_new_orders(self):
+        """Test that orders for unknown tickers or exchanges, or a ticker on another exchange, are rejected"""
+        manager = OrderManager(data_folder=self.test_data_folder, reference_data=self.table)
+        manager.add_order(OrderDetails(ticker_id=1, order_quantity=10, order_price=150.0, exchange_id=1))
+
+        with self.assertRaises(ValueError):
+            manager.add_order(OrderDetails(ticker_id=7, order_quantity=10, order_price=1.0, exchange_id=1))
+        with self.assertRaises(ValueError):
+            manager.add_order(OrderDetails(ticker_id=1, order_quantity=10, order_price=1.0, exchange_id=9))
+        with self.assertRaises(ValueError) as context:
+            manager.add_order(OrderDetails(ticker_id=1, order_quantity=10, order_price=1.0, exchange_id=2))
+        self.assertIn("trades on exchange id 1, not 2", str(context.exception))
+
+        result = manager.add_orders([
+            OrderDetails(ticker_id=2, order_quantity=1, order_price=60000.0, exchange_id=2),
+            OrderDetails(ticker_id=7, order_quantity=1, order_price=1.0, exchange_id=2),
+            OrderDetails(ticker_id=2, order_quantity=1, order_price=60000.0, exchange_id=1),
+        ])
+        self.assertEqual(result.succeeded, 1)
+        self.assertIn("Unknown ticker id 7", result.errors[1])
+        self.assertIn("Ticker id 2 (BTC) trades on exchange id 2, not 1", result.errors[2])
+        manager.close()
+
+    def test_dataframe_is_enriched(self):
+        """Test that saved orders come back with ticker details"""
+        manager = OrderManager(data_folder=self.test_data_folder, reference_data=self.table)
+        manager.add_order(OrderDetails(ticker_id=2, order_quantity=1, order_price=60000.0, exchange_id=2))
+        manager.add_order(OrderDetails(ticker_id=1, order_quantity=10, order_price=150.0, exchange_id=1))
+        manager.save_orders()
+
+        orders_df = manager.get_orders_as_dataframe()
+        self.assertEqual(orders_df["ticker"].tolist(), ["BTC", "AAPL"])
+        self.assertEqual(orders_df["exchange"].tolist(), ["Binance", "Alpacha"])
+        self.assertEqual(orders_df["ticker_type"].tolist(), ["crypto", "stocks"])
+        manager.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import unittest
+import os
+import shutil
+from order_manager import OrderDetails, OrderStatus
+from sharded_manager import ShardedOrderManager
+
+class TestShardedOrderManager(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.test_data_folder = "TestData"
+        self.manager = ShardedOrderManager(data_folder=self.test_data_folder, shards=2)
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        self.manager.close()
+        if os.path.exists(self.test_data_folder):
+            shutil.rmtree(self.test_data_folder)
+
+    def add_sample_orders(self):
+        return self.manager.add_orders([
+            OrderDetails(ticker_id=1000 + idx % 4, order_quantity=100, order_price=10.0 + idx) for idx in range(8)
+        ])
+
+    def test_orders_are_routed_by_ticker(self):
+        """Test that each order lands on its ticker's shard with a globally unique number"""
+        result = self.add_sample_orders()
+
+        self.assertEqual(result.succeeded, 8)
+        numbers = [order.order_number for order in result.results]
+        self.assertEqual(len(set(numbers)), 8)
+        for order in result.results:
+            self.assertEqual(self.manager.shard_for_order(order.order_number), order.ticker_id % 2)
+        self.assertEqual([order.order_price for order in result.results], [10.0 + idx for idx in range(8)])
+
+    def test_fills_are_routed_by_order_number(self):
+        """Test that fills reach the shard owning the order and rejections keep their batch position"""
+        orders = self.add_sample_orders().results
+        fills = [(order.order_number, order.order_price, 100) for order in orders[:4]]
+        fills.append((orders[0].order_number, 1.0, 10)) # Already filled
+        fills.append((orders[4].order_number, 14.0, 40))
+
+        result = self.manager.fill_orders(fills)
+        self.assertEqual(result.succeeded, 5)
+        self.assertEqual(list(result.errors), [4])
+        self.assertIsNone(result.results[4])
+
+        self.assertEqual(self.manager.get_order(orders[0].order_number).status, OrderStatus.FILLED)
+        self.assertEqual(self.manager.get_order(orders[4].order_number).filled_quantity, 40)
+
+        open_orders = self.manager.get_open_orders()
+        self.assertEqual([order.order_number for order in open_orders],
+                         sorted(order.order_number for order in orders[4:]))
+
+    def test_rejected_fill_raises(self):
+        """Test that fill_order raises ValueError for a rejected fill, as OrderManager.fill_order does"""
+        orders = self.add_sample_orders().results
+        self.manager.fill_order(orders[0].order_number, 10.0, 100)
+        for order_number, fill_quantity in ((orders[0].order_number, 1), (orders[1].order_number, 101), (999, 1)):
+            with self.assertRaises(ValueError):
+                self.manager.fill_order(order_number, 10.0, fill_quantity)
+        self.assertEqual(self.manager.get_order(orders[1].order_number).filled_quantity, 0)
+
+    def test_frames_gather_all_shards(self):
+        """Test that frames from every shard are joined and sorted"""
+        orders = self.add_sample_orders().results
+        self.manager.fill_order(orders[1].order_number, 11.0, 50)
+
+        orders_df, fills_df = self.manager.get_order_frames()
+        self.assertEqual(orders_df["order_number"].tolist(), sorted(order.order_number for order in orders))
+        self.assertEqual(fills_df["order_number"].tolist(), [orders[1].order_number])
+
+    def test_dataframe_filters_by_status(self):
+        """Test that the saved orders of every shard can be filtered by status, given as the enum or its value"""
+        orders = self.add_sample_orders().results
+        self.manager.fill_orders([(order.order_number, order.order_price, 100) for order in orders[:3]])
+        self.manager.save_orders()
+
+        open_df = self.manager.get_orders_as_dataframe(status=OrderStatus.OPEN)
+        self.assertEqual(open_df["order_number"].tolist(), sorted(order.order_number for order in orders[3:]))
+        filled_df = self.manager.get_orders_as_dataframe(status="Filled")
+        self.assertEqual(filled_df["order_number"].tolist(), sorted(order.order_number for order in orders[:3]))
+
+    def test_shards_persist_separately(self):
+        """Test that each shard saves to its own folder and numbering continues after a restart"""
+        orders = self.add_sample_orders().results
+        self.manager.save_orders()
+        self.manager.close()
+
+        for shard in range(2):
+            self.assertTrue(os.path.exists(os.path.join(self.test_data_folder, f"shard_{shard:02d}", "orders.json")))
+
+        self.manager = ShardedOrderManager(data_folder=self.test_data_folder, shards=2)
+        self.assertEqual(self.manager.order_count(), 8)
+        self.assertEqual(len(self.manager.get_orders_as_dataframe()), 8)
+        new_order = self.manager.add_order(OrderDetails(ticker_id=1001, order_quantity=1, order_price=1.0))
+        self.assertNotIn(new_order.order_number, [order.order_number for order in orders])
+        self.assertEqual(self.manager.shard_for_order(new_order.order_number), 1)
+
+    def test_shard_count_must_match(self):
+        """Test that a folder can't be reopened with a different number of shards"""
+        with self.assertRaises(ValueError):
+            ShardedOrderManager(data_folder=self.test_data_folder, shards=3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+import os
+import shutil
+import subprocess
+import sys
+from order_manager import OrderManager, OrderDetails
+
+PACKAGE_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class TestStartup(unittest.TestCase):
+    def setUp(self):
+        """Set up test fixtures before each test method."""
+        self.test_data_folder = "TestData"
+        manager = OrderManager(data_folder=self.test_data_folder)
+        manager.add_orders([OrderDetails(ticker_id=1001, order_quantity=10, order_price=5.0) for _ in range(3)],
+                           save=True)
+        manager.close()
+
+    def tearDown(self):
+        """Clean up after each test method."""
+        if os.path.exists(self.test_data_folder):
+            shutil.rmtree(self.test_data_folder)
+
+    def test_import_skips_heavy_dependencies(self):
+        """Test that placing an order in a fresh process doesn't import pandas, NumPy, Arrow or sqlite3"""
+        script = (
+            "import sys\n"
+            "from order_manager import OrderManager, OrderDetails\n"
+            f"manager = OrderManager(data_folder={self.test_data_folder!r})\n"
+            "manager.add_order(OrderDetails(ticker_id=1001, order_quantity=10, order_price=5.0))\n"
+            "print(','.join(name for name in ('pandas', 'numpy', 'pyarrow', 'sqlite3') if name in sys.modules))\n"
+        )
+        output = subprocess.run([sys.executable, "-c", script], cwd=os.getcwd(), capture_output=True, text=True,
+                                env={**os.environ, "PYTHONPATH": PACKAGE_FOLDER}, check=True)
+        self.assertEqual(output.stdout.strip(), "")
+
+    def test_deferred_load(self):
+        """Test that a deferred manager loads saved orders on first use and doesn't save over them"""
+        manager = OrderManager(data_folder=self.test_data_folder, load="deferred")
+        self.assertEqual(manager.orders, [])
+
+        manager.save_orders()
+        self.assertEqual(len(manager.orders), 3)
+        order = manager.add_order(OrderDetails(ticker_id=1002, order_quantity=1, order_price=1.0))
+        self.assertEqual(order.order_number, 4)
+        manager.close()
+
+    def test_background_load(self):
+        """Test that calls on a manager loading in the background wait for the saved orders"""
+        manager = OrderManager(data_folder=self.test_data_folder, load="background")
+        order = manager.add_order(OrderDetails(ticker_id=1002, order_quantity=1, order_price=1.0))
+        self.assertEqual(order.order_number, 4)
+        self.assertEqual(manager.get_order(2).order_number, 2)
+        manager.wait_until_loaded()
+        self.assertEqual(len(manager.orders), 4)
+        manager.close()
+
+    def test_unknown_load_mode(self):
+        with self.assertRaises(ValueError):
+            OrderManager(data_folder=self.test_data_folder, load="later")
+
+if __name__ == '__main__':
+    unittest.main()